@@ -0,0 +1,384 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import torch
+from diffusers.utils import logging
+from transformers import T5Config, T5EncoderModel
+
+from ltx_video.models.autoencoders.causal_video_autoencoder import (
+    CausalVideoAutoencoder,
+)
+from ltx_video.models.transformers.symmetric_patchifier import SymmetricPatchifier
+from ltx_video.models.transformers.transformer3d import Transformer3DModel
+from ltx_video.pipelines.pipeline_ltx_video import ConditioningItem, LTXVideoPipeline
+from ltx_video.schedulers.rf import RectifiedFlowScheduler
+from ltx_video.utils.diffusers_config_mapping import (
+    OURS_SCHEDULER_CONFIG,
+    OURS_TRANSFORMER_CONFIG,
+    OURS_VAE_CONFIG,
+)
+from ltx_video.utils.profiler import StageProfiler
+from ltx_video.utils.skip_layer_strategy import SkipLayerStrategy
+from ltx_video.utils.video_encoder import VideoEncoder
+
+logger = logging.get_logger("LTX-Video")
+
+# The real configs, shrunk to a few small layers. The layer types, the compression factors of the VAE and
+# the positional embeddings are kept, so the benchmarks run the same code paths as the full models.
+TINY_LATENT_CHANNELS = 16
+TINY_TEXT_ENCODER_CONFIG = {
+    "vocab_size": 1024,
+    "d_model": 32,
+    "d_kv": 8,
+    "d_ff": 64,
+    "num_layers": 2,
+    "num_heads": 4,
+}
+TINY_TRANSFORMER_CONFIG = {
+    **OURS_TRANSFORMER_CONFIG,
+    "num_layers": 2,
+    "num_attention_heads": 2,
+    "attention_head_dim": 32,
+    "cross_attention_dim": 64,
+    "caption_channels": TINY_TEXT_ENCODER_CONFIG["d_model"],
+    "in_channels": TINY_LATENT_CHANNELS,
+    "out_channels": TINY_LATENT_CHANNELS,
+}
+TINY_VAE_CONFIG = {
+    **OURS_VAE_CONFIG,
+    "latent_channels": TINY_LATENT_CHANNELS,
+    "blocks": [
+        ["res_x", 1],
+        ["compress_all", 1],
+        ["res_x_y", 1],
+        ["res_x", 1],
+        ["compress_all", 1],
+        ["res_x_y", 1],
+        ["res_x", 1],
+        ["compress_all", 1],
+        ["res_x", 1],
+        ["res_x", 1],
+    ],
+}
+
+# Metrics reported for each case, from the profiler stages of the generation
+STAGE_METRICS = [
+    "text_encoding",
+    "conditioning",
+    "transformer",
+    "guidance",
+    "scheduler_step",
+    "vae_decode",
+    "write_frames",
+]
+
+
+def create_tiny_pipeline(seed: int = 0) -> LTXVideoPipeline:
+    """
+    Creates a pipeline of small, randomly initialized components with the real layer structure, which runs
+    on a CPU in seconds and needs no checkpoint.
+    """
+    torch.manual_seed(seed)
+    pipeline = LTXVideoPipeline(
+        tokenizer=None,
+        text_encoder=T5EncoderModel(T5Config(**TINY_TEXT_ENCODER_CONFIG)).eval(),
+        vae=CausalVideoAutoencoder.from_config(TINY_VAE_CONFIG).eval(),
+        transformer=Transformer3DModel.from_config(TINY_TRANSFORMER_CONFIG).eval(),
+        scheduler=RectifiedFlowScheduler.from_config(OURS_SCHEDULER_CONFIG),
+        patchifier=SymmetricPatchifier(patch_size=1),
+        prompt_enhancer_image_caption_model=None,
+        prompt_enhancer_image_caption_processor=None,
+        prompt_enhancer_llm_model=None,
+        prompt_enhancer_llm_tokenizer=None,
+    )
+    return pipeline.to("cpu")
+
+
+@torch.no_grad()
+def run_case(
+    pipeline: LTXVideoPipeline,
+    frames: int,
+    height: int,
+    width: int,
+    num_conds: int,
+    num_inference_steps: int,
+    num_text_tokens: int,
+    output_dir: Path,
+) -> Dict[str, float]:
+    """
+    Generates a first-frame conditioned video and returns the time in seconds of each stage, of the whole
+    call (`total`) and of the pipeline overhead: the time of the denoising steps outside the transformer,
+    the guidance and the scheduler.
+    """
+    profiler = StageProfiler()
+    generator = torch.Generator().manual_seed(0)
+
+    # The text embeddings are computed from random tokens, there is no tokenizer
+    text_encoder = pipeline.text_encoder
+    token_ids = torch.randint(
+        text_encoder.config.vocab_size, (2, num_text_tokens), generator=generator
+    )
+    attention_mask = torch.ones_like(token_ids)
+    with profiler.stage("text_encoding"):
+        embeds = text_encoder(token_ids, attention_mask=attention_mask)[0]
+
+    image = torch.rand(1, 3, 1, height, width, generator=generator) * 2 - 1
+    encoder = VideoEncoder(output_dir / f"{frames}x{height}x{width}.mp4", fps=25)
+
+    def write_frames(chunk: torch.Tensor):
+        with profiler.stage("write_frames"):
+            encoder.write(chunk[0].numpy())
+
+    start = profiler.now()
+    try:
+        pipeline(
+            height=height,
+            width=width,
+            num_frames=frames,
+            frame_rate=25,
+            prompt_embeds=embeds[:1],
+            prompt_attention_mask=attention_mask[:1],
+            negative_prompt=None,
+            negative_prompt_embeds=embeds[1:],
+            negative_prompt_attention_mask=attention_mask[1:],
+            num_inference_steps=num_inference_steps,
+            guidance_scale=3.0 if num_conds >= 2 else 1.0,
+            stg_scale=1.0 if num_conds >= 3 else 0.0,
+            skip_layer_strategy=SkipLayerStrategy.AttentionValues,
+            skip_block_list=[TINY_TRANSFORMER_CONFIG["num_layers"] - 1],
+            generator=generator,
+            output_type="uint8",
+            conditioning_items=[ConditioningItem(image, 0, 1.0)],
+            is_video=True,
+            vae_per_channel_normalize=True,
+            decode_timestep=0.05,
+            decode_noise_scale=0.025,
+            decoded_frames_callback=write_frames,
+            profiler=profiler,
+        )
+    finally:
+        encoder.close()
+    total = profiler.now() - start
+
+    stages = profiler.summary()["stages"]
+
+    def stage_total(name: str) -> float:
+        return stages[name]["total_s"] if name in stages else 0.0
+
+    metrics = {name: stage_total(name) for name in STAGE_METRICS}
+    metrics["pipeline_overhead"] = stage_total("denoising_step") - sum(
+        stage_total(name) for name in ("transformer", "guidance", "scheduler_step")
+    )
+    metrics["total"] = total
+    return metrics
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def run_benchmarks(
+    output_path: str,
+    frames: List[int],
+    heights: List[int],
+    widths: List[int],
+    num_conds: List[int],
+    num_inference_steps: int = 4,
+    num_text_tokens: int = 128,
+    repeats: int = 3,
+    threads: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Runs every (frames, height, width, num_conds) case of the grid `repeats` times, after a warm-up run,
+    and saves the median time of each metric to `output_path`.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    pipeline = create_tiny_pipeline()
+
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for case_frames, height, width, case_num_conds in itertools.product(
+            frames, heights, widths, num_conds
+        ):
+            case = {
+                "frames": case_frames,
+                "height": height,
+                "width": width,
+                "num_conds": case_num_conds,
+            }
+            runs = [
+                run_case(
+                    pipeline,
+                    **case,
+                    num_inference_steps=num_inference_steps,
+                    num_text_tokens=num_text_tokens,
+                    output_dir=Path(output_dir),
+                )
+                for _ in range(repeats + 1)
+            ][1:]
+            metrics = {
+                name: statistics.median(run[name] for run in runs) for name in runs[0]
+            }
+            results.append({"case": case, "metrics": metrics})
+            logger.warning(f"{case}: {metrics['total']:.3f}s")
+
+    report = {
+        "environment": environment(),
+        "settings": {
+            "num_inference_steps": num_inference_steps,
+            "num_text_tokens": num_text_tokens,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.warning(f"Results saved to {output_path}")
+    return report
+
+
+def compare_benchmarks(
+    baseline_path: str,
+    current_path: str,
+    threshold: float = 0.1,
+    min_seconds: float = 1e-3,
+) -> List[Dict[str, Any]]:
+    """
+    Compares two result files of `run_benchmarks` and prints the relative change of every metric.
+
+    Returns:
+        The regressions: the metrics of the cases in both files which are more than `threshold` slower than
+        in the baseline. Metrics under `min_seconds` in the baseline are too noisy and are not flagged.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+    if baseline["settings"] != current["settings"]:
+        logger.warning(
+            f"The benchmark settings differ: {baseline['settings']} != {current['settings']}"
+        )
+
+    def case_key(result: Dict[str, Any]):
+        return tuple(sorted(result["case"].items()))
+
+    baseline_results = {case_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        baseline_result = baseline_results.get(case_key(result))
+        if baseline_result is None:
+            print(f"{result['case']}: not in the baseline")
+            continue
+        print(f"{result['case']}:")
+        for name, seconds in result["metrics"].items():
+            baseline_seconds = baseline_result["metrics"].get(name)
+            if baseline_seconds is None:
+                continue
+            change = seconds / baseline_seconds - 1.0 if baseline_seconds > 0 else 0.0
+            regressed = change > threshold and baseline_seconds >= min_seconds
+            print(
+                f"  {name:>18}: {baseline_seconds * 1000:9.2f}ms -> {seconds * 1000:9.2f}ms "
+                f"({change:+.1%}){'  REGRESSION' if regressed else ''}"
+            )
+            if regressed:
+                regressions.append(
+                    {"case": result["case"], "metric": name, "change": change}
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline on the CPU with tiny randomly initialized models, no checkpoint needed."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="Run the benchmarks and save the results to a JSON file."
+    )
+    run_parser.add_argument("--output_path", type=str, required=True)
+    run_parser.add_argument(
+        "--frames",
+        type=int,
+        nargs="+",
+        default=[9, 25],
+        help="Numbers of frames, of the form 8 * k + 1.",
+    )
+    run_parser.add_argument(
+        "--heights",
+        type=int,
+        nargs="+",
+        default=[64],
+        help="Heights, multiples of 32.",
+    )
+    run_parser.add_argument(
+        "--widths", type=int, nargs="+", default=[96], help="Widths, multiples of 32."
+    )
+    run_parser.add_argument(
+        "--num_conds",
+        type=int,
+        nargs="+",
+        default=[1, 2, 3],
+        choices=[1, 2, 3],
+        help="Numbers of guidance branches: conditional, + CFG, + STG.",
+    )
+    run_parser.add_argument("--num_inference_steps", type=int, default=4)
+    run_parser.add_argument("--num_text_tokens", type=int, default=128)
+    run_parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Number of timed runs of each case, after a warm-up run. The median is reported.",
+    )
+    run_parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Number of torch threads, for comparable results across machines.",
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare",
+        help="Compare results with a baseline. Exits with an error on regressions.",
+    )
+    compare_parser.add_argument("baseline_path", type=str)
+    compare_parser.add_argument("current_path", type=str)
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown above which a metric is a regression.",
+    )
+    compare_parser.add_argument(
+        "--min_seconds",
+        type=float,
+        default=1e-3,
+        help="Metrics faster than this in the baseline are never regressions.",
+    )
+
+    args = vars(parser.parse_args())
+    command = args.pop("command")
+    if command == "run":
+        run_benchmarks(**args)
+    elif compare_benchmarks(**args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import argparse
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import torch
+from diffusers.utils import logging
+
+from inference import (
+    get_device,
+    get_unique_filename,
+    seed_everething,
+)
+from ltx_video.models.autoencoders.causal_video_autoencoder import (
+    CausalVideoAutoencoder,
+)
+from ltx_video.models.transformers.symmetric_patchifier import SymmetricPatchifier
+from ltx_video.pipelines.pipeline_ltx_video import LTXVideoPipeline
+from ltx_video.utils.checkpoint_loader import (
+    VAE_PREFIX,
+    SingleFileCheckpoint,
+    load_model_from_checkpoint,
+)
+from ltx_video.utils.denoising_checkpoint import (
+    is_denoising_complete,
+    load_denoising_checkpoint,
+)
+from ltx_video.utils.video_encoder import ENCODER_PRESETS, VideoEncoder
+
+logger = logging.get_logger("LTX-Video")
+
+
+def create_vae_pipeline(ckpt_path: str, device: str) -> LTXVideoPipeline:
+    """Creates a pipeline holding only the VAE, which is all that decoding needs."""
+    with SingleFileCheckpoint(ckpt_path) as checkpoint:
+        vae = load_model_from_checkpoint(
+            CausalVideoAutoencoder,
+            checkpoint,
+            "vae",
+            prefix=VAE_PREFIX,
+            dtype=torch.bfloat16,
+        )
+    pipeline = LTXVideoPipeline(
+        tokenizer=None,
+        text_encoder=None,
+        vae=vae.to(device),
+        transformer=None,
+        scheduler=None,
+        patchifier=SymmetricPatchifier(patch_size=1),
+        prompt_enhancer_image_caption_model=None,
+        prompt_enhancer_image_caption_processor=None,
+        prompt_enhancer_llm_model=None,
+        prompt_enhancer_llm_tokenizer=None,
+    )
+    return pipeline.to(device)
+
+
+def decode_latents(
+    latents_path: str,
+    ckpt_path: str,
+    output_path: Optional[str] = None,
+    decode_timestep: Optional[float] = None,
+    decode_noise_scale: Optional[float] = None,
+    seed: int = 171198,
+    vae_decode_tile_size: Optional[List[int]] = None,
+    vae_decode_tile_overlap: Tuple[int, int, int] = (1, 4, 4),
+    video_preset: str = "balanced",
+    device: Optional[str] = None,
+) -> List[Path]:
+    """
+    Decodes the latents of a complete denoising checkpoint saved by `infer(checkpoint_steps=...)` into videos,
+    without loading the transformer or the text encoder.
+
+    `decode_timestep` and `decode_noise_scale` default to the values of the run that saved the checkpoint.
+
+    Returns:
+        The paths of the written videos.
+    """
+    state = load_denoising_checkpoint(latents_path)
+    if not is_denoising_complete(state):
+        raise ValueError(
+            f"{latents_path} was saved at step {state['step']} of {len(state['timesteps'])}. "
+            "Resume the denoising with `inference.py --resume_from` first."
+        )
+    metadata = state["metadata"]
+    if decode_timestep is None:
+        decode_timestep = metadata["decode_timestep"]
+    if decode_noise_scale is None:
+        decode_noise_scale = metadata["decode_noise_scale"]
+
+    seed_everething(seed)
+    device = device or get_device()
+    pipeline = create_vae_pipeline(ckpt_path, device)
+    latents = pipeline.latents_from_denoising_state(state).to(device)
+
+    height, width, num_frames = (
+        metadata["height"],
+        metadata["width"],
+        metadata["num_frames"],
+    )
+    pad_left, pad_right, pad_top, pad_bottom = metadata["padding"]
+    output_region = (
+        (0, num_frames),
+        (pad_top, pad_top + height),
+        (pad_left, pad_left + width),
+    )
+    # Checkpoints saved before `num_images_per_prompt` was recorded hold one video per prompt
+    num_images_per_prompt = metadata.get("num_images_per_prompt", 1)
+    output_dir = Path(output_path) if output_path else Path(latents_path).parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    encoders = []
+    try:
+        for frames in pipeline.iter_decode(
+            latents,
+            is_video=True,
+            vae_per_channel_normalize=True,
+            decode_timestep=decode_timestep,
+            decode_noise_scale=decode_noise_scale,
+            output_type="uint8",
+            tile_size=vae_decode_tile_size,
+            tile_overlap=vae_decode_tile_overlap,
+            output_region=output_region,
+        ):
+            for i in range(frames.shape[0]):
+                if i == len(encoders):
+                    item = i // num_images_per_prompt
+                    output_filename = get_unique_filename(
+                        f"video_output_{i}",
+                        ".mp4",
+                        prompt=metadata["prompts"][item],
+                        seed=metadata["seeds"][item],
+                        resolution=(height, width, num_frames),
+                        dir=output_dir,
+                        endswith=f"_decoded_t{decode_timestep}_n{decode_noise_scale}",
+                    )
+                    encoders.append(
+                        VideoEncoder(
+                            output_filename,
+                            fps=metadata["frame_rate"],
+                            preset=video_preset,
+                        )
+                    )
+                encoders[i].write(frames[i].cpu().numpy())
+    finally:
+        for encoder in encoders:
+            encoder.close()
+
+    for encoder in encoders:
+        logger.warning(f"Output saved to {encoder.path}")
+    return [Path(encoder.path) for encoder in encoders]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Decode the latents saved by inference.py --checkpoint_steps into videos, loading only the VAE."
+    )
+    parser.add_argument(
+        "--latents_path",
+        type=str,
+        required=True,
+        help="Denoising checkpoint holding the denoised latents.",
+    )
+    parser.add_argument(
+        "--ckpt_path",
+        type=str,
+        required=True,
+        help="Path to a safetensors file that contains all model parts.",
+    )
+    parser.add_argument(
+        "--output_path",
+        type=str,
+        default=None,
+        help="Directory of the output videos, the directory of the latents by default.",
+    )
+    parser.add_argument(
+        "--decode_timestep",
+        type=float,
+        default=None,
+        help="Timestep of the decoder, the one of the generation by default.",
+    )
+    parser.add_argument(
+        "--decode_noise_scale",
+        type=float,
+        default=None,
+        help="Noise level of the decoder, the one of the generation by default.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=171198, help="Random seed of the decoding noise"
+    )
+    parser.add_argument(
+        "--vae_decode_tile_size",
+        type=int,
+        nargs=3,
+        default=None,
+        metavar=("FRAMES", "HEIGHT", "WIDTH"),
+        help="Decode the latents in overlapping tiles of this size, in latents.",
+    )
+    parser.add_argument(
+        "--vae_decode_tile_overlap",
+        type=int,
+        nargs=3,
+        default=[1, 4, 4],
+        metavar=("FRAMES", "HEIGHT", "WIDTH"),
+        help="Overlap of neighbouring VAE decoding tiles, in latents.",
+    )
+    parser.add_argument(
+        "--video_preset",
+        type=str,
+        default="balanced",
+        choices=list(ENCODER_PRESETS),
+        help="Video encoder preset.",
+    )
+    parser.add_argument(
+        "--device",
+        default=None,
+        help="Device to run decoding on. If not specified, will automatically detect and use CUDA or MPS if available, else CPU.",
+    )
+    args = parser.parse_args()
+    decode_latents(**vars(args))
+
+
+if __name__ == "__main__":
+    main()
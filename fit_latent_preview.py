@@ -0,0 +1,118 @@
+import argparse
+from typing import List, Optional
+
+import torch
+from diffusers.utils import logging
+
+from decode_latents import create_vae_pipeline
+from inference import get_device, load_video_to_tensor_with_resize_and_crop
+from ltx_video.utils.latent_preview import LatentPreviewer, pool_to_latent_grid
+from ltx_video.utils.video_decoder import count_video_frames, read_video_frames
+
+logger = logging.get_logger("LTX-Video")
+
+
+@torch.no_grad()
+def fit_latent_preview(
+    ckpt_path: str,
+    video_paths: List[str],
+    output_path: str,
+    height: int = 512,
+    width: int = 768,
+    num_frames: int = 97,
+    device: Optional[str] = None,
+) -> LatentPreviewer:
+    """
+    Fits the latent to RGB projection of `inference.py --preview_steps` against the VAE of a checkpoint, by
+    encoding sample videos and regressing the average colors of the pixels covered by each latent.
+
+    A handful of varied videos is enough: the projection only has 3 * (c + 1) parameters.
+    """
+    device = device or get_device()
+    pipeline = create_vae_pipeline(ckpt_path, device)
+
+    latents, colors = [], []
+    for video_path in video_paths:
+        # The VAE encodes 8 * k + 1 frames
+        video_frames = min(num_frames, count_video_frames(video_path))
+        video_frames = (video_frames - 1) // pipeline.video_scale_factor * (
+            pipeline.video_scale_factor
+        ) + 1
+        video = load_video_to_tensor_with_resize_and_crop(
+            read_video_frames(video_path, video_frames), height, width
+        )
+        latents.append(
+            pipeline.encode_conditioning_media(video, vae_per_channel_normalize=True)
+            .float()
+            .cpu()
+        )
+        colors.append(
+            pool_to_latent_grid(
+                video,
+                temporal_scale=pipeline.video_scale_factor,
+                spatial_scale=pipeline.vae_scale_factor,
+            )
+        )
+        logger.warning(f"Encoded {video_frames} frames of {video_path}")
+
+    # The videos may have different numbers of frames: fit on all their latents at once
+    latents = torch.cat([item.flatten(2) for item in latents], dim=2)[..., None, None]
+    colors = torch.cat([item.flatten(2) for item in colors], dim=2)[..., None, None]
+    previewer = LatentPreviewer.fit(latents, colors)
+
+    # Mean error of the previews, in 8-bit levels
+    previews = previewer(latents).float().movedim(-1, 1) / 127.5 - 1.0
+    error = (previews - colors).abs().mean() * 127.5
+    logger.warning(f"Mean preview error: {error:.1f} levels")
+
+    previewer.save(output_path)
+    logger.warning(f"Latent preview projection saved to {output_path}")
+    return previewer
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fit the latent to RGB projection of the denoising previews against the VAE."
+    )
+    parser.add_argument(
+        "--ckpt_path",
+        type=str,
+        required=True,
+        help="Path to a safetensors file that contains all model parts.",
+    )
+    parser.add_argument(
+        "--video_paths",
+        type=str,
+        nargs="+",
+        required=True,
+        help="Sample videos to fit the projection on.",
+    )
+    parser.add_argument(
+        "--output_path",
+        type=str,
+        required=True,
+        help="Safetensors file of the fitted projection, for inference.py --latent_preview_path.",
+    )
+    parser.add_argument(
+        "--height", type=int, default=512, help="Height the videos are resized to"
+    )
+    parser.add_argument(
+        "--width", type=int, default=768, help="Width the videos are resized to"
+    )
+    parser.add_argument(
+        "--num_frames",
+        type=int,
+        default=97,
+        help="Maximal number of frames encoded per video",
+    )
+    parser.add_argument(
+        "--device",
+        default=None,
+        help="Device to run the VAE on. If not specified, will automatically detect and use CUDA or MPS if available, else CPU.",
+    )
+    args = parser.parse_args()
+    fit_latent_preview(**vars(args))
+
+
+if __name__ == "__main__":
+    main()
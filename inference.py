@@ -1,32 +1,60 @@
 import argparse
+import json
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false" 
 import random
+import time
 from datetime import datetime
 from pathlib import Path
 from diffusers.utils import logging
-from typing import Optional, List, Union
+from typing import Any, Dict, Optional, List, Tuple, Union
 
 import imageio
 import numpy as np
 import torch
 from PIL import Image
-from transformers import (
-    T5EncoderModel,
-    T5Tokenizer,
-    AutoModelForCausalLM,
-    AutoProcessor,
-    AutoTokenizer,
-)
+from transformers import T5EncoderModel, T5Tokenizer
 
 from ltx_video.models.autoencoders.causal_video_autoencoder import (
     CausalVideoAutoencoder,
 )
 from ltx_video.models.transformers.symmetric_patchifier import SymmetricPatchifier
 from ltx_video.models.transformers.transformer3d import Transformer3DModel
-from ltx_video.pipelines.pipeline_ltx_video import ConditioningItem, LTXVideoPipeline
+from ltx_video.pipelines.pipeline_ltx_video import (
+    ASPECT_RATIO_512_BIN,
+    ASPECT_RATIO_1024_BIN,
+    ConditioningItem,
+    LTXVideoPipeline,
+)
 from ltx_video.schedulers.rf import RectifiedFlowScheduler
+from ltx_video.utils.checkpoint_loader import (
+    TRANSFORMER_PREFIX,
+    VAE_PREFIX,
+    SingleFileCheckpoint,
+    load_model_from_checkpoint,
+)
+from ltx_video.utils.conditioning_latent_cache import ConditioningLatentCache
+from ltx_video.utils.denoising_checkpoint import (
+    load_denoising_checkpoint,
+    save_denoising_checkpoint,
+)
 from ltx_video.utils.skip_layer_strategy import SkipLayerStrategy
+from ltx_video.utils.guidance_schedule import GuidanceSchedule
+from ltx_video.utils.latent_preview import LatentPreviewer
+from ltx_video.utils.profiler import NULL_PROFILER, StageProfiler
+from ltx_video.utils.prompt_enhancer_models import (
+    PROMPT_ENHANCER_POLICIES,
+    PromptEnhancerModels,
+)
+from ltx_video.utils.step_cache import TransformerStepCache
+from ltx_video.utils.text_embedding_cache import TextEmbeddingCache
+from ltx_video.utils.video_decoder import count_video_frames, read_video_frames
+from ltx_video.utils.video_encoder import (
+    ENCODER_PRESETS,
+    BackgroundVideoEncoder,
+    write_video,
+)
+from ltx_video.utils.weight_streaming import load_streamed_model_from_checkpoint
 
 MAX_HEIGHT = 720
 MAX_WIDTH = 1280
@@ -34,6 +62,47 @@ MAX_NUM_FRAMES = 257
 
 logger = logging.get_logger("LTX-Video")
 
+# Rough peak activation footprint of one latent token in one guidance branch of a transformer forward,
+# used to pick the guidance branch micro-batch size automatically.
+GUIDANCE_BRANCH_BYTES_PER_LATENT_TOKEN = 64 * 1024
+
+# Arguments that define the pipeline. Processes that keep the pipeline resident across jobs (the jobs
+# file mode, the inference server) fix them once and do not let individual jobs override them.
+MODEL_ARGS = {
+    "ckpt_path",
+    "precision",
+    "text_encoder_model_name_or_path",
+    "sampler",
+    "solver",
+    "text_embedding_cache_dir",
+    "conditioning_latent_cache_dir",
+    "cache_max_disk_gb",
+    "device",
+    "prompt_enhancer_image_caption_model_name_or_path",
+    "prompt_enhancer_llm_model_name_or_path",
+    "prompt_enhancer_policy",
+    "prompt_enhancer_idle_ttl",
+    "transformer_streaming_budget_gb",
+}
+
+# Conditioning video frames are cropped and resized this many at a time, bounding their float copies
+VIDEO_PREPROCESSING_CHUNK_FRAMES = 16
+
+# Arguments that may differ between the jobs generated together in a single batched pipeline call
+PER_PROMPT_ARGS = {"prompt", "negative_prompt", "seed", "output_path"}
+
+# Written into the output directory of each job once its outputs are complete
+JOB_RESULT_FILENAME = "result.json"
+# Default file of the denoising checkpoints, in the output directory
+DENOISING_CHECKPOINT_FILENAME = "denoising_checkpoint.pt"
+PROFILE_SUMMARY_FILENAME = "profile_summary.json"
+PROFILE_TRACE_FILENAME = "profile_trace.json"
+
+# Previews have one pixel per latent, upscaled by this factor when written
+PREVIEW_UPSCALE = 8
+
+ASPECT_RATIO_BINS = {512: ASPECT_RATIO_512_BIN, 1024: ASPECT_RATIO_1024_BIN}
+
 
 def get_total_gpu_memory():
     if torch.cuda.is_available():
@@ -42,6 +111,55 @@ def get_total_gpu_memory():
     return 0
 
 
+def get_available_memory(device: str) -> float:
+    """Returns the memory currently available on `device`, in GB."""
+    if device == "cuda" or (device is not None and device.startswith("cuda:")):
+        free_memory, _ = torch.cuda.mem_get_info(torch.device(device))
+        return free_memory / (1024**3)
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024**3)
+    except (ValueError, OSError, AttributeError):
+        return float("inf")
+
+
+def resolve_guidance_branch_batch_size(
+    guidance_branch_batch_size: Optional[str],
+    num_conds: int,
+    num_latent_tokens: int,
+    device: str,
+) -> Optional[int]:
+    """
+    Parses the `--guidance_branch_batch_size` argument. For "auto", as many guidance branches are batched
+    together as the estimated activation memory allows on `device`.
+    """
+    if guidance_branch_batch_size is None:
+        return None
+    if guidance_branch_batch_size != "auto":
+        return int(guidance_branch_batch_size)
+
+    branch_memory = (
+        num_latent_tokens * GUIDANCE_BRANCH_BYTES_PER_LATENT_TOKEN / (1024**3)
+    )
+    usable_memory = get_available_memory(device) * 0.5
+    branch_batch_size = max(1, min(num_conds, int(usable_memory // branch_memory)))
+    if branch_batch_size < num_conds:
+        logger.warning(
+            f"Evaluating the {num_conds} guidance branches in micro-batches of {branch_batch_size} "
+            f"to fit the available memory ({usable_memory / 0.5:.1f} GB)."
+        )
+    return branch_batch_size
+
+
+# Video encoders still running in the background, see `infer(background_encoding=True)`
+_pending_video_encoders: List[BackgroundVideoEncoder] = []
+
+
+def wait_for_video_encoders():
+    """Waits until all the videos encoded in the background are written."""
+    while _pending_video_encoders:
+        _pending_video_encoders.pop(0).wait()
+
+
 def get_device():
     if torch.cuda.is_available():
         return "cuda"
@@ -70,6 +188,22 @@ def load_image_to_tensor_with_resize_and_crop(
         raise ValueError("image_input must be either a file path or a PIL Image object")
 
     input_width, input_height = image.size
+    x_start, y_start, new_width, new_height = _center_crop_box(
+        input_height, input_width, target_height, target_width
+    )
+
+    image = image.crop((x_start, y_start, x_start + new_width, y_start + new_height))
+    image = image.resize((target_width, target_height))
+    frame_tensor = torch.tensor(np.array(image)).permute(2, 0, 1).float()
+    frame_tensor = (frame_tensor / 127.5) - 1.0
+    # Create 5D tensor: (batch_size=1, channels=3, num_frames=1, height, width)
+    return frame_tensor.unsqueeze(0).unsqueeze(2)
+
+
+def _center_crop_box(
+    input_height: int, input_width: int, target_height: int, target_width: int
+) -> Tuple[int, int, int, int]:
+    """Returns the (x_start, y_start, width, height) of the largest centered crop with the target aspect ratio."""
     aspect_ratio_target = target_width / target_height
     aspect_ratio_frame = input_width / input_height
     if aspect_ratio_frame > aspect_ratio_target:
@@ -82,13 +216,63 @@ def load_image_to_tensor_with_resize_and_crop(
         new_height = int(input_width / aspect_ratio_target)
         x_start = 0
         y_start = (input_height - new_height) // 2
+    return x_start, y_start, new_width, new_height
 
-    image = image.crop((x_start, y_start, x_start + new_width, y_start + new_height))
-    image = image.resize((target_width, target_height))
-    frame_tensor = torch.tensor(np.array(image)).permute(2, 0, 1).float()
-    frame_tensor = (frame_tensor / 127.5) - 1.0
-    # Create 5D tensor: (batch_size=1, channels=3, num_frames=1, height, width)
-    return frame_tensor.unsqueeze(0).unsqueeze(2)
+
+def load_video_to_tensor_with_resize_and_crop(
+    frames: np.ndarray,
+    target_height: int,
+    target_width: int,
+    padding: Tuple[int, int, int, int] = (0, 0, 0, 0),
+) -> torch.Tensor:
+    """Crop, resize and pad video frames into a tensor, like `load_image_to_tensor_with_resize_and_crop` does
+    for each frame, but on whole chunks of frames at once.
+
+    Args:
+        frames: The (num_frames, height, width, 3) uint8 RGB frames
+        target_height: Height of the frames after resizing, before padding
+        target_width: Width of the frames after resizing, before padding
+        padding: The (left, right, top, bottom) padding, filled with zeros
+
+    Returns:
+        The frames in [-1, 1], shape (1, 3, num_frames, padded height, padded width).
+    """
+    num_frames, input_height, input_width = frames.shape[:3]
+    x_start, y_start, new_width, new_height = _center_crop_box(
+        input_height, input_width, target_height, target_width
+    )
+    pad_left, pad_right, pad_top, pad_bottom = padding
+    video_tensor = torch.zeros(
+        1,
+        3,
+        num_frames,
+        target_height + pad_top + pad_bottom,
+        target_width + pad_left + pad_right,
+    )
+    output = video_tensor[
+        0, :, :, pad_top : pad_top + target_height, pad_left : pad_left + target_width
+    ]
+
+    for start in range(0, num_frames, VIDEO_PREPROCESSING_CHUNK_FRAMES):
+        end = min(start + VIDEO_PREPROCESSING_CHUNK_FRAMES, num_frames)
+        chunk = torch.from_numpy(
+            frames[
+                start:end,
+                y_start : y_start + new_height,
+                x_start : x_start + new_width,
+            ]
+        )
+        chunk = chunk.permute(0, 3, 1, 2).float()
+        if chunk.shape[-2:] != (target_height, target_width):
+            chunk = torch.nn.functional.interpolate(
+                chunk,
+                size=(target_height, target_width),
+                mode="bicubic",
+                align_corners=False,
+                antialias=True,
+            ).clamp_(0, 255)
+        output[:, start:end] = chunk.transpose(0, 1) / 127.5 - 1.0
+    return video_tensor
 
 
 def calculate_padding(
@@ -158,6 +342,29 @@ def get_unique_filename(
     )
 
 
+def snap_to_aspect_ratio_bin(
+    height: int, width: int, aspect_ratio_bin: int
+) -> Tuple[int, int]:
+    """Returns the size of the `ASPECT_RATIO_<aspect_ratio_bin>_BIN` entry closest to the aspect ratio of height x width."""
+    if aspect_ratio_bin not in ASPECT_RATIO_BINS:
+        raise ValueError(
+            f"Unknown aspect ratio bin {aspect_ratio_bin}, expected one of {list(ASPECT_RATIO_BINS)}"
+        )
+    return LTXVideoPipeline.classify_height_width_bin(
+        height, width, ratios=ASPECT_RATIO_BINS[aspect_ratio_bin]
+    )
+
+
+def _per_prompt_values(value, num_prompts: int, name: str) -> list:
+    if isinstance(value, (list, tuple)):
+        if len(value) != num_prompts:
+            raise ValueError(
+                f"Got {len(value)} values of `{name}` for {num_prompts} prompts"
+            )
+        return list(value)
+    return [value] * num_prompts
+
+
 def seed_everething(seed: int):
     random.seed(seed)
     np.random.seed(seed)
@@ -168,7 +375,7 @@ def seed_everething(seed: int):
         torch.mps.manual_seed(seed)
 
 
-def main():
+def create_argument_parser(prompt_required: bool = True) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Load models from separate directories and run the pipeline."
     )
@@ -206,14 +413,48 @@ def main():
     parser.add_argument(
         "--guidance_scale",
         type=float,
+        nargs="+",
         default=3,
-        help="Guidance scale.",
+        help="Guidance scale. Several values give one scale per step.",
+    )
+    parser.add_argument(
+        "--cfg_step_range",
+        type=int,
+        nargs=2,
+        default=None,
+        metavar=("START", "END"),
+        help="Only apply classifier-free guidance on the steps [START, END). Negative values count from the end.",
+    )
+    parser.add_argument(
+        "--cfg_sigma_range",
+        type=float,
+        nargs=2,
+        default=None,
+        metavar=("LOW", "HIGH"),
+        help="Only apply classifier-free guidance on the steps whose sigma is in [LOW, HIGH].",
     )
     parser.add_argument(
         "--stg_scale",
         type=float,
+        nargs="+",
         default=1,
-        help="Spatiotemporal guidance scale. 0 to disable STG.",
+        help="Spatiotemporal guidance scale. 0 to disable STG. Several values give one scale per step.",
+    )
+    parser.add_argument(
+        "--stg_step_range",
+        type=int,
+        nargs=2,
+        default=None,
+        metavar=("START", "END"),
+        help="Only apply spatiotemporal guidance on the steps [START, END). Negative values count from the end.",
+    )
+    parser.add_argument(
+        "--stg_sigma_range",
+        type=float,
+        nargs=2,
+        default=None,
+        metavar=("LOW", "HIGH"),
+        help="Only apply spatiotemporal guidance on the steps whose sigma is in [LOW, HIGH].",
     )
     parser.add_argument(
         "--stg_rescale",
@@ -287,11 +528,117 @@ def main():
         help="Noise level for decoding noise",
     )
 
+    # Transformer step cache
+    parser.add_argument(
+        "--step_cache_threshold",
+        type=float,
+        default=0.0,
+        help="Reuse the previous transformer output on steps whose timestep-modulated input changed by less than "
+        "this accumulated amount. Higher values are faster but lower quality (e.g. 0.03-0.1). 0 to disable.",
+    )
+    parser.add_argument(
+        "--vae_decode_tile_size",
+        type=int,
+        nargs=3,
+        default=None,
+        metavar=("FRAMES", "HEIGHT", "WIDTH"),
+        help="Decode the latents in overlapping tiles of this size, in latents (1 latent = 8 frames or 32 pixels), "
+        "to reduce the peak memory of the VAE decoding. By default the latents are decoded at once.",
+    )
+    parser.add_argument(
+        "--vae_decode_tile_overlap",
+        type=int,
+        nargs=3,
+        default=[1, 4, 4],
+        metavar=("FRAMES", "HEIGHT", "WIDTH"),
+        help="Overlap of neighbouring VAE decoding tiles, in latents.",
+    )
+    parser.add_argument(
+        "--video_preset",
+        type=str,
+        default="balanced",
+        choices=list(ENCODER_PRESETS),
+        help="Video encoder preset, trading encoding speed ('fast') against file size ('small').",
+    )
+    parser.add_argument(
+        "--checkpoint_steps",
+        type=int,
+        default=0,
+        help="Save the denoising state every this many steps, and the denoised latents after the last step, "
+        "to --checkpoint_path. The latents can be decoded later with decode_latents.py.",
+    )
+    parser.add_argument(
+        "--checkpoint_path",
+        type=str,
+        default=None,
+        help=f"File of the denoising checkpoints, {DENOISING_CHECKPOINT_FILENAME} in the output directory by "
+        "default. Setting it saves the denoised latents even if --checkpoint_steps is 0.",
+    )
+    parser.add_argument(
+        "--resume_from",
+        type=str,
+        default=None,
+        help="Resume the denoising from a checkpoint saved by a run with the same arguments.",
+    )
+    parser.add_argument(
+        "--preview_steps",
+        type=int,
+        default=0,
+        help="Write a low-resolution preview of the denoised video to preview_<i>.mp4 in the output directory "
+        "every this many steps, to stop bad generations early. Needs --latent_preview_path.",
+    )
+    parser.add_argument(
+        "--latent_preview_path",
+        type=str,
+        default=None,
+        help="Latent to RGB projection of the previews, fitted against the VAE with fit_latent_preview.py.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"Time the stages of the generation and write a JSON summary ({PROFILE_SUMMARY_FILENAME}) and a "
+        f"Chrome trace ({PROFILE_TRACE_FILENAME}, for chrome://tracing or ui.perfetto.dev) to the output directory.",
+    )
+    parser.add_argument(
+        "--profile_transformer_blocks",
+        action="store_true",
+        help="With --profile, also time each transformer block forward.",
+    )
+    parser.add_argument(
+        "--profile_memory",
+        action="store_true",
+        help="Profile like --profile, and also record the host and CUDA memory peaks of each stage and the "
+        "resident bytes of each model, to choose between offloading, VAE tiling and sequential guidance.",
+    )
+    parser.add_argument(
+        "--stream_chunk_frames",
+        type=int,
+        default=None,
+        help="Decode and write the video in chunks of this many latent frames (8 frames each), so the decoded "
+        "video is never held in memory at once. The chunks overlap by the temporal --vae_decode_tile_overlap.",
+    )
+    parser.add_argument(
+        "--aspect_ratio_bin",
+        type=int,
+        default=None,
+        choices=list(ASPECT_RATIO_BINS),
+        help="Snap the height and width to the closest aspect ratio of the 512 or 1024 resolution bins. "
+        "Snapped jobs share fewer distinct shapes, so more of them can be batched together.",
+    )
+    parser.add_argument(
+        "--guidance_branch_batch_size",
+        type=str,
+        default=None,
+        help="Maximal number of guidance branches (unconditional, conditional, perturbed) per transformer forward. "
+        "Lower values reduce the peak memory at some throughput cost. 'auto' picks it from the available memory. "
+        "By default all the branches are batched together.",
+    )
+
     # Prompts
     parser.add_argument(
         "--prompt",
         type=str,
-        required=True,
+        required=prompt_required,
         help="Text prompt to guide generation",
     )
     parser.add_argument(
@@ -306,6 +653,14 @@ def main():
         action="store_true",
         help="Offloading unnecessary computations to CPU.",
     )
+    parser.add_argument(
+        "--transformer_streaming_budget_gb",
+        type=float,
+        default=None,
+        help="Stream the transformer blocks from the memory-mapped checkpoint, keeping at most this many GB of "
+        "them materialized: the first blocks that fit stay resident and the others are read at every step. "
+        "Trades speed for memory when the transformer does not fit. By default all the weights are loaded upfront.",
+    )
 
     parser.add_argument(
         "--text_encoder_model_name_or_path",
@@ -313,6 +668,28 @@ def main():
         default="PixArt-alpha/PixArt-XL-2-1024-MS",
         help="Local path or model identifier for both the tokenizer and text encoder. Defaults to pretrained model on Hugging Face.",
     )
+    parser.add_argument(
+        "--text_embedding_cache_dir",
+        type=str,
+        default=None,
+        help="Directory of a persistent cache of text encoder outputs. Prompts found in the cache are not re-encoded.",
+    )
+    parser.add_argument(
+        "--conditioning_latent_cache_dir",
+        type=str,
+        default=None,
+        help="Directory of a persistent cache of VAE-encoded conditioning media, keyed on their content. "
+        "Conditioning images and videos found in the cache are neither decoded nor re-encoded. "
+        "Encoded media are always cached in memory.",
+    )
+    parser.add_argument(
+        "--cache_max_disk_gb",
+        type=float,
+        default=None,
+        help="Maximum size, in GB, of each of the persistent caches (--text_embedding_cache_dir and "
+        "--conditioning_latent_cache_dir). The least recently used entries are evicted beyond it. "
+        "Unbounded by default.",
+    )
 
     # Conditioning arguments
     parser.add_argument(
@@ -340,6 +717,15 @@ def main():
         default=None,
         help="Sampler to use for noise scheduling. Can be either 'uniform' or 'linear-quadratic'. If not specified, uses the sampler from the checkpoint.",
     )
+    parser.add_argument(
+        "--solver",
+        type=str,
+        choices=["euler", "heun", "multistep"],
+        default=None,
+        help="ODE solver used by the sampler. 'euler' (first order), 'heun' (second order, two transformer "
+        "evaluations per step) or 'multistep' (second order Adams-Bashforth, one evaluation per step). "
+        "If not specified, uses the solver from the checkpoint (euler).",
+    )
 
     # Prompt enhancement
     parser.add_argument(
@@ -348,6 +734,13 @@ def main():
         default=50,
         help="Enable prompt enhancement only if input prompt has fewer words than this threshold. Set to 0 to disable enhancement completely.",
     )
+    parser.add_argument(
+        "--prompt_enhancement_batch_size",
+        type=int,
+        default=8,
+        help="Maximum number of prompts enhanced together in a single batched generate call. The prompts of a "
+        "jobs file are all enhanced upfront, in batches of this size.",
+    )
     parser.add_argument(
         "--prompt_enhancer_image_caption_model_name_or_path",
         type=str,
@@ -360,16 +753,402 @@ def main():
         default="unsloth/Llama-3.2-3B-Instruct",
         help="Path to the LLM model, default is Llama-3.2-3B-Instruct, but you can use other models like Llama-3.1-8B-Instruct, or other models supported by Hugging Face",
     )
+    parser.add_argument(
+        "--prompt_enhancer_policy",
+        choices=PROMPT_ENHANCER_POLICIES,
+        default="idle_ttl",
+        help="The prompt enhancer models are loaded the first time a prompt is enhanced, and moved off the device "
+        "once it is. 'keep_warm' then keeps them in CPU memory, 'unload_after_use' releases them, and 'idle_ttl' "
+        "releases them after --prompt_enhancer_idle_ttl seconds without use.",
+    )
+    parser.add_argument(
+        "--prompt_enhancer_idle_ttl",
+        type=float,
+        default=300.0,
+        help="Idle time, in seconds, after which the prompt enhancer models are released with the 'idle_ttl' policy.",
+    )
+
+    return parser
+
 
-    args = parser.parse_args()
-    # If --image_path is given, set up conditioning args
-    if args.image_path:
-        args.conditioning_media_paths = [args.image_path]
-        args.conditioning_start_frames = [0]
-        if not args.conditioning_strengths:
-            args.conditioning_strengths = [1.0]
+def resolve_image_path_args(args: dict) -> dict:
+    """If `image_path` is given, set up the conditioning args to condition on it as the first frame."""
+    if args.get("image_path"):
+        args["conditioning_media_paths"] = [args["image_path"]]
+        args["conditioning_start_frames"] = [0]
+        if not args.get("conditioning_strengths"):
+            args["conditioning_strengths"] = [1.0]
+    return args
+
+
+def job_batch_key(params: Dict[str, Any]) -> Optional[tuple]:
+    """
+    Returns the bucket of the job `params` (full `infer` arguments): jobs in the same bucket generate the same
+    size and number of frames, thus the same latent shape, with the same settings, and only differ by their
+    `PER_PROMPT_ARGS`, so they can be generated in a single batched pipeline call.
+
+    Returns None for jobs that can only be generated alone: conditioned jobs, as the conditioning media are
+    shared by the whole batch, and jobs generating several videos per prompt.
+    """
+    if (
+        params.get("conditioning_media_paths")
+        or params.get("input_image_path")
+        or params.get("num_images_per_prompt", 1) != 1
+    ):
+        return None
+
+    height, width = params["height"], params["width"]
+    if params.get("aspect_ratio_bin"):
+        height, width = snap_to_aspect_ratio_bin(
+            height, width, params["aspect_ratio_bin"]
+        )
+    enhance_prompt = _job_enhances_prompt(params)
+
+    shared_params = sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in params.items()
+        if name not in PER_PROMPT_ARGS | {"height", "width"}
+    )
+    return (height, width, enhance_prompt, tuple(shared_params))
+
+
+def _job_enhances_prompt(params: Dict[str, Any]) -> bool:
+    # Prompt enhancement is decided per job, from the length of its prompt
+    threshold = params.get("prompt_enhancement_words_threshold", 50)
+    return threshold > 0 and len(params["prompt"].split()) < threshold
+
+
+def enhance_job_prompts(
+    jobs: List[Dict[str, Any]], pipeline: LTXVideoPipeline, batch_size: int = 8
+) -> int:
+    """
+    Enhances the prompts of all the text-to-video jobs (full `infer` arguments) that would enhance their prompt,
+    in batches of at most `batch_size` prompts, instead of once per pipeline call. The jobs are updated in
+    place with their enhanced prompt, and prompt enhancement disabled so `infer` does not enhance it again.
+    Conditioned jobs are left to `infer`, which captions their first frame.
+
+    Returns:
+        `int`: The number of enhanced prompts.
+    """
+    indices = [
+        index
+        for index, params in enumerate(jobs)
+        if _job_enhances_prompt(params) and job_batch_key(params) is not None
+    ]
+    if not indices or not pipeline.has_prompt_enhancer:
+        return 0
+
+    start_time = time.perf_counter()
+    prompts = pipeline.enhance_prompts(
+        [jobs[index]["prompt"] for index in indices], batch_size=batch_size
+    )
+    for index, prompt in zip(indices, prompts):
+        jobs[index]["prompt"] = prompt
+        jobs[index]["prompt_enhancement_words_threshold"] = 0
+    logger.warning(
+        f"Enhanced {len(indices)} prompts in {time.perf_counter() - start_time:.1f}s"
+    )
+    return len(indices)
+
+
+def group_jobs_into_batches(
+    jobs: List[Dict[str, Any]], max_batch_size: int
+) -> List[List[int]]:
+    """
+    Groups jobs (full `infer` arguments) into batches of at most `max_batch_size` jobs of the same
+    `job_batch_key`. The batches are ordered by their first job, and keep the order of their jobs.
+
+    Returns:
+        `List[List[int]]`: The indices of the jobs of each batch.
+    """
+    batches = []
+    open_batches = {}
+    for index, params in enumerate(jobs):
+        key = job_batch_key(params) if max_batch_size > 1 else None
+        batch = open_batches.get(key) if key is not None else None
+        if batch is None or len(batch) >= max_batch_size:
+            batch = []
+            batches.append(batch)
+            if key is not None:
+                open_batches[key] = batch
+        batch.append(index)
+    return batches
+
+
+def infer_batch(jobs: List[Dict[str, Any]], **kwargs) -> List[List[Path]]:
+    """
+    Generates jobs of the same `job_batch_key` in a single pipeline call, each with its own prompt, seed and
+    output directory. `kwargs` (e.g. `pipeline`) are passed to `infer`.
+
+    Returns:
+        `List[List[Path]]`: The output files of each job.
+    """
+    if len(jobs) == 1:
+        return [infer(**jobs[0], **kwargs)]
+    params = dict(jobs[0])
+    for name in PER_PROMPT_ARGS:
+        params[name] = [job.get(name) for job in jobs]
+    outputs = infer(**params, **kwargs)
+    return [[output] for output in outputs]
+
+
+def load_jobs_file(jobs_file: str) -> List[Dict[str, Any]]:
+    """Reads a JSONL file with one job per line, each a dict of argument overrides. Blank lines are skipped."""
+    jobs = []
+    with open(jobs_file, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(
+                    f"{jobs_file}:{line_number}: invalid JSON ({e})"
+                ) from e
+            if not isinstance(job, dict):
+                raise ValueError(
+                    f"{jobs_file}:{line_number}: a job must be a JSON object"
+                )
+            jobs.append(job)
+    return jobs
+
+
+def _completed_job_outputs(job_dir: Path) -> Optional[List[str]]:
+    """Returns the outputs of a job that already ran to completion in `job_dir`, or None."""
+    result_path = job_dir / JOB_RESULT_FILENAME
+    if not result_path.is_file():
+        return None
+    try:
+        with open(result_path, "r", encoding="utf-8") as f:
+            outputs = json.load(f)["outputs"]
+    except (ValueError, KeyError, OSError):
+        return None
+    if not outputs or not all(Path(output).is_file() for output in outputs):
+        return None
+    return outputs
+
+
+def _write_job_result(job_dir: Path, result: Dict[str, Any]):
+    # Written atomically, so a crash never leaves a job looking complete
+    tmp_path = job_dir / (JOB_RESULT_FILENAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_path, job_dir / JOB_RESULT_FILENAME)
+
+
+def run_jobs(
+    jobs: List[Dict[str, Any]],
+    args: Dict[str, Any],
+    pipeline: Optional[LTXVideoPipeline] = None,
+    max_batch_size: int = 1,
+) -> Dict[str, List[str]]:
+    """
+    Runs a batch of jobs with a single pipeline.
+
+    Each job is a dict overriding the arguments of `infer` (except for the `MODEL_ARGS`), with an optional
+    `id` naming its output directory `<output_path>/<id>` (the index of the job by default). Once the
+    outputs of a job are written, a `result.json` listing them and the job timing is added to its output
+    directory; jobs whose results and outputs already exist are skipped, so an interrupted batch can be
+    resumed by running it again. Videos are encoded in the background while the next job generates.
+
+    Jobs with the same `job_batch_key` are generated together, up to `max_batch_size` per pipeline call.
+    Jobs run alone with `checkpoint_steps` resume from the denoising checkpoint left in their output directory.
+
+    Args:
+        jobs (`List[Dict[str, Any]]`): The jobs, e.g. read by `load_jobs_file`.
+        args (`Dict[str, Any]`): The default arguments of all the jobs, including the `MODEL_ARGS`.
+        pipeline (`LTXVideoPipeline`, *optional*): The pipeline to use. Created from `args` if not given.
+        max_batch_size (`int`): The maximal number of jobs generated in a single pipeline call.
+
+    Returns:
+        `Dict[str, List[str]]`: The output paths of each completed job, by job id.
+    """
+    job_params = set(args) - MODEL_ARGS
+    output_root = Path(
+        args.get("output_path") or f"outputs/{datetime.today().strftime('%Y-%m-%d')}"
+    )
+
+    # Validate all the jobs before loading anything
+    pending_jobs = []
+    for index, job in enumerate(jobs):
+        job = dict(job)
+        job_id = str(job.pop("id", index))
+        unknown = set(job) - job_params
+        if unknown:
+            raise ValueError(f"Job {job_id}: unsupported parameters {sorted(unknown)}")
+        if job_id in (pending_job_id for pending_job_id, _ in pending_jobs):
+            raise ValueError(f"Duplicate job id {job_id}")
+        pending_jobs.append((job_id, job))
+
+    results = {}
+    num_skipped = 0
+    failed_jobs = []
+
+    def finish_job(job_id, job_dir, outputs, encoders, job_time):
+        start_time = time.perf_counter()
+        try:
+            for encoder in encoders:
+                encoder.wait()
+        except RuntimeError:
+            logger.exception(f"Job {job_id}: failed")
+            failed_jobs.append(job_id)
+            return
+        job_time["encoding_wait"] = time.perf_counter() - start_time
+        outputs = [str(output) for output in outputs]
+        _write_job_result(job_dir, {"id": job_id, "outputs": outputs, "time": job_time})
+        results[job_id] = outputs
+        logger.warning(
+            f"Job {job_id}: done in {job_time['generation'] + job_time['encoding_wait']:.1f}s "
+            f"(generation {job_time['generation']:.1f}s)"
+        )
+
+    batch_start_time = time.perf_counter()
+    runnable_jobs = []
+    for job_id, job in pending_jobs:
+        job_dir = output_root / job_id
+        outputs = _completed_job_outputs(job_dir)
+        if outputs is not None:
+            logger.warning(f"Job {job_id}: already done, skipping")
+            results[job_id] = outputs
+            num_skipped += 1
+            continue
+        params = resolve_image_path_args({**args, **job, "output_path": str(job_dir)})
+        runnable_jobs.append((job_id, job_dir, params))
+
+    if any(_job_enhances_prompt(params) for _, _, params in runnable_jobs):
+        if pipeline is None:
+            pipeline = create_pipeline_from_args(args)
+        enhance_job_prompts(
+            [params for _, _, params in runnable_jobs],
+            pipeline,
+            batch_size=args.get("prompt_enhancement_batch_size", 8),
+        )
+
+    # The jobs of the previous batch, whose videos are possibly still being encoded
+    unfinished_jobs = []
+    for batch in group_jobs_into_batches(
+        [params for _, _, params in runnable_jobs], max_batch_size
+    ):
+        batch_jobs = [runnable_jobs[index] for index in batch]
+        batch_ids = ", ".join(job_id for job_id, _, _ in batch_jobs)
+        if len(batch_jobs) == 1:
+            # A job interrupted after saving a denoising checkpoint resumes from it
+            job_id, job_dir, params = batch_jobs[0]
+            checkpoint_path = job_dir / DENOISING_CHECKPOINT_FILENAME
+            if (
+                params.get("checkpoint_steps")
+                and not params.get("checkpoint_path")
+                and not params.get("resume_from")
+                and checkpoint_path.is_file()
+            ):
+                params["resume_from"] = str(checkpoint_path)
+        if pipeline is None:
+            pipeline = create_pipeline_from_args(args)
+
+        start_time = time.perf_counter()
+        try:
+            batch_outputs = infer_batch(
+                [params for _, _, params in batch_jobs],
+                pipeline=pipeline,
+                background_encoding=True,
+            )
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(f"Jobs {batch_ids}: failed")
+            failed_jobs.extend(job_id for job_id, _, _ in batch_jobs)
+            continue
+        generation_time = time.perf_counter() - start_time
+        if len(batch_jobs) > 1:
+            logger.warning(
+                f"Jobs {batch_ids}: generated together in {generation_time:.1f}s"
+            )
+        encoders = list(_pending_video_encoders)
+        _pending_video_encoders.clear()
+
+        # The previous batch's videos were encoded while this one generated
+        for unfinished_job in unfinished_jobs:
+            finish_job(*unfinished_job)
+        unfinished_jobs = []
+        for (job_id, job_dir, _), outputs in zip(batch_jobs, batch_outputs):
+            output_paths = {str(output) for output in outputs}
+            unfinished_jobs.append(
+                (
+                    job_id,
+                    job_dir,
+                    outputs,
+                    [encoder for encoder in encoders if encoder.path in output_paths],
+                    {"generation": generation_time, "batch_size": len(batch_jobs)},
+                )
+            )
+
+    for unfinished_job in unfinished_jobs:
+        finish_job(*unfinished_job)
+
+    logger.warning(
+        f"Ran {len(results) - num_skipped} jobs, skipped {num_skipped} completed jobs and "
+        f"{len(failed_jobs)} failed ({', '.join(failed_jobs) or 'none'}) "
+        f"in {time.perf_counter() - batch_start_time:.1f}s"
+    )
+    if failed_jobs:
+        raise RuntimeError(f"Jobs {', '.join(failed_jobs)} failed")
+    return results
+
+
+def main():
+    parser = create_argument_parser(prompt_required=False)
+    parser.add_argument(
+        "--jobs_file",
+        type=str,
+        default=None,
+        help="JSONL file of jobs to run with a single pipeline, one JSON object of argument overrides per line "
+        "(e.g. prompt, seed, height, width, num_frames, conditioning and guidance arguments). Each job is written "
+        "to <output_path>/<id>, and jobs that already completed are skipped.",
+    )
+    parser.add_argument(
+        "--max_batch_size",
+        type=int,
+        default=1,
+        help="With --jobs_file, the maximal number of jobs of the same size and settings generated together "
+        "in a single batched pipeline call.",
+    )
+    args = vars(parser.parse_args())
+    jobs_file = args.pop("jobs_file")
+    max_batch_size = args.pop("max_batch_size")
+    if jobs_file is None and not args["prompt"]:
+        parser.error("one of the arguments --prompt --jobs_file is required")
+
+    if jobs_file is not None:
+        run_jobs(load_jobs_file(jobs_file), args, max_batch_size=max_batch_size)
+        return
+
+    args = resolve_image_path_args(args)
     logger.warning(f"Running generation with arguments: {args}")
-    infer(**vars(args))
+    infer(**args)
+
+
+def create_pipeline_from_args(args: Dict[str, Any]) -> LTXVideoPipeline:
+    """Creates the pipeline described by the `MODEL_ARGS` of the parsed command line arguments."""
+    return create_ltx_video_pipeline(
+        ckpt_path=args["ckpt_path"],
+        precision=args["precision"],
+        text_encoder_model_name_or_path=args["text_encoder_model_name_or_path"],
+        sampler=args["sampler"],
+        solver=args["solver"],
+        text_embedding_cache_dir=args["text_embedding_cache_dir"],
+        conditioning_latent_cache_dir=args["conditioning_latent_cache_dir"],
+        cache_max_disk_gb=args["cache_max_disk_gb"],
+        device=args["device"] or get_device(),
+        # Prompt enhancers are loaded if any job may need them
+        enhance_prompt=args["prompt_enhancement_words_threshold"] > 0,
+        prompt_enhancer_image_caption_model_name_or_path=args[
+            "prompt_enhancer_image_caption_model_name_or_path"
+        ],
+        prompt_enhancer_llm_model_name_or_path=args[
+            "prompt_enhancer_llm_model_name_or_path"
+        ],
+        prompt_enhancer_policy=args["prompt_enhancer_policy"],
+        prompt_enhancer_idle_ttl=args["prompt_enhancer_idle_ttl"],
+        transformer_streaming_budget_gb=args["transformer_streaming_budget_gb"],
+    )
 
 
 def create_ltx_video_pipeline(
@@ -379,26 +1158,70 @@ def create_ltx_video_pipeline(
     sampler: Optional[str] = None,
     device: Optional[str] = None,
     enhance_prompt: bool = False,
+    solver: Optional[str] = None,
+    text_embedding_cache_dir: Optional[str] = None,
+    conditioning_latent_cache_dir: Optional[str] = None,
+    cache_max_disk_gb: Optional[float] = None,
     prompt_enhancer_image_caption_model_name_or_path: Optional[str] = None,
     prompt_enhancer_llm_model_name_or_path: Optional[str] = None,
+    prompt_enhancer_policy: str = "idle_ttl",
+    prompt_enhancer_idle_ttl: float = 300.0,
+    transformer_streaming_budget_gb: Optional[float] = None,
 ) -> LTXVideoPipeline:
     ckpt_path = Path(ckpt_path)
     assert os.path.exists(
         ckpt_path
     ), f"Ckpt path provided (--ckpt_path) {ckpt_path} does not exist"
-    vae = CausalVideoAutoencoder.from_pretrained(ckpt_path)
-    transformer = Transformer3DModel.from_pretrained(ckpt_path)
 
-    # Use constructor if sampler is specified, otherwise use from_pretrained
-    if sampler:
-        scheduler = RectifiedFlowScheduler(
-            sampler=("Uniform" if sampler.lower() == "uniform" else "LinearQuadratic")
+    # Open and memory-map the checkpoint once, and build every component from the same mapping.
+    # Weights are loaded directly in their target dtype, without an intermediate fp32 copy.
+    with SingleFileCheckpoint(ckpt_path) as checkpoint:
+        vae = load_model_from_checkpoint(
+            CausalVideoAutoencoder,
+            checkpoint,
+            "vae",
+            prefix=VAE_PREFIX,
+            dtype=torch.bfloat16,
         )
-    else:
-        scheduler = RectifiedFlowScheduler.from_pretrained(ckpt_path)
+        transformer_dtype = torch.bfloat16 if precision == "bfloat16" else None
+        if transformer_streaming_budget_gb is None:
+            transformer = load_model_from_checkpoint(
+                Transformer3DModel,
+                checkpoint,
+                "transformer",
+                prefix=TRANSFORMER_PREFIX,
+                dtype=transformer_dtype,
+            )
+        else:
+            # The streamed blocks are read from their own mapping, which stays open with the transformer
+            transformer = load_streamed_model_from_checkpoint(
+                Transformer3DModel,
+                SingleFileCheckpoint(ckpt_path),
+                "transformer",
+                max_resident_bytes=int(transformer_streaming_budget_gb * 2**30),
+                prefix=TRANSFORMER_PREFIX,
+                dtype=transformer_dtype,
+                device=device or "cpu",
+            )
+
+        # Use constructor if sampler is specified, otherwise use the checkpoint config
+        solver_kwargs = {"solver": solver} if solver else {}
+        if sampler:
+            scheduler = RectifiedFlowScheduler(
+                sampler=(
+                    "Uniform" if sampler.lower() == "uniform" else "LinearQuadratic"
+                ),
+                **solver_kwargs,
+            )
+        else:
+            scheduler = RectifiedFlowScheduler.from_config(
+                checkpoint.configs["scheduler"], **solver_kwargs
+            )
 
     text_encoder = T5EncoderModel.from_pretrained(
-        text_encoder_model_name_or_path, subfolder="text_encoder"
+        text_encoder_model_name_or_path,
+        subfolder="text_encoder",
+        torch_dtype=torch.bfloat16,
     )
     patchifier = SymmetricPatchifier(patch_size=1)
     tokenizer = T5Tokenizer.from_pretrained(
@@ -407,34 +1230,8 @@ def create_ltx_video_pipeline(
 
     transformer = transformer.to(device)
     vae = vae.to(device)
-    text_encoder = text_encoder.to(device)
 
-    if enhance_prompt:
-        prompt_enhancer_image_caption_model = AutoModelForCausalLM.from_pretrained(
-            prompt_enhancer_image_caption_model_name_or_path, trust_remote_code=True
-        )
-        prompt_enhancer_image_caption_processor = AutoProcessor.from_pretrained(
-            prompt_enhancer_image_caption_model_name_or_path, trust_remote_code=True
-        )
-        prompt_enhancer_llm_model = AutoModelForCausalLM.from_pretrained(
-            prompt_enhancer_llm_model_name_or_path,
-            torch_dtype="bfloat16",
-        )
-        prompt_enhancer_llm_tokenizer = AutoTokenizer.from_pretrained(
-            prompt_enhancer_llm_model_name_or_path,
-        )
-    else:
-        prompt_enhancer_image_caption_model = None
-        prompt_enhancer_image_caption_processor = None
-        prompt_enhancer_llm_model = None
-        prompt_enhancer_llm_tokenizer = None
-
-    vae = vae.to(torch.bfloat16)
-    if precision == "bfloat16" and transformer.dtype != torch.bfloat16:
-        transformer = transformer.to(torch.bfloat16)
-    text_encoder = text_encoder.to(torch.bfloat16)
-
-    # Use submodels for the pipeline
+    # Use submodels for the pipeline. The prompt enhancer models are loaded on demand instead.
     submodel_dict = {
         "transformer": transformer,
         "patchifier": patchifier,
@@ -442,25 +1239,56 @@ def create_ltx_video_pipeline(
         "tokenizer": tokenizer,
         "scheduler": scheduler,
         "vae": vae,
-        "prompt_enhancer_image_caption_model": prompt_enhancer_image_caption_model,
-        "prompt_enhancer_image_caption_processor": prompt_enhancer_image_caption_processor,
-        "prompt_enhancer_llm_model": prompt_enhancer_llm_model,
-        "prompt_enhancer_llm_tokenizer": prompt_enhancer_llm_tokenizer,
+        "prompt_enhancer_image_caption_model": None,
+        "prompt_enhancer_image_caption_processor": None,
+        "prompt_enhancer_llm_model": None,
+        "prompt_enhancer_llm_tokenizer": None,
     }
 
+    # The text encoder stays on the CPU until a prompt that is not in the text embedding cache has to be
+    # encoded, see `LTXVideoPipeline._load_text_encoder_if_needed`
     pipeline = LTXVideoPipeline(**submodel_dict)
-    pipeline = pipeline.to(device)
+
+    if enhance_prompt:
+        pipeline.set_prompt_enhancer_models(
+            PromptEnhancerModels(
+                prompt_enhancer_image_caption_model_name_or_path,
+                prompt_enhancer_llm_model_name_or_path,
+                policy=prompt_enhancer_policy,
+                idle_ttl=prompt_enhancer_idle_ttl,
+            )
+        )
+
+    max_disk_bytes = (
+        int(cache_max_disk_gb * 2**30) if cache_max_disk_gb is not None else None
+    )
+    # Cache the text encoder outputs in memory, and on disk if a cache directory is given
+    pipeline.set_text_embedding_cache(
+        TextEmbeddingCache(
+            encoder_id=f"{text_encoder_model_name_or_path}:{text_encoder.dtype}",
+            cache_dir=text_embedding_cache_dir,
+            max_disk_bytes=max_disk_bytes,
+        )
+    )
+    # Cache the encoded conditioning media in memory, and on disk if a cache directory is given
+    pipeline.set_conditioning_latent_cache(
+        ConditioningLatentCache(
+            vae_id=f"{ckpt_path.resolve()}:{vae.dtype}",
+            cache_dir=conditioning_latent_cache_dir,
+            max_disk_bytes=max_disk_bytes,
+        )
+    )
     return pipeline
 
 
 def infer(
     ckpt_path: str,
-    output_path: Optional[str],
-    seed: int,
+    output_path: Union[Optional[str], List[Optional[str]]],
+    seed: Union[int, List[int]],
     num_inference_steps: int,
     num_images_per_prompt: int,
-    guidance_scale: float,
-    stg_scale: float,
+    guidance_scale: Union[float, List[float]],
+    stg_scale: Union[float, List[float]],
     stg_rescale: float,
     stg_mode: str,
     stg_skip_layers: str,
@@ -472,20 +1300,64 @@ def infer(
     precision: str,
     decode_timestep: float,
     decode_noise_scale: float,
-    prompt: str,
-    negative_prompt: str,
+    prompt: Union[str, List[str]],
+    negative_prompt: Union[str, List[str]],
     offload_to_cpu: bool,
     text_encoder_model_name_or_path: str,
     conditioning_media_paths: Optional[List[str]] = None,
     conditioning_strengths: Optional[List[float]] = None,
     conditioning_start_frames: Optional[List[int]] = None,
     sampler: Optional[str] = None,
+    solver: Optional[str] = None,
     device: Optional[str] = None,
     prompt_enhancement_words_threshold: int = 50,
     prompt_enhancer_image_caption_model_name_or_path: str = "MiaoshouAI/Florence-2-large-PromptGen-v2.0",
     prompt_enhancer_llm_model_name_or_path: str = "unsloth/Llama-3.2-3B-Instruct",
+    step_cache_threshold: float = 0.0,
+    guidance_branch_batch_size: Optional[str] = None,
+    vae_decode_tile_size: Optional[List[int]] = None,
+    vae_decode_tile_overlap: Tuple[int, int, int] = (1, 4, 4),
+    stream_chunk_frames: Optional[int] = None,
+    video_preset: str = "balanced",
+    background_encoding: bool = False,
+    cfg_step_range: Optional[List[int]] = None,
+    cfg_sigma_range: Optional[List[float]] = None,
+    stg_step_range: Optional[List[int]] = None,
+    stg_sigma_range: Optional[List[float]] = None,
+    text_embedding_cache_dir: Optional[str] = None,
+    conditioning_latent_cache_dir: Optional[str] = None,
+    cache_max_disk_gb: Optional[float] = None,
+    checkpoint_steps: int = 0,
+    checkpoint_path: Optional[str] = None,
+    resume_from: Optional[str] = None,
+    preview_steps: int = 0,
+    latent_preview_path: Optional[str] = None,
+    profile: bool = False,
+    profile_transformer_blocks: bool = False,
+    profile_memory: bool = False,
+    aspect_ratio_bin: Optional[int] = None,
+    prompt_enhancement_batch_size: int = 8,
+    prompt_enhancer_policy: str = "idle_ttl",
+    prompt_enhancer_idle_ttl: float = 300.0,
+    transformer_streaming_budget_gb: Optional[float] = None,
+    pipeline: Optional[LTXVideoPipeline] = None,
     **kwargs,
-):
+) -> List[Path]:
+    """
+    Generates a video (or image) and writes it to `output_path`.
+
+    `prompt` may be a list, to generate a batch of videos of the same size in a single pipeline call.
+    `negative_prompt`, `seed` and `output_path` are then either shared or lists with one value per prompt.
+
+    If `pipeline` is given it is used as is, which lets long-lived processes keep the models resident
+    across calls. Otherwise a pipeline is created from `ckpt_path` and the other model arguments.
+
+    If `background_encoding` is True, the function returns while the videos are still being encoded,
+    so the caller can start the next generation; `wait_for_video_encoders` waits for the files.
+
+    Returns:
+        The paths of the written output files.
+    """
     if kwargs.get("input_image_path", None):
         logger.warning(
             "Please use conditioning_media_paths instead of input_image_path."
@@ -518,7 +1390,23 @@ def infer(
                 f"All conditioning start frames must be between 0 and {num_frames-1}"
             )
 
-    seed_everething(seed)
+    profiler = (
+        StageProfiler(track_memory=profile_memory)
+        if profile or profile_memory
+        else NULL_PROFILER
+    )
+
+    # A batch of prompts, each with its own seed and output directory
+    prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+    negative_prompts = _per_prompt_values(
+        negative_prompt, len(prompts), "negative_prompt"
+    )
+    seeds = _per_prompt_values(seed, len(prompts), "seed")
+    output_paths = _per_prompt_values(output_path, len(prompts), "output_path")
+    if len(prompts) > 1 and num_images_per_prompt != 1:
+        raise ValueError("A batch of prompts requires `num_images_per_prompt` to be 1")
+
+    seed_everething(seeds[0])
     if offload_to_cpu and not torch.cuda.is_available():
         logger.warning(
             "offload_to_cpu is set to True, but offloading will not occur since the model is already running on CPU."
@@ -527,12 +1415,19 @@ def infer(
     else:
         offload_to_cpu = offload_to_cpu and get_total_gpu_memory() < 30
 
-    output_dir = (
-        Path(output_path)
-        if output_path
-        else Path(f"outputs/{datetime.today().strftime('%Y-%m-%d')}")
-    )
-    output_dir.mkdir(parents=True, exist_ok=True)
+    output_dirs = [
+        (
+            Path(output_path)
+            if output_path
+            else Path(f"outputs/{datetime.today().strftime('%Y-%m-%d')}")
+        )
+        for output_path in output_paths
+    ]
+    for output_dir in output_dirs:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    if aspect_ratio_bin:
+        height, width = snap_to_aspect_ratio_bin(height, width, aspect_ratio_bin)
 
     # Adjust dimensions to be divisible by 32 and num_frames to be (N * 8 + 1)
     height_padded = ((height - 1) // 32 + 1) * 32
@@ -545,7 +1440,22 @@ def infer(
         f"Padded dimensions: {height_padded}x{width_padded}x{num_frames_padded}"
     )
 
-    prompt_word_count = len(prompt.split())
+    # Guidance schedules: the extra branches are only evaluated on the steps where their guidance is active
+    cfg_schedule = GuidanceSchedule.from_value(guidance_scale)
+    if cfg_step_range is not None:
+        cfg_schedule.step_range = tuple(cfg_step_range)
+    if cfg_sigma_range is not None:
+        cfg_schedule.sigma_range = tuple(cfg_sigma_range)
+    stg_schedule = GuidanceSchedule.from_value(stg_scale)
+    if stg_step_range is not None:
+        stg_schedule.step_range = tuple(stg_step_range)
+    if stg_sigma_range is not None:
+        stg_schedule.sigma_range = tuple(stg_sigma_range)
+    # Fail on per-step scales of the wrong length before loading or encoding anything
+    cfg_schedule.validate(num_inference_steps)
+    stg_schedule.validate(num_inference_steps)
+
+    prompt_word_count = max(len(prompt.split()) for prompt in prompts)
     enhance_prompt = (
         prompt_enhancement_words_threshold > 0
         and prompt_word_count < prompt_enhancement_words_threshold
@@ -556,31 +1466,48 @@ def infer(
             f"Prompt has {prompt_word_count} words, which exceeds the threshold of {prompt_enhancement_words_threshold}. Prompt enhancement disabled."
         )
 
-    pipeline = create_ltx_video_pipeline(
-        ckpt_path=ckpt_path,
-        precision=precision,
-        text_encoder_model_name_or_path=text_encoder_model_name_or_path,
-        sampler=sampler,
-        device=kwargs.get("device", get_device()),
-        enhance_prompt=enhance_prompt,
-        prompt_enhancer_image_caption_model_name_or_path=prompt_enhancer_image_caption_model_name_or_path,
-        prompt_enhancer_llm_model_name_or_path=prompt_enhancer_llm_model_name_or_path,
-    )
-
-    conditioning_items = (
-        prepare_conditioning(
-            conditioning_media_paths=conditioning_media_paths,
-            conditioning_strengths=conditioning_strengths,
-            conditioning_start_frames=conditioning_start_frames,
-            height=height,
-            width=width,
-            num_frames=num_frames,
-            padding=padding,
-            pipeline=pipeline,
+    if pipeline is None:
+        with profiler.stage("model_loading"):
+            pipeline = create_ltx_video_pipeline(
+                ckpt_path=ckpt_path,
+                precision=precision,
+                text_encoder_model_name_or_path=text_encoder_model_name_or_path,
+                sampler=sampler,
+                solver=solver,
+                text_embedding_cache_dir=text_embedding_cache_dir,
+                conditioning_latent_cache_dir=conditioning_latent_cache_dir,
+                cache_max_disk_gb=cache_max_disk_gb,
+                device=kwargs.get("device", get_device()),
+                enhance_prompt=enhance_prompt,
+                prompt_enhancer_image_caption_model_name_or_path=prompt_enhancer_image_caption_model_name_or_path,
+                prompt_enhancer_llm_model_name_or_path=prompt_enhancer_llm_model_name_or_path,
+                prompt_enhancer_policy=prompt_enhancer_policy,
+                prompt_enhancer_idle_ttl=prompt_enhancer_idle_ttl,
+                transformer_streaming_budget_gb=transformer_streaming_budget_gb,
+            )
+    elif enhance_prompt and not pipeline.has_prompt_enhancer:
+        logger.warning(
+            "Prompt enhancement requested, but the pipeline was created without the prompt enhancer models. Prompt enhancement disabled."
+        )
+        enhance_prompt = False
+
+    with profiler.stage("conditioning_encoding"):
+        conditioning_items = (
+            prepare_conditioning(
+                conditioning_media_paths=conditioning_media_paths,
+                conditioning_strengths=conditioning_strengths,
+                conditioning_start_frames=conditioning_start_frames,
+                height=height,
+                width=width,
+                num_frames=num_frames,
+                padding=padding,
+                pipeline=pipeline,
+                vae_per_channel_normalize=True,
+                keep_media=enhance_prompt,
+            )
+            if conditioning_media_paths
+            else None
         )
-        if conditioning_media_paths
-        else None
-    )
 
     # Set spatiotemporal guidance
     skip_block_list = [int(x.strip()) for x in stg_skip_layers.split(",")]
@@ -597,88 +1524,267 @@ def infer(
 
     # Prepare input for the pipeline
     sample = {
-        "prompt": prompt,
+        "prompt": prompts,
         "prompt_attention_mask": None,
-        "negative_prompt": negative_prompt,
+        "negative_prompt": negative_prompts,
         "negative_prompt_attention_mask": None,
     }
 
     device = device or get_device()
-    generator = torch.Generator(device=device).manual_seed(seed)
-
-    images = pipeline(
-        num_inference_steps=num_inference_steps,
-        num_images_per_prompt=num_images_per_prompt,
-        guidance_scale=guidance_scale,
-        skip_layer_strategy=skip_layer_strategy,
-        skip_block_list=skip_block_list,
-        stg_scale=stg_scale,
-        do_rescaling=stg_rescale != 1,
-        rescaling_scale=stg_rescale,
-        generator=generator,
-        output_type="pt",
-        callback_on_step_end=None,
-        height=height_padded,
-        width=width_padded,
-        num_frames=num_frames_padded,
-        frame_rate=frame_rate,
-        **sample,
-        conditioning_items=conditioning_items,
-        is_video=True,
-        vae_per_channel_normalize=True,
-        image_cond_noise_scale=image_cond_noise_scale,
-        decode_timestep=decode_timestep,
-        decode_noise_scale=decode_noise_scale,
-        mixed_precision=(precision == "mixed_precision"),
-        offload_to_cpu=offload_to_cpu,
-        device=device,
-        enhance_prompt=enhance_prompt,
-    ).images
+    if len(prompts) == 1:
+        generator = torch.Generator(device=device).manual_seed(seeds[0])
+    else:
+        # One generator per prompt, so each video only depends on its own seed
+        generator = [torch.Generator(device=device).manual_seed(seed) for seed in seeds]
+
+    # Denoising checkpoints, with what decode_latents.py needs to decode them
+    checkpoint_callback = None
+    if checkpoint_steps > 0 or checkpoint_path:
+        checkpoint_path = (
+            checkpoint_path or output_dirs[0] / DENOISING_CHECKPOINT_FILENAME
+        )
+        checkpoint_metadata = {
+            "prompts": prompts,
+            "seeds": seeds,
+            "num_images_per_prompt": num_images_per_prompt,
+            "height": height,
+            "width": width,
+            "num_frames": num_frames,
+            "padding": list(padding),
+            "frame_rate": frame_rate,
+            "decode_timestep": decode_timestep,
+            "decode_noise_scale": decode_noise_scale,
+        }
+
+        def checkpoint_callback(state: Dict[str, Any]):
+            save_denoising_checkpoint(
+                checkpoint_path, {**state, "metadata": checkpoint_metadata}
+            )
 
-    # Crop the padded images to the desired resolution and number of frames
-    (pad_left, pad_right, pad_top, pad_bottom) = padding
-    pad_bottom = -pad_bottom
-    pad_right = -pad_right
-    if pad_bottom == 0:
-        pad_bottom = images.shape[3]
-    if pad_right == 0:
-        pad_right = images.shape[4]
-    images = images[:, :, :num_frames, pad_top:pad_bottom, pad_left:pad_right]
-
-    for i in range(images.shape[0]):
-        # Gathering from B, C, F, H, W to C, F, H, W and then permuting to F, H, W, C
-        video_np = images[i].permute(1, 2, 3, 0).cpu().float().numpy()
-        # Unnormalizing images to [0, 255] range
-        video_np = (video_np * 255).astype(np.uint8)
-        fps = frame_rate
-        height, width = video_np.shape[1:3]
-        # In case a single image is generated
-        if video_np.shape[0] == 1:
-            output_filename = get_unique_filename(
-                f"image_output_{i}",
-                ".png",
-                prompt=prompt,
-                seed=seed,
-                resolution=(height, width, num_frames),
-                dir=output_dir,
+    resume_state = None
+    if resume_from:
+        resume_state = load_denoising_checkpoint(resume_from)
+        logger.warning(
+            f"Resuming from step {resume_state['step']} of {len(resume_state['timesteps'])} of {resume_from}"
+        )
+
+    # Previews of the denoised videos, overwritten as the denoising progresses
+    latent_previewer = None
+    preview_callback = None
+    if preview_steps > 0:
+        if not latent_preview_path:
+            raise ValueError(
+                "Previews need a latent projection, fitted with fit_latent_preview.py"
             )
-            imageio.imwrite(output_filename, video_np[0])
-        else:
-            output_filename = get_unique_filename(
-                f"video_output_{i}",
-                ".mp4",
-                prompt=prompt,
-                seed=seed,
-                resolution=(height, width, num_frames),
-                dir=output_dir,
+        latent_previewer = LatentPreviewer.from_file(latent_preview_path)
+
+        def preview_callback(pipeline, step, timestep, callback_kwargs):
+            preview = callback_kwargs.get("preview")
+            if preview is None:
+                return
+            # Crop the padding and upscale the latent grid to a viewable size
+            pad_left, pad_right, pad_top, pad_bottom = (
+                pad // pipeline.vae_scale_factor for pad in padding
             )
+            preview = preview[
+                :,
+                :,
+                pad_top : preview.shape[2] - pad_bottom,
+                pad_left : preview.shape[3] - pad_right,
+            ]
+            preview = preview.repeat_interleave(PREVIEW_UPSCALE, dim=2)
+            preview = preview.repeat_interleave(PREVIEW_UPSCALE, dim=3).cpu().numpy()
+            for i in range(preview.shape[0]):
+                preview_path = (
+                    output_dirs[i // num_images_per_prompt] / f"preview_{i}.mp4"
+                )
+                tmp_path = preview_path.with_suffix(".tmp.mp4")
+                write_video(
+                    tmp_path,
+                    preview[i],
+                    fps=frame_rate / pipeline.video_scale_factor,
+                    preset="fast",
+                )
+                os.replace(tmp_path, preview_path)
+            logger.warning(f"Preview of step {step + 1} saved")
+
+    step_cache = (
+        TransformerStepCache(threshold=step_cache_threshold)
+        if step_cache_threshold > 0
+        else None
+    )
+
+    num_conds = 1 + (cfg_schedule.max_scale > 1.0) + (stg_schedule.max_scale > 0.0)
+    latent_height = height_padded // pipeline.vae_scale_factor
+    latent_width = width_padded // pipeline.vae_scale_factor
+    latent_num_frames = num_frames_padded // pipeline.video_scale_factor + 1
+    guidance_branch_batch_size = resolve_guidance_branch_batch_size(
+        guidance_branch_batch_size,
+        num_conds=num_conds,
+        num_latent_tokens=latent_num_frames * latent_height * latent_width,
+        device=device,
+    )
 
-            # Write video
-            with imageio.get_writer(output_filename, fps=fps) as video:
-                for frame in video_np:
-                    video.append_data(frame)
+    # Only decode the desired resolution and number of frames, without the padding
+    (pad_left, pad_right, pad_top, pad_bottom) = padding
+    decode_output_region = (
+        (0, num_frames),
+        (pad_top, height_padded - pad_bottom),
+        (pad_left, width_padded - pad_right),
+    )
 
-        logger.warning(f"Output saved to {output_dir}")
+    if stream_chunk_frames is not None:
+        # Decode and write the video in chunks of latent frames, spatially tiled as requested
+        spatial_tile_size = (
+            tuple(vae_decode_tile_size[1:]) if vae_decode_tile_size else (None, None)
+        )
+        vae_decode_tile_size = (stream_chunk_frames,) + spatial_tile_size
+
+    # Videos are streamed to their files as their frames are decoded
+    video_writers = {}
+
+    def write_video_frames(frames: torch.Tensor):
+        for i in range(frames.shape[0]):
+            if i not in video_writers:
+                item = i // num_images_per_prompt
+                output_filename = get_unique_filename(
+                    f"video_output_{i}",
+                    ".mp4",
+                    prompt=prompts[item],
+                    seed=seeds[item],
+                    resolution=(height, width, num_frames),
+                    dir=output_dirs[item],
+                )
+                video_writers[i] = (
+                    output_filename,
+                    BackgroundVideoEncoder(
+                        output_filename, fps=frame_rate, preset=video_preset
+                    ),
+                )
+            # The frames are already F, H, W, C uint8: hand them to the encoder without a copy
+            _, video = video_writers[i]
+            with profiler.stage("write_frames"):
+                video.write(frames[i].cpu().numpy())
+
+    if profile_transformer_blocks and profiler.enabled:
+        profiler.add_module_hooks(
+            pipeline.transformer.transformer_blocks, "transformer_block"
+        )
+    if profile_memory:
+        profiler.snapshot_modules("before_generation", pipeline.components)
+    try:
+        images = pipeline(
+            num_inference_steps=num_inference_steps,
+            num_images_per_prompt=num_images_per_prompt,
+            guidance_scale=cfg_schedule,
+            skip_layer_strategy=skip_layer_strategy,
+            skip_block_list=skip_block_list,
+            stg_scale=stg_schedule,
+            do_rescaling=stg_rescale != 1,
+            rescaling_scale=stg_rescale,
+            generator=generator,
+            output_type="uint8",
+            callback_on_step_end=preview_callback,
+            height=height_padded,
+            width=width_padded,
+            num_frames=num_frames_padded,
+            frame_rate=frame_rate,
+            **sample,
+            conditioning_items=conditioning_items,
+            is_video=True,
+            vae_per_channel_normalize=True,
+            image_cond_noise_scale=image_cond_noise_scale,
+            decode_timestep=decode_timestep,
+            decode_noise_scale=decode_noise_scale,
+            mixed_precision=(precision == "mixed_precision"),
+            offload_to_cpu=offload_to_cpu,
+            device=device,
+            enhance_prompt=enhance_prompt,
+            prompt_enhancement_batch_size=prompt_enhancement_batch_size,
+            step_cache=step_cache,
+            guidance_branch_batch_size=guidance_branch_batch_size,
+            decode_tile_size=vae_decode_tile_size,
+            decode_tile_overlap=vae_decode_tile_overlap,
+            decode_output_region=decode_output_region,
+            decoded_frames_callback=write_video_frames if num_frames > 1 else None,
+            checkpoint_callback=checkpoint_callback,
+            checkpoint_steps=checkpoint_steps,
+            resume_state=resume_state,
+            latent_previewer=latent_previewer,
+            preview_steps=preview_steps,
+            profiler=profiler,
+        ).images
+    finally:
+        if profiler.enabled:
+            profiler.remove_hooks()
+        # The videos are finished in the background, on the encoders' threads
+        for _, video in video_writers.values():
+            video.close()
+
+    if step_cache is not None:
+        logger.warning(step_cache.summary())
+
+    output_filenames = []
+    for output_filename, video in video_writers.values():
+        if background_encoding:
+            _pending_video_encoders.append(video)
+        else:
+            with profiler.stage("video_encoding_wait"):
+                video.wait()
+        output_filenames.append(output_filename)
+        logger.warning(f"Output saved to {output_filename.parent}")
+
+    # In case single images are generated
+    for i in range(images.shape[0] if images is not None else 0):
+        image_np = images[i].cpu().numpy()
+        item = i // num_images_per_prompt
+        output_filename = get_unique_filename(
+            f"image_output_{i}",
+            ".png",
+            prompt=prompts[item],
+            seed=seeds[item],
+            resolution=(height, width, num_frames),
+            dir=output_dirs[item],
+        )
+        with profiler.stage("write_frames"):
+            imageio.imwrite(output_filename, image_np[0])
+        output_filenames.append(output_filename)
+        logger.warning(f"Output saved to {output_filename.parent}")
+
+    if profile_memory:
+        profiler.snapshot_modules("after_generation", pipeline.components)
+    if profiler.enabled:
+        profiler.save_summary(output_dirs[0] / PROFILE_SUMMARY_FILENAME)
+        profiler.save_chrome_trace(output_dirs[0] / PROFILE_TRACE_FILENAME)
+        logger.warning(profiler.format_summary())
+
+    return output_filenames
+
+
+def _load_conditioning_media(
+    path: str,
+    is_video: bool,
+    num_input_frames: int,
+    start_frame: int,
+    height: int,
+    width: int,
+    num_frames: int,
+    padding: tuple[int, int, int, int],
+    pipeline: LTXVideoPipeline,
+) -> torch.Tensor:
+    if not is_video:
+        frame_tensor = load_image_to_tensor_with_resize_and_crop(path, height, width)
+        return torch.nn.functional.pad(frame_tensor, padding)
+
+    # Decode only the relevant frames, in a single pass
+    frames = read_video_frames(path, num_input_frames)
+    if len(frames) < num_input_frames:
+        # The metadata overestimated the number of frames
+        num_input_frames = pipeline.trim_conditioning_sequence(
+            start_frame, len(frames), num_frames
+        )
+        frames = frames[:num_input_frames]
+    return load_video_to_tensor_with_resize_and_crop(frames, height, width, padding)
 
 
 def prepare_conditioning(
@@ -690,9 +1796,14 @@ def prepare_conditioning(
     num_frames: int,
     padding: tuple[int, int, int, int],
     pipeline: LTXVideoPipeline,
+    vae_per_channel_normalize: bool = True,
+    keep_media: bool = False,
 ) -> Optional[List[ConditioningItem]]:
     """Prepare conditioning items based on input media paths and their parameters.
 
+    If the pipeline has a conditioning latent cache, the items carry their latents: media found in the cache
+    are neither loaded nor encoded again, and the others are encoded here and added to the cache.
+
     Args:
         conditioning_media_paths: List of paths to conditioning media (images or videos)
         conditioning_strengths: List of conditioning strengths for each media item
@@ -702,10 +1813,13 @@ def prepare_conditioning(
         num_frames: Number of frames in the output video
         padding: Padding to apply to the frames
         pipeline: LTXVideoPipeline object used for condition video trimming
+        vae_per_channel_normalize: Whether the latents are normalized per channel, as passed to the pipeline
+        keep_media: Whether to load the media of cached items anyway, e.g. for prompt enhancement
 
     Returns:
         A list of ConditioningItem objects.
     """
+    cache = pipeline.conditioning_latent_cache
     conditioning_items = []
     for path, strength, start_frame in zip(
         conditioning_media_paths, conditioning_strengths, conditioning_start_frames
@@ -715,9 +1829,10 @@ def prepare_conditioning(
             path.lower().endswith(ext) for ext in [".mp4", ".avi", ".mov", ".mkv"]
         )
 
+        num_input_frames = 1
         if is_video:
-            reader = imageio.get_reader(path)
-            orig_num_input_frames = reader.count_frames()
+            # The frame count comes from the container metadata, without decoding the video
+            orig_num_input_frames = count_video_frames(path)
             num_input_frames = pipeline.trim_conditioning_sequence(
                 start_frame, orig_num_input_frames, num_frames
             )
@@ -726,30 +1841,41 @@ def prepare_conditioning(
                     f"Trimming conditioning video {path} from {orig_num_input_frames} to {num_input_frames} frames."
                 )
 
-            # Read and preprocess the relevant frames from the video file.
-            frames = []
-            for i in range(num_input_frames):
-                frame = Image.fromarray(reader.get_data(i))
-                frame_tensor = load_image_to_tensor_with_resize_and_crop(
-                    frame, height, width
-                )
-                frame_tensor = torch.nn.functional.pad(frame_tensor, padding)
-                frames.append(frame_tensor)
-            reader.close()
-
-            # Stack frames along the temporal dimension
-            video_tensor = torch.cat(frames, dim=2)
-            conditioning_items.append(
-                ConditioningItem(video_tensor, start_frame, strength)
+        # Encoded media are looked up by content, before decoding anything
+        latents = None
+        if cache is not None:
+            cache_key = cache.key(
+                cache.media_hash(path),
+                height,
+                width,
+                padding,
+                (0, num_input_frames),
+                vae_per_channel_normalize,
             )
-        else:  # Input image
-            frame_tensor = load_image_to_tensor_with_resize_and_crop(
-                path, height, width
+            latents = cache.get(cache_key)
+
+        media_tensor = None
+        if latents is None or keep_media:
+            media_tensor = _load_conditioning_media(
+                path,
+                is_video,
+                num_input_frames,
+                start_frame,
+                height,
+                width,
+                num_frames,
+                padding,
+                pipeline,
             )
-            frame_tensor = torch.nn.functional.pad(frame_tensor, padding)
-            conditioning_items.append(
-                ConditioningItem(frame_tensor, start_frame, strength)
+        if latents is None and cache is not None:
+            latents = pipeline.encode_conditioning_media(
+                media_tensor, vae_per_channel_normalize
             )
+            cache.put(cache_key, latents)
+
+        conditioning_items.append(
+            ConditioningItem(media_tensor, start_frame, strength, latents=latents)
+        )
 
     return conditioning_items
 
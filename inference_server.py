@@ -0,0 +1,614 @@
+import json
+import mimetypes
+import os
+import queue
+import signal
+import socketserver
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Collection, Dict, List, Optional
+
+from diffusers.utils import logging
+
+logger = logging.get_logger("LTX-Video")
+
+# Arguments of the server itself
+SERVER_ARGS = {
+    "host",
+    "port",
+    "unix_socket",
+    "max_queue_size",
+    "max_batch_size",
+    "max_batch_wait",
+    "max_finished_jobs",
+    "finished_job_ttl",
+}
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+@dataclass
+class Job:
+    job_id: str
+    params: Dict[str, Any]
+    status: str = JOB_QUEUED
+    outputs: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "params": self.params,
+            "outputs": self.outputs,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    A FIFO queue of generation jobs, executed by a single worker thread.
+
+    With `max_batch_size` > 1, the worker runs the oldest pending job together with the other pending jobs of
+    the same `batch_key`, in a single `run_batch` call. If the batch is not full, it waits up to
+    `max_batch_wait` seconds for more jobs of that bucket to arrive.
+
+    Args:
+        run_batch (`Callable`): Runs a batch of jobs from their parameters and returns the paths of the output
+            files of each job.
+        max_queue_size (`int`): Maximum number of pending jobs, 0 for unbounded.
+        batch_key (`Callable`, *optional*): Returns the bucket of a job's parameters, or None if the job has
+            to run alone. Without it, all the jobs run alone.
+        max_batch_size (`int`): Maximum number of jobs per batch.
+        max_batch_wait (`float`): Maximum time to wait for a batch to fill up, in seconds.
+        max_finished_jobs (`int`): Maximum number of finished (succeeded, failed or cancelled) jobs kept for
+            their status and results, the oldest are forgotten first. 0 for unbounded.
+        finished_job_ttl (`float`): Time in seconds after which finished jobs are forgotten. 0 to keep them.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Dict[str, Any]]], List[List[Path]]],
+        max_queue_size: int = 0,
+        batch_key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        max_batch_size: int = 1,
+        max_batch_wait: float = 0.0,
+        max_finished_jobs: int = 1000,
+        finished_job_ttl: float = 3600.0,
+    ):
+        self.run_batch = run_batch
+        self.max_queue_size = max_queue_size
+        self.batch_key = batch_key
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait
+        self.max_finished_jobs = max_finished_jobs
+        self.finished_job_ttl = finished_job_ttl
+        self._jobs: Dict[str, Job] = {}
+        # Queued jobs in submission order. Cancelled jobs are dropped lazily by the worker.
+        self._pending: deque = deque()
+        # The queued jobs taken from `_pending` while the worker waits for their batch to fill up
+        self._filling_batch: List[Job] = []
+        # Finished jobs by finish time, oldest first, for their retention
+        self._finished: "OrderedDict[str, Job]" = OrderedDict()
+        self._status_counts: Dict[str, int] = {status: 0 for status in JOB_STATUSES}
+        self._batch_keys: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._pending_changed = threading.Condition(self._lock)
+        self._accepting = True
+        self._worker = threading.Thread(
+            target=self._work, name="ltxv-job-worker", daemon=True
+        )
+        self._worker.start()
+
+    def submit(self, params: Dict[str, Any]) -> Job:
+        batch_key = (
+            self.batch_key(params)
+            if self.batch_key is not None and self.max_batch_size > 1
+            else None
+        )
+        with self._lock:
+            if not self._accepting:
+                raise RuntimeError("The server is shutting down")
+            if self.max_queue_size and self.num_pending() >= self.max_queue_size:
+                raise queue.Full()
+            self._forget_finished_jobs()
+            job = Job(job_id=uuid.uuid4().hex, params=params)
+            self._jobs[job.job_id] = job
+            self._status_counts[JOB_QUEUED] += 1
+            self._batch_keys[job.job_id] = batch_key
+            self._pending.append(job)
+            self._pending_changed.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a queued job. Running or finished jobs cannot be cancelled."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != JOB_QUEUED:
+                return False
+            self._finish(job, JOB_CANCELLED, time.time())
+            return True
+
+    @property
+    def accepting(self) -> bool:
+        return self._accepting
+
+    def num_pending(self) -> int:
+        return self._status_counts[JOB_QUEUED]
+
+    def stats(self) -> Dict[str, int]:
+        """The number of known jobs of each status, finished jobs included until they are forgotten."""
+        with self._lock:
+            return {
+                status: count for status, count in self._status_counts.items() if count
+            }
+
+    def _set_status(self, job: Job, status: str):
+        """Called with the lock held."""
+        self._status_counts[job.status] -= 1
+        self._status_counts[status] += 1
+        job.status = status
+
+    def _finish(self, job: Job, status: str, finished_at: float):
+        """Marks a job as finished and keeps it for the retention. Called with the lock held."""
+        self._set_status(job, status)
+        job.finished_at = finished_at
+        self._batch_keys.pop(job.job_id, None)
+        self._finished[job.job_id] = job
+
+    def _forget_finished_jobs(self):
+        """Forgets the finished jobs beyond the retention count or age. Called with the lock held."""
+        expiry = time.time() - self.finished_job_ttl
+        while self._finished:
+            job = next(iter(self._finished.values()))
+            if not (
+                (
+                    self.max_finished_jobs
+                    and len(self._finished) > self.max_finished_jobs
+                )
+                or (self.finished_job_ttl and job.finished_at < expiry)
+            ):
+                break
+            del self._finished[job.job_id]
+            del self._jobs[job.job_id]
+            self._status_counts[job.status] -= 1
+
+    def shutdown(self, drain: bool = True, timeout: Optional[float] = None):
+        """
+        Stops accepting jobs and waits for the worker to exit. If `drain` is True the pending jobs are run
+        first, otherwise they are cancelled. The running jobs, if any, are always allowed to finish.
+        """
+        with self._lock:
+            self._accepting = False
+            if not drain:
+                finished_at = time.time()
+                for job in [*self._pending, *self._filling_batch]:
+                    if job.status == JOB_QUEUED:
+                        self._finish(job, JOB_CANCELLED, finished_at)
+            self._pending_changed.notify()
+        self._worker.join(timeout)
+
+    def _take_batch_jobs(self, batch: List[Job], batch_key: Any):
+        """Moves the pending jobs of `batch_key` to `batch`, up to the maximal batch size. Called with the lock held."""
+        for job in list(self._pending):
+            if len(batch) >= self.max_batch_size:
+                return
+            if job.status == JOB_QUEUED and self._batch_keys[job.job_id] == batch_key:
+                self._pending.remove(job)
+                batch.append(job)
+
+    def _next_batch(self) -> Optional[List[Job]]:
+        """Waits for the next batch of jobs and marks them as running. Returns None once shut down."""
+        with self._lock:
+            while True:
+                # Cancelled jobs are dropped here
+                while self._pending and self._pending[0].status != JOB_QUEUED:
+                    self._pending.popleft()
+                if self._pending:
+                    break
+                if not self._accepting:
+                    return None
+                self._pending_changed.wait()
+
+            batch = [self._pending.popleft()]
+            self._filling_batch = batch
+            batch_key = self._batch_keys[batch[0].job_id]
+            if batch_key is not None:
+                deadline = time.monotonic() + self.max_batch_wait
+                self._take_batch_jobs(batch, batch_key)
+                while len(batch) < self.max_batch_size and self._accepting:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._pending_changed.wait(remaining)
+                    self._take_batch_jobs(batch, batch_key)
+
+            # Jobs cancelled while waiting for the batch to fill up are not run
+            self._filling_batch = []
+            batch = [job for job in batch if job.status == JOB_QUEUED]
+            started_at = time.time()
+            for job in batch:
+                self._set_status(job, JOB_RUNNING)
+                job.started_at = started_at
+            return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            job_ids = ", ".join(job.job_id for job in batch)
+            logger.warning(f"Running job{'s' if len(batch) > 1 else ''} {job_ids}")
+            try:
+                batch_outputs = self.run_batch([dict(job.params) for job in batch])
+                status, error = JOB_SUCCEEDED, None
+            except Exception:  # pylint: disable=broad-except
+                batch_outputs = [[] for _ in batch]
+                status, error = JOB_FAILED, traceback.format_exc()
+                logger.error(
+                    f"Job{'s' if len(batch) > 1 else ''} {job_ids} failed:\n{error}"
+                )
+            with self._lock:
+                finished_at = time.time()
+                for job, outputs in zip(batch, batch_outputs):
+                    job.outputs = [str(output) for output in outputs]
+                    job.error = error
+                    self._finish(job, status, finished_at)
+            for job in batch:
+                logger.warning(
+                    f"Job {job.job_id} {status} in {job.finished_at - job.started_at:.1f}s"
+                )
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API of the inference server:
+        GET  /health                        Server and queue status.
+        POST /jobs                          Submit a job, the body is a JSON object of `infer()` arguments.
+        GET  /jobs/<job_id>                 Job status.
+        DELETE /jobs/<job_id>               Cancel a queued job.
+        GET  /jobs/<job_id>/result          The list of output files of a succeeded job.
+        GET  /jobs/<job_id>/result/<index>  The content of an output file.
+        POST /shutdown                      Graceful shutdown. Pending jobs are run first unless `drain` is
+                                            false in the JSON body.
+    """
+
+    server_version = "LTXVideoServer/1.0"
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.info(f"{self.address_string()} - {format % args}")
+
+    @property
+    def jobs(self) -> JobQueue:
+        return self.server.job_queue
+
+    def _send_json(self, status: HTTPStatus, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        self._send_json(status, {"error": message})
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        if length == 0:
+            return {}
+        payload = json.loads(self.rfile.read(length))
+        if not isinstance(payload, dict):
+            raise ValueError("The request body must be a JSON object")
+        return payload
+
+    def _path_parts(self) -> List[str]:
+        return [part for part in self.path.split("?")[0].split("/") if part]
+
+    def do_GET(self):
+        parts = self._path_parts()
+        if parts == ["health"]:
+            self._send_json(
+                HTTPStatus.OK,
+                {"status": "ok", "accepting": self.jobs.accepting, **self.jobs.stats()},
+            )
+            return
+        if len(parts) < 2 or parts[0] != "jobs":
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+            return
+
+        job = self.jobs.get(parts[1])
+        if job is None:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown job {parts[1]}")
+        elif len(parts) == 2:
+            self._send_json(HTTPStatus.OK, job.to_dict())
+        elif parts[2] != "result" or len(parts) > 4:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+        elif job.status != JOB_SUCCEEDED:
+            self._send_json(
+                HTTPStatus.CONFLICT,
+                {"error": f"Job is {job.status}", **job.to_dict()},
+            )
+        elif len(parts) == 3:
+            self._send_json(HTTPStatus.OK, {"outputs": job.outputs})
+        else:
+            self._send_output_file(job, parts[3])
+
+    def _send_output_file(self, job: Job, index: str):
+        try:
+            path = Path(job.outputs[int(index)])
+        except (ValueError, IndexError):
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown output {index}")
+            return
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(path.stat().st_size))
+        self.end_headers()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                self.wfile.write(chunk)
+
+    def do_POST(self):
+        parts = self._path_parts()
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, f"Invalid JSON body: {e}")
+            return
+
+        if parts == ["jobs"]:
+            try:
+                params = self.server.validate_job_params(payload)
+                job = self.jobs.submit(params)
+            except ValueError as e:
+                self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            except queue.Full:
+                self._send_error(
+                    HTTPStatus.SERVICE_UNAVAILABLE, "The job queue is full"
+                )
+            except RuntimeError as e:
+                self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, str(e))
+            else:
+                self._send_json(HTTPStatus.ACCEPTED, job.to_dict())
+        elif parts == ["shutdown"]:
+            self._send_json(HTTPStatus.ACCEPTED, {"status": "shutting down"})
+            self.server.request_shutdown(drain=payload.get("drain", True))
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+
+    def do_DELETE(self):
+        parts = self._path_parts()
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+        elif self.jobs.cancel(parts[1]):
+            self._send_json(HTTPStatus.OK, self.jobs.get(parts[1]).to_dict())
+        elif self.jobs.get(parts[1]) is None:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown job {parts[1]}")
+        else:
+            self._send_error(HTTPStatus.CONFLICT, "Only queued jobs can be cancelled")
+
+
+class _InferenceServerMixin:
+    daemon_threads = True
+
+    def setup_inference(
+        self,
+        job_queue: JobQueue,
+        default_params: Dict[str, Any],
+        model_args: Collection[str] = (),
+        prepare_params: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    ):
+        self.job_queue = job_queue
+        self.default_params = default_params
+        self.model_args = set(model_args)
+        self.prepare_params = prepare_params
+        self._shutdown_started = threading.Event()
+
+    def validate_job_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        unknown = set(params) - (set(self.default_params) - self.model_args)
+        if unknown:
+            raise ValueError(f"Unsupported job parameters: {sorted(unknown)}")
+        params = {**self.default_params, **params}
+        if self.prepare_params is not None:
+            params = self.prepare_params(params)
+        if not params.get("prompt"):
+            raise ValueError("A job must have a `prompt`")
+        return params
+
+    def request_shutdown(self, drain: bool = True):
+        """Stops the server from another thread: the HTTP loop exits, then the job queue is drained."""
+        if self._shutdown_started.is_set():
+            return
+        self._shutdown_started.set()
+
+        def _shutdown():
+            logger.warning(
+                "Shutting down: waiting for the running job"
+                + (" and the queued jobs" if drain else "")
+            )
+            self.job_queue.shutdown(drain=drain)
+            self.shutdown()
+
+        threading.Thread(target=_shutdown, name="ltxv-shutdown").start()
+
+
+class InferenceHTTPServer(_InferenceServerMixin, ThreadingHTTPServer):
+    pass
+
+
+class InferenceUnixHTTPServer(
+    _InferenceServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+
+
+def create_server(
+    run_batch: Callable[[List[Dict[str, Any]]], List[List[Path]]],
+    default_params: Dict[str, Any],
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    unix_socket: Optional[str] = None,
+    max_queue_size: int = 0,
+    max_batch_size: int = 1,
+    max_batch_wait: float = 0.0,
+    max_finished_jobs: int = 1000,
+    finished_job_ttl: float = 3600.0,
+    batch_key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    model_args: Collection[str] = (),
+    prepare_params: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+):
+    """
+    Creates the HTTP server around a batch runner. Neither the models nor `inference` are imported here, so
+    a local client can drive the server with any `run_batch` callable, e.g. in tests.
+
+    Args:
+        run_batch (`Callable`): Runs a batch of jobs, see `JobQueue`.
+        default_params (`Dict[str, Any]`): The parameters of the jobs, which jobs may override except for
+            `model_args`.
+        batch_key (`Callable`, *optional*): The bucket of a job's parameters, see `JobQueue`.
+        model_args (`Collection[str]`): The parameters that jobs cannot override.
+        prepare_params (`Callable`, *optional*): Normalizes the parameters of a submitted job, after they are
+            merged with `default_params`. Raises `ValueError` for invalid parameters.
+    """
+    if unix_socket:
+        server = InferenceUnixHTTPServer(unix_socket, InferenceRequestHandler)
+    else:
+        server = InferenceHTTPServer((host, port), InferenceRequestHandler)
+    job_queue = JobQueue(
+        run_batch,
+        max_queue_size,
+        batch_key=batch_key,
+        max_batch_size=max_batch_size,
+        max_batch_wait=max_batch_wait,
+        max_finished_jobs=max_finished_jobs,
+        finished_job_ttl=finished_job_ttl,
+    )
+    server.setup_inference(job_queue, default_params, model_args, prepare_params)
+    return server
+
+
+def main():
+    # The model stack is only needed to actually serve, not by `create_server`
+    from inference import (
+        MODEL_ARGS,
+        create_argument_parser,
+        create_pipeline_from_args,
+        infer_batch,
+        job_batch_key,
+        resolve_image_path_args,
+    )
+
+    parser = create_argument_parser(prompt_required=False)
+    parser.description = (
+        "Keep an LTX-Video pipeline resident and serve generation jobs over HTTP."
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind")
+    parser.add_argument(
+        "--unix_socket",
+        type=str,
+        default=None,
+        help="Path of a Unix socket to serve on instead of a TCP port.",
+    )
+    parser.add_argument(
+        "--max_queue_size",
+        type=int,
+        default=0,
+        help="Maximum number of pending jobs, 0 for unbounded.",
+    )
+    parser.add_argument(
+        "--max_batch_size",
+        type=int,
+        default=1,
+        help="Maximum number of queued jobs of the same size and settings generated together in a single "
+        "batched pipeline call.",
+    )
+    parser.add_argument(
+        "--max_batch_wait",
+        type=float,
+        default=0.0,
+        help="Maximum time, in seconds, a job waits for other jobs of its size and settings to fill a batch.",
+    )
+    parser.add_argument(
+        "--max_finished_jobs",
+        type=int,
+        default=1000,
+        help="Maximum number of finished jobs whose status and results are kept, 0 for unbounded. The oldest "
+        "are forgotten first.",
+    )
+    parser.add_argument(
+        "--finished_job_ttl",
+        type=float,
+        default=3600.0,
+        help="Time, in seconds, after which the status and results of finished jobs are forgotten. 0 to keep "
+        "them until --max_finished_jobs is reached.",
+    )
+    args = vars(parser.parse_args())
+    server_args = {k: args.pop(k) for k in SERVER_ARGS}
+
+    # Load the models once
+    pipeline = create_pipeline_from_args(args)
+
+    def run_batch(jobs: List[Dict[str, Any]]) -> List[List[Path]]:
+        return infer_batch(jobs, pipeline=pipeline)
+
+    server = create_server(
+        run_batch,
+        args,
+        batch_key=job_batch_key,
+        model_args=MODEL_ARGS,
+        prepare_params=resolve_image_path_args,
+        **server_args,
+    )
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: server.request_shutdown(drain=False))
+
+    address = (
+        server_args["unix_socket"]
+        or f"{server.server_address[0]}:{server.server_address[1]}"
+    )
+    logger.warning(f"Serving LTX-Video on {address}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if server_args["unix_socket"] and os.path.exists(server_args["unix_socket"]):
+            os.unlink(server_args["unix_socket"])
+
+
+if __name__ == "__main__":
+    main()
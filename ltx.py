@@ -2,8 +2,8 @@ import torch
 from diffusers import DiffusionPipeline
 import os
 import numpy as np
-import imageio.v2 as imageio
 from PIL import Image
+from ltx_video.utils.video_encoder import write_video
 
 # Determine device
 device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
@@ -28,5 +28,5 @@ print(f"Saving video to {output_file}")
 
 # Convert frames to numpy arrays directly (they already are numpy arrays)
 # Don't convert to PIL Images first
-imageio.mimwrite(output_file, video_frames, fps=8)
+write_video(output_file, video_frames, fps=8)
 print(f"Video saved successfully to {output_file}")
\ No newline at end of file
@@ -2,8 +2,8 @@ import torch
 from diffusers import LTXImageToVideoPipeline
 import os
 import numpy as np
-import imageio.v2 as imageio
 from PIL import Image
+from utils.video_encoder import write_video
 
 # Import the pose extraction module
 from extraction import get_pose_reference
@@ -104,7 +104,7 @@ def generate_apose_video(
     print(f"Saving video to {output_video_path}")
     
     # Save with specified framerate
-    imageio.mimwrite(output_video_path, video_frames, fps=fps)
+    write_video(output_video_path, video_frames, fps=fps)
     print(f"Video saved successfully to {output_video_path}")
     
     return output_video_path
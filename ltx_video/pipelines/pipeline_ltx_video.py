@@ -4,7 +4,7 @@ import math
 import re
 from contextlib import nullcontext
 from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import torch
 import torch.nn.functional as F
@@ -29,7 +29,6 @@ from ltx_video.models.autoencoders.causal_video_autoencoder import (
 from ltx_video.models.autoencoders.vae_encode import (
     get_vae_size_scale_factor,
     latent_to_pixel_coords,
-    vae_decode,
     vae_encode,
 )
 from ltx_video.models.transformers.symmetric_patchifier import Patchifier
@@ -37,6 +36,14 @@ from ltx_video.models.transformers.transformer3d import Transformer3DModel
 from ltx_video.schedulers.rf import TimestepShifter
 from ltx_video.utils.skip_layer_strategy import SkipLayerStrategy
 from ltx_video.utils.prompt_enhance_utils import generate_cinematic_prompt
+from ltx_video.utils.guidance_schedule import GuidanceSchedule
+from ltx_video.utils.step_cache import TransformerStepCache, compute_modulated_input
+from ltx_video.utils.conditioning_latent_cache import ConditioningLatentCache
+from ltx_video.utils.latent_preview import LatentPreviewer
+from ltx_video.utils.profiler import NULL_PROFILER, StageProfiler
+from ltx_video.utils.prompt_enhancer_models import PromptEnhancerModels
+from ltx_video.utils.text_embedding_cache import TextEmbeddingCache
+from ltx_video.utils.vae_tiling import iter_tiled_vae_decode
 
 logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
 
@@ -114,6 +121,19 @@ ASPECT_RATIO_512_BIN = {
 }
 
 
+def to_uint8_frames(video: torch.Tensor) -> torch.Tensor:
+    """
+    Converts decoded videos (b, c, f, h, w) in [-1, 1] to uint8 frames (b, f, h, w, c).
+
+    The denormalization is done in place and the quantization writes the channels-last layout directly,
+    so the only allocation is the uint8 output. `video` is overwritten.
+    """
+    video = video.add_(1.0).mul_(127.5).clamp_(0.0, 255.0)
+    return video.permute(0, 2, 3, 4, 1).to(
+        torch.uint8, memory_format=torch.contiguous_format
+    )
+
+
 # Copied from diffusers.pipelines.stable_diffusion.pipeline_stable_diffusion.retrieve_timesteps
 def retrieve_timesteps(
     scheduler,
@@ -166,14 +186,18 @@ class ConditioningItem:
     """
     Defines a single frame-conditioning item - a single frame or a sequence of frames.
     Attributes:
-        media_item (torch.Tensor), shape=(b, 3, f, h, w): The media item to condition on.
+        media_item (torch.Tensor), shape=(b, 3, f, h, w): The media item to condition on. May be None if
+            `latents` are given.
         media_frame_number (int): The start-frame number of the media item in the generated video.
         conditioning_strength (float): The strength of the conditioning (1.0 = full conditioning).
+        latents (torch.Tensor, optional), shape=(b, c, f_l, h_l, w_l): The media item already encoded by
+            `LTXVideoPipeline.encode_conditioning_media`, e.g. taken from a cache. Skips the VAE encoding.
     """
 
-    media_item: torch.Tensor
+    media_item: Optional[torch.Tensor]
     media_frame_number: int
     conditioning_strength: float
+    latents: Optional[torch.Tensor] = None
 
 
 class LTXVideoPipeline(DiffusionPipeline):
@@ -225,6 +249,13 @@ class LTXVideoPipeline(DiffusionPipeline):
     ]
     model_cpu_offload_seq = "prompt_enhancer_image_caption_model->prompt_enhancer_llm_model->text_encoder->transformer->vae"
 
+    # Optional cache of text encoder outputs, see `set_text_embedding_cache`
+    text_embedding_cache: Optional[TextEmbeddingCache] = None
+    # Optional cache of encoded conditioning media, see `set_conditioning_latent_cache`
+    conditioning_latent_cache: Optional[ConditioningLatentCache] = None
+    # Optional on-demand prompt enhancer models, see `set_prompt_enhancer_models`
+    prompt_enhancer_models: Optional[PromptEnhancerModels] = None
+
     def __init__(
         self,
         tokenizer: T5Tokenizer,
@@ -258,13 +289,119 @@ class LTXVideoPipeline(DiffusionPipeline):
         )
         self.image_processor = VaeImageProcessor(vae_scale_factor=self.vae_scale_factor)
 
+    def set_text_embedding_cache(self, cache: Optional[TextEmbeddingCache]):
+        """
+        Sets a cache of text encoder outputs used by `encode_prompt`. When all the texts of a call are cached,
+        the text encoder is not used (nor moved to the execution device). Pass None to disable caching.
+        """
+        self.text_embedding_cache = cache
+
+    def set_conditioning_latent_cache(self, cache: Optional[ConditioningLatentCache]):
+        """
+        Sets a cache of conditioning latents, kept with the pipeline for the callers preparing the conditioning
+        items: cached `ConditioningItem.latents` skip the loading and encoding of the media. Pass None to
+        disable caching.
+        """
+        self.conditioning_latent_cache = cache
+
+    def set_prompt_enhancer_models(self, models: Optional[PromptEnhancerModels]):
+        """
+        Sets prompt enhancer models that are loaded on demand and released after each enhancement, according to
+        their policy. They are used instead of the `prompt_enhancer_*` components, which can then be None.
+        """
+        self.prompt_enhancer_models = models
+
+    @property
+    def has_prompt_enhancer(self) -> bool:
+        return (
+            self.prompt_enhancer_models is not None
+            or self.prompt_enhancer_llm_model is not None
+        )
+
+    def enhance_prompts(
+        self,
+        prompt: Union[str, List[str]],
+        conditioning_items: Optional[List[ConditioningItem]] = None,
+        max_new_tokens: int = 256,
+        batch_size: int = 8,
+    ) -> List[str]:
+        """
+        Enhances the prompts as `__call__` does with `enhance_prompt`, in batches of at most `batch_size`
+        prompts. The prompt enhancer models are only on the execution device for the duration of the call when
+        they are loaded on demand (see `set_prompt_enhancer_models`).
+        """
+        if self.prompt_enhancer_models is not None:
+            with self.prompt_enhancer_models.use(
+                self._execution_device
+            ) as prompt_enhancer:
+                return generate_cinematic_prompt(
+                    prompt_enhancer.image_caption_model,
+                    prompt_enhancer.image_caption_processor,
+                    prompt_enhancer.llm_model,
+                    prompt_enhancer.llm_tokenizer,
+                    prompt,
+                    conditioning_items,
+                    max_new_tokens=max_new_tokens,
+                    batch_size=batch_size,
+                )
+
+        self.prompt_enhancer_image_caption_model = (
+            self.prompt_enhancer_image_caption_model.to(self._execution_device)
+        )
+        self.prompt_enhancer_llm_model = self.prompt_enhancer_llm_model.to(
+            self._execution_device
+        )
+        return generate_cinematic_prompt(
+            self.prompt_enhancer_image_caption_model,
+            self.prompt_enhancer_image_caption_processor,
+            self.prompt_enhancer_llm_model,
+            self.prompt_enhancer_llm_tokenizer,
+            prompt,
+            conditioning_items,
+            max_new_tokens=max_new_tokens,
+            batch_size=batch_size,
+        )
+
+    def encode_conditioning_media(
+        self, media_item: torch.Tensor, vae_per_channel_normalize: bool = False
+    ) -> torch.Tensor:
+        """Encodes a (b, 3, f, h, w) conditioning media item into latents, as done by `prepare_conditioning`."""
+        return vae_encode(
+            media_item.to(dtype=self.vae.dtype, device=self.vae.device),
+            self.vae,
+            vae_per_channel_normalize=vae_per_channel_normalize,
+        )
+
     def mask_text_embeddings(self, emb, mask):
-        if emb.shape[0] == 1:
-            keep_index = mask.sum().item()
-            return emb[:, :, :keep_index, :], keep_index
-        else:
-            masked_feature = emb * mask[:, None, :, None]
-            return masked_feature, emb.shape[2]
+        """
+        Trims the trailing padding shared by all the texts of the batch, i.e. keeps the tokens up to the
+        longest real text. `emb` is either (b, n, d) or (b, 1, n, d), and `mask` is (b, n).
+
+        Returns:
+            The trimmed embeddings and the number of kept tokens.
+        """
+        real_tokens = mask.bool().any(dim=0).nonzero()
+        keep_index = int(real_tokens.max()) + 1 if real_tokens.numel() > 0 else 1
+        return emb[..., :keep_index, :], keep_index
+
+    def _concat_text_embeddings(
+        self, embeds: List[torch.Tensor], masks: List[torch.Tensor]
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Concatenates the text embeddings (b, n_i, d) and masks (b, n_i) of the guidance branches along the
+        batch dimension, padding them to a common length and trimming the padding shared by all of them.
+        """
+        length = max(emb.shape[1] for emb in embeds)
+        embeds = [
+            torch.nn.functional.pad(emb, (0, 0, 0, length - emb.shape[1]))
+            for emb in embeds
+        ]
+        masks = [
+            torch.nn.functional.pad(mask, (0, length - mask.shape[1])) for mask in masks
+        ]
+        embeds_batch, mask_batch = torch.cat(embeds, dim=0), torch.cat(masks, dim=0)
+        embeds_batch, keep_index = self.mask_text_embeddings(embeds_batch, mask_batch)
+        return embeds_batch, mask_batch[:, :keep_index]
 
     # Adapted from diffusers.pipelines.deepfloyd_if.pipeline_if.encode_prompt
     def encode_prompt(
@@ -323,44 +460,12 @@ class LTXVideoPipeline(DiffusionPipeline):
             text_encoder_max_tokens  # TPU supports only lengths multiple of 128
         )
         if prompt_embeds is None:
-            assert (
-                self.text_encoder is not None
-            ), "You should provide either prompt_embeds or self.text_encoder should not be None,"
-            text_enc_device = next(self.text_encoder.parameters()).device
             prompt = self._text_preprocessing(prompt)
-            text_inputs = self.tokenizer(
-                prompt,
-                padding="max_length",
-                max_length=max_length,
-                truncation=True,
-                add_special_tokens=True,
-                return_tensors="pt",
+            prompt_embeds, prompt_attention_mask = self._encode_texts(
+                prompt, max_length
             )
-            text_input_ids = text_inputs.input_ids
-            untruncated_ids = self.tokenizer(
-                prompt, padding="longest", return_tensors="pt"
-            ).input_ids
-
-            if untruncated_ids.shape[-1] >= text_input_ids.shape[
-                -1
-            ] and not torch.equal(text_input_ids, untruncated_ids):
-                removed_text = self.tokenizer.batch_decode(
-                    untruncated_ids[:, max_length - 1 : -1]
-                )
-                logger.warning(
-                    "The following part of your input was truncated because CLIP can only handle sequences up to"
-                    f" {max_length} tokens: {removed_text}"
-                )
-
-            prompt_attention_mask = text_inputs.attention_mask
-            prompt_attention_mask = prompt_attention_mask.to(text_enc_device)
             prompt_attention_mask = prompt_attention_mask.to(device)
 
-            prompt_embeds = self.text_encoder(
-                text_input_ids.to(text_enc_device), attention_mask=prompt_attention_mask
-            )
-            prompt_embeds = prompt_embeds[0]
-
         if self.text_encoder is not None:
             dtype = self.text_encoder.dtype
         elif self.transformer is not None:
@@ -384,27 +489,16 @@ class LTXVideoPipeline(DiffusionPipeline):
         # get unconditional embeddings for classifier free guidance
         if do_classifier_free_guidance and negative_prompt_embeds is None:
             uncond_tokens = self._text_preprocessing(negative_prompt)
-            uncond_tokens = uncond_tokens * batch_size
-            max_length = prompt_embeds.shape[1]
-            uncond_input = self.tokenizer(
-                uncond_tokens,
-                padding="max_length",
-                max_length=max_length,
-                truncation=True,
-                return_attention_mask=True,
-                add_special_tokens=True,
-                return_tensors="pt",
-            )
-            negative_prompt_attention_mask = uncond_input.attention_mask
-            negative_prompt_attention_mask = negative_prompt_attention_mask.to(
-                text_enc_device
-            )
-
-            negative_prompt_embeds = self.text_encoder(
-                uncond_input.input_ids.to(text_enc_device),
-                attention_mask=negative_prompt_attention_mask,
+            if len(uncond_tokens) == 1:
+                uncond_tokens = uncond_tokens * batch_size
+            elif len(uncond_tokens) != batch_size:
+                raise ValueError(
+                    f"Got {len(uncond_tokens)} negative prompts for {batch_size} prompts."
+                )
+            negative_prompt_embeds, negative_prompt_attention_mask = self._encode_texts(
+                uncond_tokens, max_length
             )
-            negative_prompt_embeds = negative_prompt_embeds[0]
+            negative_prompt_attention_mask = negative_prompt_attention_mask.to(device)
 
         if do_classifier_free_guidance:
             # duplicate unconditional embeddings for each generation per prompt, using mps friendly method
@@ -438,6 +532,108 @@ class LTXVideoPipeline(DiffusionPipeline):
             negative_prompt_attention_mask,
         )
 
+    def _encode_texts(
+        self, texts: List[str], max_length: int
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Runs the text encoder on already preprocessed texts, truncated to `max_length` tokens.
+        The texts are only padded to the longest of them, so the encoder never runs on padding beyond it.
+        When a text embedding cache is set, only the texts missing from the cache are encoded, and the
+        padding positions of cached texts are filled with zeros (they are masked out anyway).
+
+        Returns:
+            `Tuple[torch.Tensor, torch.Tensor]`: The embeddings (b, n, d) and attention mask (b, n), where n is
+            the number of tokens of the longest text.
+        """
+        cache = self.text_embedding_cache
+        entries = {}
+        if cache is not None:
+            for text in texts:
+                if text not in entries:
+                    entries[text] = cache.get(text, max_length)
+            missing = [text for text, entry in entries.items() if entry is None]
+        else:
+            missing = texts
+
+        if missing:
+            assert (
+                self.text_encoder is not None
+            ), "You should provide either prompt_embeds or self.text_encoder should not be None,"
+            text_enc_device = next(self.text_encoder.parameters()).device
+            text_inputs = self.tokenizer(
+                missing,
+                padding="longest",
+                add_special_tokens=True,
+                return_tensors="pt",
+            )
+            if text_inputs.input_ids.shape[-1] > max_length:
+                # Only tokenize again, with truncation, when some text is actually too long
+                removed_text = self.tokenizer.batch_decode(
+                    text_inputs.input_ids[:, max_length - 1 : -1]
+                )
+                logger.warning(
+                    "The following part of your input was truncated because CLIP can only handle sequences up to"
+                    f" {max_length} tokens: {removed_text}"
+                )
+                text_inputs = self.tokenizer(
+                    missing,
+                    padding="longest",
+                    max_length=max_length,
+                    truncation=True,
+                    add_special_tokens=True,
+                    return_tensors="pt",
+                )
+            text_input_ids = text_inputs.input_ids
+
+            attention_mask = text_inputs.attention_mask.to(text_enc_device)
+            embeds = self.text_encoder(
+                text_input_ids.to(text_enc_device), attention_mask=attention_mask
+            )[0]
+            if cache is None:
+                return embeds, attention_mask
+
+            for i, text in enumerate(missing):
+                num_tokens = int(attention_mask[i].sum())
+                entries[text] = (
+                    embeds[i : i + 1, :num_tokens],
+                    attention_mask[i : i + 1, :num_tokens],
+                )
+                cache.put(text, max_length, *entries[text])
+
+        # Assemble the batch from the cached entries, padded to the longest text
+        first_embeds = next(iter(entries.values()))[0]
+        length = max(entries[text][0].shape[1] for text in texts)
+        embeds = first_embeds.new_zeros((len(texts), length, first_embeds.shape[-1]))
+        attention_mask = torch.zeros(
+            (len(texts), length), dtype=torch.int64, device=first_embeds.device
+        )
+        for i, text in enumerate(texts):
+            text_embeds, text_attention_mask = entries[text]
+            num_tokens = text_embeds.shape[1]
+            embeds[i, :num_tokens] = text_embeds[0].to(embeds.device)
+            attention_mask[i, :num_tokens] = text_attention_mask[0].to(
+                attention_mask.device
+            )
+        return embeds, attention_mask
+
+    def _all_texts_cached(self, texts: List[str], max_length: int) -> bool:
+        cache = self.text_embedding_cache
+        return cache is not None and all(
+            cache.contains(text, max_length) for text in texts
+        )
+
+    def _load_text_encoder_if_needed(
+        self, texts: List[str], max_length: int, device: torch.device
+    ):
+        """
+        Moves the text encoder to `device` unless all of `texts` are cached, in which case it is not used and
+        stays where it is (the CPU when the pipeline is created by `inference.py`).
+        """
+        if self.text_encoder is not None and not self._all_texts_cached(
+            texts, max_length
+        ):
+            self.text_encoder = self.text_encoder.to(device)
+
     # Copied from diffusers.pipelines.stable_diffusion.pipeline_stable_diffusion.StableDiffusionPipeline.prepare_extra_step_kwargs
     def prepare_extra_step_kwargs(self, generator, eta):
         # prepare extra kwargs for the scheduler step, since not all schedulers have the same signature
@@ -532,7 +728,7 @@ class LTXVideoPipeline(DiffusionPipeline):
                     f" {negative_prompt_attention_mask.shape}."
                 )
 
-        if enhance_prompt:
+        if enhance_prompt and self.prompt_enhancer_models is None:
             assert (
                 self.prompt_enhancer_image_caption_model is not None
             ), "Image caption model must be initialized if enhance_prompt is True"
@@ -659,10 +855,10 @@ class LTXVideoPipeline(DiffusionPipeline):
         negative_prompt: str = "",
         num_inference_steps: int = 20,
         timesteps: List[int] = None,
-        guidance_scale: float = 4.5,
+        guidance_scale: Union[float, List[float], GuidanceSchedule] = 4.5,
         skip_layer_strategy: Optional[SkipLayerStrategy] = None,
         skip_block_list: Optional[List[int]] = None,
-        stg_scale: float = 1.0,
+        stg_scale: Union[float, List[float], GuidanceSchedule] = 1.0,
         do_rescaling: bool = True,
         rescaling_scale: float = 0.7,
         num_images_per_prompt: Optional[int] = 1,
@@ -682,7 +878,24 @@ class LTXVideoPipeline(DiffusionPipeline):
         mixed_precision: bool = False,
         offload_to_cpu: bool = False,
         enhance_prompt: bool = False,
+        prompt_enhancement_batch_size: int = 8,
         text_encoder_max_tokens: int = 256,
+        step_cache: Optional[TransformerStepCache] = None,
+        guidance_branch_batch_size: Optional[int] = None,
+        decode_tile_size: Optional[
+            Tuple[Optional[int], Optional[int], Optional[int]]
+        ] = None,
+        decode_tile_overlap: Tuple[int, int, int] = (1, 4, 4),
+        decode_output_region: Optional[
+            Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]
+        ] = None,
+        decoded_frames_callback: Optional[Callable[[torch.Tensor], None]] = None,
+        checkpoint_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        checkpoint_steps: int = 0,
+        resume_state: Optional[Dict[str, Any]] = None,
+        latent_previewer: Optional[LatentPreviewer] = None,
+        preview_steps: int = 0,
+        profiler: Optional[StageProfiler] = None,
         **kwargs,
     ) -> Union[ImagePipelineOutput, Tuple]:
         """
@@ -702,12 +915,17 @@ class LTXVideoPipeline(DiffusionPipeline):
             timesteps (`List[int]`, *optional*):
                 Custom timesteps to use for the denoising process. If not defined, equal spaced `num_inference_steps`
                 timesteps are used. Must be in descending order.
-            guidance_scale (`float`, *optional*, defaults to 4.5):
+            guidance_scale (`float`, `List[float]` or `GuidanceSchedule`, *optional*, defaults to 4.5):
                 Guidance scale as defined in [Classifier-Free Diffusion Guidance](https://arxiv.org/abs/2207.12598).
                 `guidance_scale` is defined as `w` of equation 2. of [Imagen
                 Paper](https://arxiv.org/pdf/2205.11487.pdf). Guidance scale is enabled by setting `guidance_scale >
                 1`. Higher guidance scale encourages to generate images that are closely linked to the text `prompt`,
-                usually at the expense of lower image quality.
+                usually at the expense of lower image quality. A list gives one scale per step, and a
+                `GuidanceSchedule` also restricts the guidance to step or sigma intervals. The unconditional branch
+                is not evaluated at the steps where the guidance is inactive.
+            stg_scale (`float`, `List[float]` or `GuidanceSchedule`, *optional*, defaults to 1.0):
+                Spatio-temporal guidance scale, enabled by setting `stg_scale > 0`. Scheduled like `guidance_scale`;
+                the perturbed branch is not evaluated at the steps where the guidance is inactive.
             num_images_per_prompt (`int`, *optional*, defaults to 1):
                 The number of images to generate per prompt.
             height (`int`, *optional*, defaults to self.unet.config.sample_size):
@@ -736,21 +954,67 @@ class LTXVideoPipeline(DiffusionPipeline):
             output_type (`str`, *optional*, defaults to `"pil"`):
                 The output format of the generate image. Choose between
                 [PIL](https://pillow.readthedocs.io/en/stable/): `PIL.Image.Image` or `np.array`.
+                `"uint8"` returns (b, f, h, w, c) uint8 tensors, quantized on the execution device so only the
+                compact frames have to be transferred to the host.
             return_dict (`bool`, *optional*, defaults to `True`):
                 Whether or not to return a [`~pipelines.stable_diffusion.IFPipelineOutput`] instead of a plain tuple.
             callback_on_step_end (`Callable`, *optional*):
                 A function that calls at the end of each denoising steps during the inference. The function is called
                 with the following arguments: `callback_on_step_end(self: DiffusionPipeline, step: int, timestep: int,
-                callback_kwargs: Dict)`. `callback_kwargs` will include a list of all tensors as specified by
-                `callback_on_step_end_tensor_inputs`.
+                callback_kwargs: Dict)`. Every `preview_steps` solver steps, `callback_kwargs["preview"]` holds a
+                preview of the denoised video.
             use_resolution_binning (`bool` defaults to `True`):
                 If set to `True`, the requested height and width are first mapped to the closest resolutions using
                 `ASPECT_RATIO_1024_BIN`. After the produced latents are decoded into images, they are resized back to
                 the requested resolution. Useful for generating non-square images.
             enhance_prompt (`bool`, *optional*, defaults to `False`):
                 If set to `True`, the prompt is enhanced using a LLM model.
+            prompt_enhancement_batch_size (`int`, *optional*, defaults to `8`):
+                The maximal number of prompts enhanced together in a single `generate` call.
             text_encoder_max_tokens (`int`, *optional*, defaults to `256`):
                 The maximum number of tokens to use for the text encoder.
+            step_cache (`TransformerStepCache`, *optional*):
+                If given, the transformer output of the previous step is reused whenever the timestep-modulated
+                input barely changed. The cache keeps the skipped-steps statistics across calls.
+            guidance_branch_batch_size (`int`, *optional*):
+                The maximal number of guidance branches (unconditional, conditional, perturbed) evaluated in a
+                single transformer forward. Lower values run the branches as separate forwards, trading some
+                throughput for a lower peak memory. If not defined, all the branches are batched together.
+            decode_tile_size (`Tuple[int, int, int]`, *optional*):
+                If given, the latents are decoded in overlapping (frames, height, width) tiles of this size, in
+                latents, which bounds the peak memory of the VAE decoding. If not defined, they are decoded at once.
+            decode_tile_overlap (`Tuple[int, int, int]`, *optional*, defaults to `(1, 4, 4)`):
+                The overlap of neighbouring decoding tiles, in latents. The overlaps are linearly blended.
+            decode_output_region (`Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]`, *optional*):
+                The (start, end) ranges of frames, rows and columns of the video to output, e.g. to drop the padding
+                of the requested resolution. Tiles that fall entirely outside of the region are not decoded.
+            decoded_frames_callback (`Callable`, *optional*):
+                If given, the decoded frames are streamed to this function as soon as they are final, in
+                consecutive chunks of frames in the `output_type` layout, instead of being returned; the
+                returned images are then None.
+                With a temporal `decode_tile_size`, the decoded video is never held in memory at once.
+            checkpoint_callback (`Callable`, *optional*):
+                Called with the denoising state (the latents, the index of the next step, the generators and solver
+                states and the conditioning mask) every `checkpoint_steps` solver steps and after the last step.
+                The state can be saved with `save_denoising_checkpoint`. It references the live tensors, so it has
+                to be copied (e.g. saved) before the callback returns.
+            checkpoint_steps (`int`, *optional*, defaults to 0):
+                The number of solver steps between calls to `checkpoint_callback`. If 0, it is only called after
+                the last step.
+            resume_state (`Dict[str, Any]`, *optional*):
+                A denoising state passed to `checkpoint_callback` by a previous call with the same arguments.
+                Denoising resumes from its step instead of starting from noise. With a complete state, the
+                latents are only decoded.
+            latent_previewer (`LatentPreviewer`, *optional*):
+                Projects the latents to the RGB previews passed to `callback_on_step_end`.
+            preview_steps (`int`, *optional*, defaults to 0):
+                The number of solver steps between previews. A preview is a (b, f, h, w, 3) uint8 video at the
+                latent resolution, projected from the denoised latents predicted at the current step, so it shows
+                the final composition long before the last step. If 0, no preview is made.
+            profiler (`StageProfiler`, *optional*):
+                Records the time, and the memory if it tracks it, of the prompt enhancement, the text encoding,
+                the conditioning, each denoising step (split into the transformer forward, the guidance and the
+                scheduler step) and the VAE decoding. Nothing is recorded if not defined.
 
         Examples:
 
@@ -764,6 +1028,7 @@ class LTXVideoPipeline(DiffusionPipeline):
             deprecate("mask_feature", "1.0.0", deprecation_message, standard_warn=False)
 
         is_video = kwargs.get("is_video", False)
+        profiler = profiler or NULL_PROFILER
         self.check_inputs(
             prompt,
             height,
@@ -795,8 +1060,18 @@ class LTXVideoPipeline(DiffusionPipeline):
         # here `guidance_scale` is defined analog to the guidance weight `w` of equation (2)
         # of the Imagen paper: https://arxiv.org/pdf/2205.11487.pdf . `guidance_scale = 1`
         # corresponds to doing no classifier free guidance.
-        do_classifier_free_guidance = guidance_scale > 1.0
-        do_spatio_temporal_guidance = stg_scale > 0.0
+        # The guidances may only be active on some of the steps; the inputs are prepared for all the
+        # branches that are used by at least one step.
+        cfg_schedule = GuidanceSchedule.from_value(guidance_scale)
+        stg_schedule = GuidanceSchedule.from_value(stg_scale)
+        # Per-step scales are checked against the requested number of steps before any compute
+        requested_steps = (
+            len(timesteps) if timesteps is not None else num_inference_steps
+        )
+        cfg_schedule.validate(requested_steps)
+        stg_schedule.validate(requested_steps)
+        do_classifier_free_guidance = cfg_schedule.max_scale > 1.0
+        do_spatio_temporal_guidance = stg_schedule.max_scale > 0.0
 
         num_conds = 1
         if do_classifier_free_guidance:
@@ -804,75 +1079,80 @@ class LTXVideoPipeline(DiffusionPipeline):
         if do_spatio_temporal_guidance:
             num_conds += 1
 
+        # Indices of the guidance branches in the batched inputs
+        uncond_branch = 0
+        text_branch = int(do_classifier_free_guidance)
+        perturbed_branch = text_branch + 1
+
+        if guidance_branch_batch_size is None:
+            guidance_branch_batch_size = num_conds
+        if guidance_branch_batch_size < 1:
+            raise ValueError(
+                f"`guidance_branch_batch_size` has to be positive but is {guidance_branch_batch_size}."
+            )
+
         skip_layer_mask = None
         if do_spatio_temporal_guidance:
             skip_layer_mask = self.transformer.create_skip_layer_mask(
-                batch_size, num_conds, 2, skip_block_list
+                batch_size, num_conds, perturbed_branch, skip_block_list
             )
 
         if enhance_prompt:
-            self.prompt_enhancer_image_caption_model = (
-                self.prompt_enhancer_image_caption_model.to(self._execution_device)
-            )
-            self.prompt_enhancer_llm_model = self.prompt_enhancer_llm_model.to(
-                self._execution_device
-            )
-
-            prompt = generate_cinematic_prompt(
-                self.prompt_enhancer_image_caption_model,
-                self.prompt_enhancer_image_caption_processor,
-                self.prompt_enhancer_llm_model,
-                self.prompt_enhancer_llm_tokenizer,
-                prompt,
-                conditioning_items,
-                max_new_tokens=text_encoder_max_tokens,
-            )
+            with profiler.stage("prompt_enhancement"):
+                prompt = self.enhance_prompts(
+                    prompt,
+                    conditioning_items,
+                    max_new_tokens=text_encoder_max_tokens,
+                    batch_size=prompt_enhancement_batch_size,
+                )
 
         # 3. Encode input prompt
-        if self.text_encoder is not None:
-            self.text_encoder = self.text_encoder.to(self._execution_device)
-
-        (
-            prompt_embeds,
-            prompt_attention_mask,
-            negative_prompt_embeds,
-            negative_prompt_attention_mask,
-        ) = self.encode_prompt(
-            prompt,
-            do_classifier_free_guidance,
-            negative_prompt=negative_prompt,
-            num_images_per_prompt=num_images_per_prompt,
-            device=device,
-            prompt_embeds=prompt_embeds,
-            negative_prompt_embeds=negative_prompt_embeds,
-            prompt_attention_mask=prompt_attention_mask,
-            negative_prompt_attention_mask=negative_prompt_attention_mask,
-            text_encoder_max_tokens=text_encoder_max_tokens,
+        texts_to_encode = []
+        if prompt_embeds is None:
+            texts_to_encode += self._text_preprocessing(prompt)
+        if do_classifier_free_guidance and negative_prompt_embeds is None:
+            texts_to_encode += self._text_preprocessing(negative_prompt)
+        self._load_text_encoder_if_needed(
+            texts_to_encode, text_encoder_max_tokens, self._execution_device
         )
 
+        with profiler.stage("text_encoding"):
+            (
+                prompt_embeds,
+                prompt_attention_mask,
+                negative_prompt_embeds,
+                negative_prompt_attention_mask,
+            ) = self.encode_prompt(
+                prompt,
+                do_classifier_free_guidance,
+                negative_prompt=negative_prompt,
+                num_images_per_prompt=num_images_per_prompt,
+                device=device,
+                prompt_embeds=prompt_embeds,
+                negative_prompt_embeds=negative_prompt_embeds,
+                prompt_attention_mask=prompt_attention_mask,
+                negative_prompt_attention_mask=negative_prompt_attention_mask,
+                text_encoder_max_tokens=text_encoder_max_tokens,
+            )
+
         if offload_to_cpu and self.text_encoder is not None:
             self.text_encoder = self.text_encoder.cpu()
 
         self.transformer = self.transformer.to(self._execution_device)
 
-        prompt_embeds_batch = prompt_embeds
-        prompt_attention_mask_batch = prompt_attention_mask
+        # Batch the text embeddings of the guidance branches, trimmed to the longest real prompt so the
+        # cross-attention cost scales with the actual prompt lengths
+        text_embeds = [prompt_embeds]
+        text_masks = [prompt_attention_mask]
         if do_classifier_free_guidance:
-            prompt_embeds_batch = torch.cat(
-                [negative_prompt_embeds, prompt_embeds], dim=0
-            )
-            prompt_attention_mask_batch = torch.cat(
-                [negative_prompt_attention_mask, prompt_attention_mask], dim=0
-            )
+            text_embeds.insert(0, negative_prompt_embeds)
+            text_masks.insert(0, negative_prompt_attention_mask)
         if do_spatio_temporal_guidance:
-            prompt_embeds_batch = torch.cat([prompt_embeds_batch, prompt_embeds], dim=0)
-            prompt_attention_mask_batch = torch.cat(
-                [
-                    prompt_attention_mask_batch,
-                    prompt_attention_mask,
-                ],
-                dim=0,
-            )
+            text_embeds.append(prompt_embeds)
+            text_masks.append(prompt_attention_mask)
+        prompt_embeds_batch, prompt_attention_mask_batch = self._concat_text_embeddings(
+            text_embeds, text_masks
+        )
 
         # 3b. Encode and prepare conditioning data
         self.video_scale_factor = self.video_scale_factor if is_video else 1
@@ -902,17 +1182,19 @@ class LTXVideoPipeline(DiffusionPipeline):
         )
 
         # Update the latents with the conditioning items and patchify them into (b, n, c)
-        latents, pixel_coords, conditioning_mask, num_cond_latents = (
-            self.prepare_conditioning(
-                conditioning_items=conditioning_items,
-                init_latents=latents,
-                num_frames=num_frames,
-                height=height,
-                width=width,
-                vae_per_channel_normalize=vae_per_channel_normalize,
-                generator=generator,
+        with profiler.stage("conditioning"):
+            latents, pixel_coords, conditioning_mask, num_cond_latents = (
+                self.prepare_conditioning(
+                    conditioning_items=conditioning_items,
+                    init_latents=latents,
+                    num_frames=num_frames,
+                    height=height,
+                    width=width,
+                    vae_per_channel_normalize=vae_per_channel_normalize,
+                    generator=generator,
+                )
             )
-        )
+
         init_latents = latents.clone()  # Used for image_cond_noise_update
 
         pixel_coords = torch.cat([pixel_coords] * num_conds)
@@ -938,14 +1220,47 @@ class LTXVideoPipeline(DiffusionPipeline):
         # 6. Prepare extra step kwargs. TODO: Logic should ideally just be moved out of the pipeline
         extra_step_kwargs = self.prepare_extra_step_kwargs(generator, eta)
 
+        generators = (
+            generator
+            if isinstance(generator, list)
+            else [generator] if generator is not None else []
+        )
+        start_step = 0
+        if resume_state is not None:
+            latents, init_latents, orig_conditioning_mask = (
+                self._restore_denoising_state(
+                    resume_state, timesteps, latents, generators
+                )
+            )
+            start_step = resume_state["step"]
+            if orig_conditioning_mask is not None and is_video:
+                conditioning_mask = torch.cat([orig_conditioning_mask] * num_conds)
+
         # 7. Denoising loop
         num_warmup_steps = max(
             len(timesteps) - num_inference_steps * self.scheduler.order, 0
         )
+        if step_cache is not None:
+            step_cache.reset()
+        num_guidance_steps = math.ceil(len(timesteps) / self.scheduler.order)
+        # The scheduler may have changed the number of steps (e.g. capped it)
+        cfg_schedule.validate(num_guidance_steps)
+        stg_schedule.validate(num_guidance_steps)
+        sigmas = torch.as_tensor(timesteps).tolist()  # A single sync for the whole loop
+        previous_branches = None
 
         with self.progress_bar(total=num_inference_steps) as progress_bar:
+            progress_bar.update(math.ceil(start_step / self.scheduler.order))
             for i, t in enumerate(timesteps):
-                if conditioning_mask is not None and image_cond_noise_scale > 0.0:
+                if i < start_step:
+                    continue
+                step_span = profiler.begin("denoising_step", step=i)
+                # Once per solver step: not between the predictor and the corrector of a heun step
+                if (
+                    conditioning_mask is not None
+                    and image_cond_noise_scale > 0.0
+                    and not getattr(self.scheduler, "is_corrector_step", False)
+                ):
                     latents = self.add_noise_to_image_conditioning_latents(
                         t,
                         init_latents,
@@ -955,18 +1270,11 @@ class LTXVideoPipeline(DiffusionPipeline):
                         generator,
                     )
 
-                latent_model_input = (
-                    torch.cat([latents] * num_conds) if num_conds > 1 else latents
-                )
-                latent_model_input = self.scheduler.scale_model_input(
-                    latent_model_input, t
-                )
-
                 current_timestep = t
                 if not torch.is_tensor(current_timestep):
                     # TODO: this requires sync between CPU and GPU. So try to pass timesteps as tensors if you can
                     # This would be a good case for the `match` statement (Python 3.10+)
-                    is_mps = latent_model_input.device.type == "mps"
+                    is_mps = latents.device.type == "mps"
                     if isinstance(current_timestep, float):
                         dtype = torch.float32 if is_mps else torch.float64
                     else:
@@ -974,15 +1282,13 @@ class LTXVideoPipeline(DiffusionPipeline):
                     current_timestep = torch.tensor(
                         [current_timestep],
                         dtype=dtype,
-                        device=latent_model_input.device,
+                        device=latents.device,
                     )
                 elif len(current_timestep.shape) == 0:
-                    current_timestep = current_timestep[None].to(
-                        latent_model_input.device
-                    )
+                    current_timestep = current_timestep[None].to(latents.device)
                 # broadcast to batch dimension in a way that's compatible with ONNX/Core ML
                 current_timestep = current_timestep.expand(
-                    latent_model_input.shape[0]
+                    latents.shape[0] * num_conds
                 ).unsqueeze(-1)
 
                 if conditioning_mask is not None:
@@ -1003,49 +1309,112 @@ class LTXVideoPipeline(DiffusionPipeline):
                 else:
                     context_manager = nullcontext()  # Dummy context manager
 
-                # predict noise model_output
-                with context_manager:
-                    noise_pred = self.transformer(
-                        latent_model_input.to(self.transformer.dtype),
-                        indices_grid=fractional_coords,
-                        encoder_hidden_states=prompt_embeds_batch.to(
-                            self.transformer.dtype
-                        ),
-                        encoder_attention_mask=prompt_attention_mask_batch,
-                        timestep=current_timestep,
-                        skip_layer_mask=skip_layer_mask,
-                        skip_layer_strategy=skip_layer_strategy,
-                        return_dict=False,
-                    )[0]
+                # Select the guidance branches active at this step
+                guidance_step = i // self.scheduler.order
+                cfg_scale_t = cfg_schedule.scale_at(
+                    guidance_step, num_guidance_steps, sigmas[i]
+                )
+                stg_scale_t = stg_schedule.scale_at(
+                    guidance_step, num_guidance_steps, sigmas[i]
+                )
+                cfg_active = (
+                    do_classifier_free_guidance
+                    and cfg_scale_t is not None
+                    and cfg_scale_t > 1.0
+                )
+                stg_active = (
+                    do_spatio_temporal_guidance
+                    and stg_scale_t is not None
+                    and stg_scale_t > 0.0
+                )
+                branches = (
+                    [uncond_branch] * cfg_active
+                    + [text_branch]
+                    + [perturbed_branch] * stg_active
+                )
 
-                # perform guidance
-                if do_spatio_temporal_guidance:
-                    noise_pred_text, noise_pred_text_perturb = noise_pred.chunk(
-                        num_conds
-                    )[-2:]
-                if do_classifier_free_guidance:
-                    noise_pred_uncond, noise_pred_text = noise_pred.chunk(num_conds)[:2]
-                    noise_pred = noise_pred_uncond + guidance_scale * (
-                        noise_pred_text - noise_pred_uncond
+                # Decide whether the previous transformer output can be reused for this step.
+                # All the guidance branches share the same latents and timesteps, so the first one
+                # is enough to track the change of the modulated input. A heun corrector is always
+                # evaluated: reusing the predictor's output would average it with itself, i.e. an
+                # Euler step.
+                compute_transformer = True
+                if step_cache is not None and not getattr(
+                    self.scheduler, "is_corrector_step", False
+                ):
+                    with context_manager:
+                        modulated_input = compute_modulated_input(
+                            self.transformer,
+                            latents.to(self.transformer.dtype),
+                            current_timestep[: latents.shape[0]],
+                        )
+                    compute_transformer = step_cache.should_compute(
+                        modulated_input, i, len(timesteps)
                     )
-                elif do_spatio_temporal_guidance:
-                    noise_pred = noise_pred_text
-                if do_spatio_temporal_guidance:
-                    noise_pred = noise_pred + stg_scale * (
-                        noise_pred_text - noise_pred_text_perturb
+                    # The cached output only holds the branches of the step it was computed at
+                    compute_transformer = (
+                        compute_transformer or branches != previous_branches
                     )
-                    if do_rescaling:
-                        noise_pred_text_std = noise_pred_text.view(batch_size, -1).std(
-                            dim=1, keepdim=True
+                previous_branches = branches
+
+                # predict noise model_output
+                if compute_transformer:
+                    with profiler.stage("transformer", step=i, branches=len(branches)):
+                        noise_pred = torch.cat(
+                            [
+                                self._predict_guidance_branches(
+                                    latents,
+                                    t,
+                                    branches=branches[
+                                        start : start + guidance_branch_batch_size
+                                    ],
+                                    fractional_coords=fractional_coords,
+                                    prompt_embeds_batch=prompt_embeds_batch,
+                                    prompt_attention_mask_batch=prompt_attention_mask_batch,
+                                    current_timestep=current_timestep,
+                                    skip_layer_mask=skip_layer_mask,
+                                    skip_layer_strategy=skip_layer_strategy,
+                                    context_manager=context_manager,
+                                )
+                                for start in range(
+                                    0, len(branches), guidance_branch_batch_size
+                                )
+                            ]
                         )
-                        noise_pred_std = noise_pred.view(batch_size, -1).std(
-                            dim=1, keepdim=True
+
+                    if step_cache is not None:
+                        step_cache.store(noise_pred)
+                else:
+                    noise_pred = step_cache.cached_output
+
+                # perform guidance
+                with profiler.stage("guidance", step=i):
+                    branch_preds = dict(zip(branches, noise_pred.chunk(len(branches))))
+                    noise_pred_text = branch_preds[text_branch]
+                    if cfg_active:
+                        noise_pred_uncond = branch_preds[uncond_branch]
+                        noise_pred = noise_pred_uncond + cfg_scale_t * (
+                            noise_pred_text - noise_pred_uncond
                         )
+                    else:
+                        noise_pred = noise_pred_text
+                    if stg_active:
+                        noise_pred_text_perturb = branch_preds[perturbed_branch]
+                        noise_pred = noise_pred + stg_scale_t * (
+                            noise_pred_text - noise_pred_text_perturb
+                        )
+                        if do_rescaling:
+                            noise_pred_text_std = noise_pred_text.view(
+                                batch_size, -1
+                            ).std(dim=1, keepdim=True)
+                            noise_pred_std = noise_pred.view(batch_size, -1).std(
+                                dim=1, keepdim=True
+                            )
 
-                        factor = noise_pred_text_std / noise_pred_std
-                        factor = rescaling_scale * factor + (1 - rescaling_scale)
+                            factor = noise_pred_text_std / noise_pred_std
+                            factor = rescaling_scale * factor + (1 - rescaling_scale)
 
-                        noise_pred = noise_pred * factor.view(batch_size, 1, 1)
+                            noise_pred = noise_pred * factor.view(batch_size, 1, 1)
 
                 current_timestep = current_timestep[:1]
                 # learned sigma
@@ -1055,15 +1424,36 @@ class LTXVideoPipeline(DiffusionPipeline):
                 ):
                     noise_pred = noise_pred.chunk(2, dim=1)[0]
 
+                callback_kwargs = {}
+                if (
+                    callback_on_step_end is not None
+                    and latent_previewer is not None
+                    and preview_steps > 0
+                    and (
+                        i == len(timesteps) - 1
+                        or (i + 1) % (preview_steps * self.scheduler.order) == 0
+                    )
+                ):
+                    callback_kwargs["preview"] = self._preview_denoised_latents(
+                        latent_previewer,
+                        latents,
+                        noise_pred,
+                        current_timestep,
+                        num_cond_latents,
+                        latent_height,
+                        latent_width,
+                    )
+
                 # compute previous image: x_t -> x_t-1
-                latents = self.denoising_step(
-                    latents,
-                    noise_pred,
-                    current_timestep,
-                    orig_conditioning_mask,
-                    t,
-                    extra_step_kwargs,
-                )
+                with profiler.stage("scheduler_step", step=i):
+                    latents = self.denoising_step(
+                        latents,
+                        noise_pred,
+                        current_timestep,
+                        orig_conditioning_mask,
+                        t,
+                        extra_step_kwargs,
+                    )
 
                 # call the callback, if provided
                 if i == len(timesteps) - 1 or (
@@ -1071,8 +1461,40 @@ class LTXVideoPipeline(DiffusionPipeline):
                 ):
                     progress_bar.update()
 
+                profiler.end(step_span)
+
                 if callback_on_step_end is not None:
-                    callback_on_step_end(self, i, t, {})
+                    callback_on_step_end(self, i, t, callback_kwargs)
+
+                # Checkpoint between solver steps, where the solver state is complete
+                if checkpoint_callback is not None and (
+                    i == len(timesteps) - 1
+                    or (
+                        checkpoint_steps > 0
+                        and (i + 1) % (checkpoint_steps * self.scheduler.order) == 0
+                    )
+                ):
+                    checkpoint_callback(
+                        {
+                            "step": i + 1,
+                            "timesteps": timesteps,
+                            "latents": latents,
+                            "init_latents": init_latents,
+                            "conditioning_mask": orig_conditioning_mask,
+                            "generator_states": [gen.get_state() for gen in generators],
+                            "solver_state": self.scheduler.get_solver_state(),
+                            "num_cond_latents": num_cond_latents,
+                            "latent_shape": (
+                                self.transformer.config.in_channels,
+                                latent_num_frames,
+                                latent_height,
+                                latent_width,
+                            ),
+                        }
+                    )
+
+        if step_cache is not None:
+            step_cache.reset()
 
         if offload_to_cpu:
             self.transformer = self.transformer.cpu()
@@ -1090,32 +1512,28 @@ class LTXVideoPipeline(DiffusionPipeline):
             // math.prod(self.patchifier.patch_size),
         )
         if output_type != "latent":
-            if self.vae.decoder.timestep_conditioning:
-                noise = torch.randn_like(latents)
-                if not isinstance(decode_timestep, list):
-                    decode_timestep = [decode_timestep] * latents.shape[0]
-                if decode_noise_scale is None:
-                    decode_noise_scale = decode_timestep
-                elif not isinstance(decode_noise_scale, list):
-                    decode_noise_scale = [decode_noise_scale] * latents.shape[0]
-
-                decode_timestep = torch.tensor(decode_timestep).to(latents.device)
-                decode_noise_scale = torch.tensor(decode_noise_scale).to(
-                    latents.device
-                )[:, None, None, None, None]
-                latents = (
-                    latents * (1 - decode_noise_scale) + noise * decode_noise_scale
-                )
-            else:
-                decode_timestep = None
-            image = vae_decode(
+            decoded_chunks = self.iter_decode(
                 latents,
-                self.vae,
-                is_video,
+                is_video=is_video,
                 vae_per_channel_normalize=kwargs["vae_per_channel_normalize"],
-                timestep=decode_timestep,
+                decode_timestep=decode_timestep,
+                decode_noise_scale=decode_noise_scale,
+                output_type=output_type,
+                tile_size=decode_tile_size,
+                tile_overlap=decode_tile_overlap,
+                output_region=decode_output_region,
             )
-            image = self.image_processor.postprocess(image, output_type=output_type)
+            decoded_chunks = profiler.profile_iter(decoded_chunks, "vae_decode")
+            if decoded_frames_callback is not None:
+                for chunk in decoded_chunks:
+                    decoded_frames_callback(chunk)
+                image = None
+            else:
+                image = list(decoded_chunks)
+                frames_dim = 1 if output_type == "uint8" else 2
+                image = (
+                    image[0] if len(image) == 1 else torch.cat(image, dim=frames_dim)
+                )
 
         else:
             image = latents
@@ -1128,6 +1546,191 @@ class LTXVideoPipeline(DiffusionPipeline):
 
         return ImagePipelineOutput(images=image)
 
+    def _restore_denoising_state(
+        self,
+        state: Dict[str, Any],
+        timesteps: torch.Tensor,
+        latents: torch.Tensor,
+        generators: List[torch.Generator],
+    ) -> Tuple[torch.Tensor, torch.Tensor, Optional[torch.Tensor]]:
+        """
+        Validates a denoising state against the prepared latents and timesteps, and restores the generators
+        and the solver state from it.
+
+        Returns:
+            The latents, the initial latents and the conditioning mask of the state, on the latents' device.
+        """
+        if len(state["timesteps"]) != len(timesteps) or not torch.allclose(
+            state["timesteps"].to(timesteps.device, timesteps.dtype), timesteps
+        ):
+            raise ValueError(
+                "The denoising state was saved with different timesteps, it cannot be resumed."
+            )
+        if state["latents"].shape != latents.shape:
+            raise ValueError(
+                f"The denoising state has latents of shape {tuple(state['latents'].shape)}, "
+                f"expected {tuple(latents.shape)}."
+            )
+        if len(state["generator_states"]) != len(generators):
+            raise ValueError(
+                f"The denoising state has {len(state['generator_states'])} generator states, "
+                f"expected {len(generators)}."
+            )
+
+        for generator, generator_state in zip(generators, state["generator_states"]):
+            generator.set_state(generator_state)
+        self.scheduler.set_solver_state(state["solver_state"])
+
+        def to_device(tensor: Optional[torch.Tensor]) -> Optional[torch.Tensor]:
+            return tensor.to(latents.device) if tensor is not None else None
+
+        return (
+            to_device(state["latents"]).to(latents.dtype),
+            to_device(state["init_latents"]).to(latents.dtype),
+            to_device(state["conditioning_mask"]),
+        )
+
+    def _preview_denoised_latents(
+        self,
+        latent_previewer: LatentPreviewer,
+        latents: torch.Tensor,
+        noise_pred: torch.Tensor,
+        current_timestep: torch.Tensor,
+        num_cond_latents: int,
+        latent_height: int,
+        latent_width: int,
+    ) -> torch.Tensor:
+        """Projects the denoised latents predicted at the current step to a low-resolution RGB preview."""
+        # The rectified-flow velocity points from the denoised latents to the noise
+        denoised = (
+            latents - current_timestep.unsqueeze(-1).to(latents.dtype) * noise_pred
+        )
+        denoised = self.patchifier.unpatchify(
+            latents=denoised[:, num_cond_latents:],
+            output_height=latent_height,
+            output_width=latent_width,
+            out_channels=self.transformer.config.in_channels
+            // math.prod(self.patchifier.patch_size),
+        )
+        return latent_previewer(denoised)
+
+    def latents_from_denoising_state(self, state: Dict[str, Any]) -> torch.Tensor:
+        """Returns the (b, c, f, h, w) latents of a complete denoising state, ready for `iter_decode`."""
+        channels, _, latent_height, latent_width = state["latent_shape"]
+        return self.patchifier.unpatchify(
+            latents=state["latents"][:, state["num_cond_latents"] :],
+            output_height=latent_height,
+            output_width=latent_width,
+            out_channels=channels // math.prod(self.patchifier.patch_size),
+        )
+
+    def iter_decode(
+        self,
+        latents: torch.Tensor,
+        is_video: bool = True,
+        vae_per_channel_normalize: bool = False,
+        decode_timestep: Union[List[float], float] = 0.0,
+        decode_noise_scale: Optional[List[float]] = None,
+        output_type: str = "pt",
+        tile_size: Optional[Tuple[Optional[int], Optional[int], Optional[int]]] = None,
+        tile_overlap: Tuple[int, int, int] = (1, 4, 4),
+        output_region: Optional[
+            Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]
+        ] = None,
+    ) -> Iterator:
+        """
+        Decodes unpatchified latents (b, c, f, h, w) and yields the post-processed frames in consecutive chunks
+        along the frames axis, as soon as they are final. The chunks follow the temporal tiles of `tile_size`;
+        without tiling the whole video is yielded at once. See `iter_tiled_vae_decode` for the tiling arguments.
+        """
+        if self.vae.decoder.timestep_conditioning:
+            noise = torch.randn_like(latents)
+            if not isinstance(decode_timestep, list):
+                decode_timestep = [decode_timestep] * latents.shape[0]
+            if decode_noise_scale is None:
+                decode_noise_scale = decode_timestep
+            elif not isinstance(decode_noise_scale, list):
+                decode_noise_scale = [decode_noise_scale] * latents.shape[0]
+
+            decode_timestep = torch.tensor(decode_timestep).to(latents.device)
+            decode_noise_scale = torch.tensor(decode_noise_scale).to(latents.device)[
+                :, None, None, None, None
+            ]
+            latents = latents * (1 - decode_noise_scale) + noise * decode_noise_scale
+        else:
+            decode_timestep = None
+
+        for chunk in iter_tiled_vae_decode(
+            latents,
+            self.vae,
+            is_video,
+            tile_size=tile_size,
+            tile_overlap=tile_overlap,
+            output_region=output_region,
+            vae_per_channel_normalize=vae_per_channel_normalize,
+            timestep=decode_timestep,
+        ):
+            if output_type == "uint8":
+                yield to_uint8_frames(chunk)
+            else:
+                yield self.image_processor.postprocess(chunk, output_type=output_type)
+
+    def _predict_guidance_branches(
+        self,
+        latents: torch.Tensor,
+        t: torch.Tensor,
+        branches: List[int],
+        fractional_coords: torch.Tensor,
+        prompt_embeds_batch: torch.Tensor,
+        prompt_attention_mask_batch: torch.Tensor,
+        current_timestep: torch.Tensor,
+        skip_layer_mask: Optional[torch.Tensor],
+        skip_layer_strategy: Optional[SkipLayerStrategy],
+        context_manager,
+    ) -> torch.Tensor:
+        """
+        Runs the transformer on the given guidance branches only.
+        The batched inputs are laid out branch-major, so the rows of a branch are contiguous.
+
+        Returns:
+            `torch.Tensor`: The transformer output of the selected branches, concatenated along the batch.
+        """
+        batch_size = latents.shape[0]
+        if branches == list(range(branches[0], branches[-1] + 1)):
+            rows = slice(branches[0] * batch_size, (branches[-1] + 1) * batch_size)
+        else:
+            rows = torch.cat(
+                [
+                    torch.arange(branch * batch_size, (branch + 1) * batch_size)
+                    for branch in branches
+                ]
+            ).to(latents.device)
+
+        num_branches = len(branches)
+        latent_model_input = (
+            torch.cat([latents] * num_branches) if num_branches > 1 else latents
+        )
+        latent_model_input = self.scheduler.scale_model_input(latent_model_input, t)
+
+        # Trim the text padding shared by the branches of this micro-batch
+        encoder_hidden_states, keep_index = self.mask_text_embeddings(
+            prompt_embeds_batch[rows], prompt_attention_mask_batch[rows]
+        )
+        if skip_layer_mask is not None:
+            skip_layer_mask = skip_layer_mask[:, rows]
+
+        with context_manager:
+            return self.transformer(
+                latent_model_input.to(self.transformer.dtype),
+                indices_grid=fractional_coords[rows],
+                encoder_hidden_states=encoder_hidden_states.to(self.transformer.dtype),
+                encoder_attention_mask=prompt_attention_mask_batch[rows, :keep_index],
+                timestep=current_timestep[rows],
+                skip_layer_mask=skip_layer_mask,
+                skip_layer_strategy=skip_layer_strategy,
+                return_dict=False,
+            )[0]
+
     def denoising_step(
         self,
         latents: torch.Tensor,
@@ -1146,6 +1749,18 @@ class LTXVideoPipeline(DiffusionPipeline):
         conditioning timestep.
         (hard-conditioning latents with conditioning_mask = 1.0 are never denoised)
         """
+        tokens_to_denoise_mask = None
+        if conditioning_mask is not None:
+            tokens_to_denoise_mask = (t - t_eps < (1.0 - conditioning_mask)).unsqueeze(
+                -1
+            )
+            # Let multistep solvers know which tokens are actually updated in this step
+            if "denoise_mask" in inspect.signature(self.scheduler.step).parameters:
+                extra_step_kwargs = {
+                    **extra_step_kwargs,
+                    "denoise_mask": tokens_to_denoise_mask,
+                }
+
         # Denoise the latents using the scheduler
         denoised_latents = self.scheduler.step(
             noise_pred,
@@ -1158,7 +1773,6 @@ class LTXVideoPipeline(DiffusionPipeline):
         if conditioning_mask is None:
             return denoised_latents
 
-        tokens_to_denoise_mask = (t - t_eps < (1.0 - conditioning_mask)).unsqueeze(-1)
         return torch.where(tokens_to_denoise_mask, denoised_latents, latents)
 
     def prepare_conditioning(
@@ -1222,8 +1836,18 @@ class LTXVideoPipeline(DiffusionPipeline):
                 media_item = conditioning_item.media_item
                 media_frame_number = conditioning_item.media_frame_number
                 strength = conditioning_item.conditioning_strength
-                assert media_item.ndim == 5  # (b, c, f, h, w)
-                b, c, n_frames, h, w = media_item.shape
+                if conditioning_item.latents is not None:
+                    # Already encoded
+                    latents = conditioning_item.latents.to(
+                        dtype=self.transformer.dtype, device=init_latents.device
+                    )
+                    assert latents.ndim == 5  # (b, c, f, h, w)
+                    n_frames = (latents.shape[2] - 1) * self.video_scale_factor + 1
+                    h = latents.shape[3] * self.vae_scale_factor
+                    w = latents.shape[4] * self.vae_scale_factor
+                else:
+                    assert media_item.ndim == 5  # (b, c, f, h, w)
+                    b, c, n_frames, h, w = media_item.shape
                 assert height == h and width == w
                 assert n_frames % 8 == 1
                 assert (
@@ -1232,11 +1856,10 @@ class LTXVideoPipeline(DiffusionPipeline):
                 )
 
                 # Encode the provided conditioning media item
-                latents = vae_encode(
-                    media_item.to(dtype=self.vae.dtype, device=self.vae.device),
-                    self.vae,
-                    vae_per_channel_normalize=vae_per_channel_normalize,
-                ).to(dtype=self.transformer.dtype)
+                if conditioning_item.latents is None:
+                    latents = self.encode_conditioning_media(
+                        media_item, vae_per_channel_normalize
+                    ).to(dtype=self.transformer.dtype)
 
                 # Handle the different conditioning cases
                 if media_frame_number == 0:
@@ -1,7 +1,7 @@
 import math
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Callable, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 import json
 import os
 from pathlib import Path
@@ -11,9 +11,8 @@ from diffusers.configuration_utils import ConfigMixin, register_to_config
 from diffusers.schedulers.scheduling_utils import SchedulerMixin
 from diffusers.utils import BaseOutput
 from torch import Tensor
-from safetensors import safe_open
-
 
+from ltx_video.utils.checkpoint_loader import read_safetensors_metadata
 from ltx_video.utils.torch_utils import append_dims
 
 from ltx_video.utils.diffusers_config_mapping import (
@@ -171,6 +170,14 @@ class RectifiedFlowSchedulerOutput(BaseOutput):
     pred_original_sample: Optional[torch.FloatTensor] = None
 
 
+# Available ODE solvers:
+# - "euler": first order, one model evaluation per step.
+# - "heun": second order predictor-corrector, two model evaluations per step (one for the last step).
+# - "multistep": second order Adams-Bashforth, reuses the previous step's velocity - one model
+#   evaluation per step.
+SOLVERS = ("euler", "heun", "multistep")
+
+
 class RectifiedFlowScheduler(SchedulerMixin, ConfigMixin, TimestepShifter):
     order = 1
 
@@ -182,15 +189,22 @@ class RectifiedFlowScheduler(SchedulerMixin, ConfigMixin, TimestepShifter):
         base_resolution: int = 32**2,
         target_shift_terminal: Optional[float] = None,
         sampler: Optional[str] = "Uniform",
+        solver: str = "euler",
     ):
         super().__init__()
+        if solver not in SOLVERS:
+            raise ValueError(f"Invalid solver: {solver}. Must be one of {SOLVERS}")
         self.init_noise_sigma = 1.0
         self.num_inference_steps = None
         self.sampler = sampler
+        self.solver = solver
+        # Heun evaluates the model twice per step (predictor and corrector)
+        self.order = 2 if solver == "heun" else 1
         self.shifting = shifting
         self.base_resolution = base_resolution
         self.target_shift_terminal = target_shift_terminal
         self.timesteps = self.sigmas = self.get_initial_timesteps(num_train_timesteps)
+        self._init_lookup_tables()
 
     def get_initial_timesteps(self, num_timesteps: int) -> Tensor:
         if self.sampler == "Uniform":
@@ -228,19 +242,90 @@ class RectifiedFlowScheduler(SchedulerMixin, ConfigMixin, TimestepShifter):
         self.timesteps = self.shift_timesteps(samples, self.timesteps)
         self.num_inference_steps = num_inference_steps
         self.sigmas = self.timesteps
+        # Also drops the solver state of any previous, possibly unfinished, denoising
+        self._init_lookup_tables()
+        if self.solver == "heun":
+            # Every timestep but the first is visited twice: once as the corrector of the previous
+            # step and once as the predictor of the next one. The last step is a plain Euler step.
+            self.timesteps = torch.cat(
+                [self.sigmas[:1], self.sigmas[1:].repeat_interleave(2)]
+            )
+
+    def _init_lookup_tables(self):
+        # The schedule padded with the terminal timestep 0, and its ascending-sorted copy used
+        # to find the next lower timestep of arbitrary (global or per-token) timesteps.
+        self.timesteps_padded = torch.cat(
+            [self.sigmas, torch.zeros(1, device=self.sigmas.device)]
+        )
+        self._sorted_timesteps_padded, _ = torch.sort(self.timesteps_padded)
+        self._step_index = None
+        # Previous velocity and step sizes kept by the higher-order solvers
+        self._solver_state = None
+
+    def get_solver_state(self) -> Dict[str, Any]:
+        """
+        Returns the state carried from one step to the next (the tracked step index and the history of the
+        higher-order solvers), so an interrupted denoising can be resumed with `set_solver_state`.
+        """
+        return {"step_index": self._step_index, "solver_state": self._solver_state}
+
+    def set_solver_state(self, state: Dict[str, Any]):
+        """Restores a state returned by `get_solver_state`, after `set_timesteps`."""
+        self._step_index = state["step_index"]
+        solver_state = state["solver_state"]
+        self._solver_state = (
+            tuple(
+                value.to(self.sigmas.device) if torch.is_tensor(value) else value
+                for value in solver_state
+            )
+            if solver_state is not None
+            else None
+        )
+
+    @property
+    def step_index(self) -> Optional[int]:
+        """
+        The index of the current timestep in the schedule, tracked by global-timestep steps.
+        """
+        return self._step_index
+
+    @property
+    def is_corrector_step(self) -> bool:
+        """
+        Whether the next `step` is the corrector of a heun step, whose model output has to be evaluated at the
+        predicted sample.
+        """
+        return self.solver == "heun" and self._solver_state is not None
+
+    def index_for_timestep(self, timestep: Tensor, t_eps: float = 1e-6) -> int:
+        """
+        Returns the index in `timesteps_padded` of the last timestep that is not lower than `timestep`.
+        """
+        query = (timestep - t_eps).to(self._sorted_timesteps_padded.dtype)
+        num_lower = torch.searchsorted(self._sorted_timesteps_padded, query).item()
+        return len(self.timesteps_padded) - 1 - num_lower
+
+    def get_lower_timesteps(self, timestep: Tensor, t_eps: float = 1e-6) -> Tensor:
+        """
+        Returns, for every entry of `timestep`, the largest timestep of the padded schedule
+        that is lower than it. Uses a sorted search, so no (num_steps, ...) intermediates are built.
+        """
+        sorted_timesteps = self._sorted_timesteps_padded
+        query = (timestep - t_eps).to(sorted_timesteps.dtype)
+        # Number of schedule entries strictly lower than each query
+        num_lower = torch.searchsorted(sorted_timesteps, query.contiguous())
+        # No lower entry only happens at timestep 0, in which case the lower timestep is also 0
+        lower_index = (num_lower - 1).clamp_(min=0)
+        return sorted_timesteps[lower_index].to(timestep.dtype)
 
     @staticmethod
     def from_pretrained(pretrained_model_path: Union[str, os.PathLike]):
         pretrained_model_path = Path(pretrained_model_path)
         if pretrained_model_path.is_file():
-            comfy_single_file_state_dict = {}
-            with safe_open(pretrained_model_path, framework="pt", device="cpu") as f:
-                metadata = f.metadata()
-                for k in f.keys():
-                    comfy_single_file_state_dict[k] = f.get_tensor(k)
+            # Only the header is needed, the tensor data is never read
+            metadata = read_safetensors_metadata(pretrained_model_path)
             configs = json.loads(metadata["config"])
             config = configs["scheduler"]
-            del comfy_single_file_state_dict
 
         elif pretrained_model_path.is_dir():
             diffusers_noise_scheduler_config_path = (
@@ -277,6 +362,7 @@ class RectifiedFlowScheduler(SchedulerMixin, ConfigMixin, TimestepShifter):
         timestep: torch.FloatTensor,
         sample: torch.FloatTensor,
         return_dict: bool = True,
+        denoise_mask: Optional[torch.Tensor] = None,
         **kwargs,
     ) -> Union[RectifiedFlowSchedulerOutput, Tuple]:
         """
@@ -284,7 +370,10 @@ class RectifiedFlowScheduler(SchedulerMixin, ConfigMixin, TimestepShifter):
         process from the learned model outputs (most often the predicted noise).
         z_{t_1} = z_t - \Delta_t * v
         The method finds the next timestep that is lower than the input timestep(s) and denoises the latents
-        to that level. The input timestep(s) are not required to be one of the predefined timesteps.
+        to that level. Per-token timesteps are not required to be one of the predefined timesteps. A global
+        timestep is looked up on the first step after `set_timesteps`, and the following global steps walking
+        the schedule in order reuse the tracked step index. It is looked up again whenever `timestep` is not
+        the tracked one, e.g. when steps are skipped, repeated or resumed at another timestep.
 
         Args:
             model_output (`torch.FloatTensor`):
@@ -295,6 +384,9 @@ class RectifiedFlowScheduler(SchedulerMixin, ConfigMixin, TimestepShifter):
                 A current latent tokens to be de-noised.
             return_dict (`bool`, *optional*, defaults to `True`):
                 Whether or not to return a [`~schedulers.scheduling_ddim.DDIMSchedulerOutput`] or `tuple`.
+            denoise_mask (`torch.Tensor`, *optional*):
+                A boolean mask, broadcastable to `sample`, of the tokens that are actually updated by the caller
+                in this step. Used by the higher-order solvers to ignore the history of frozen tokens.
 
         Returns:
             [`~schedulers.scheduling_utils.RectifiedFlowSchedulerOutput`] or `tuple`:
@@ -307,33 +399,97 @@ class RectifiedFlowScheduler(SchedulerMixin, ConfigMixin, TimestepShifter):
             )
         t_eps = 1e-6  # Small epsilon to avoid numerical issues in timestep values
 
-        timesteps_padded = torch.cat(
-            [self.timesteps, torch.zeros(1, device=self.timesteps.device)]
-        )
+        if self.solver == "heun" and self._solver_state is not None:
+            # Corrector call, the model was evaluated at the predicted sample
+            prev_sample = self._heun_correct(model_output, sample)
+            if not return_dict:
+                return (prev_sample,)
+            return RectifiedFlowSchedulerOutput(prev_sample=prev_sample)
 
         # Find the next lower timestep(s) and compute the dt from the current timestep(s)
         if timestep.ndim == 0:
-            # Global timestep case
-            lower_mask = timesteps_padded < timestep - t_eps
-            lower_timestep = timesteps_padded[lower_mask][0]  # Closest lower timestep
+            # Global timestep case: when the schedule is walked in order, the next lower timestep
+            # is read directly from the tracked step index.
+            if (
+                self._step_index is None
+                or (timestep - self.timesteps_padded[self._step_index]).abs() > t_eps
+            ):
+                self._step_index = self.index_for_timestep(timestep, t_eps)
+            lower_index = min(self._step_index + 1, len(self.timesteps_padded) - 1)
+            lower_timestep = self.timesteps_padded[lower_index].to(timestep.dtype)
             dt = timestep - lower_timestep
+            self._step_index = lower_index
 
         else:
             # Per-token case
             assert timestep.ndim == 2
-            lower_mask = timesteps_padded[:, None, None] < timestep[None] - t_eps
-            lower_timestep = lower_mask * timesteps_padded[:, None, None]
-            lower_timestep, _ = lower_timestep.max(dim=0)
+            lower_timestep = self.get_lower_timesteps(timestep, t_eps)
             dt = (timestep - lower_timestep)[..., None]
+            timestep, lower_timestep = timestep[..., None], lower_timestep[..., None]
 
         # Compute previous sample
-        prev_sample = sample - dt * model_output
+        if self.solver == "multistep":
+            prev_sample = self._multistep_update(
+                model_output, timestep, lower_timestep, dt, sample, denoise_mask, t_eps
+            )
+        else:
+            prev_sample = sample - dt * model_output
+            # Keep the predictor's state for the corrector call at the lower timestep. The final
+            # step (to timestep 0) has no corrector call and remains an Euler step, so no state is
+            # left behind, e.g. in the denoising checkpoints or for the next use of the scheduler.
+            if self.solver == "heun" and bool((lower_timestep > t_eps).any()):
+                self._solver_state = (sample, model_output, dt, denoise_mask)
 
         if not return_dict:
             return (prev_sample,)
 
         return RectifiedFlowSchedulerOutput(prev_sample=prev_sample)
 
+    def _heun_correct(
+        self, model_output: torch.FloatTensor, sample: torch.FloatTensor
+    ) -> torch.FloatTensor:
+        prev_sample_orig, prev_model_output, dt, denoise_mask = self._solver_state
+        self._solver_state = None
+        prev_sample = prev_sample_orig - dt * 0.5 * (prev_model_output + model_output)
+        if denoise_mask is not None:
+            # Tokens that were frozen during the predictor remain frozen for the whole step
+            prev_sample = torch.where(denoise_mask, prev_sample, sample)
+        return prev_sample
+
+    def _multistep_update(
+        self,
+        model_output: torch.FloatTensor,
+        timestep: torch.Tensor,
+        lower_timestep: torch.Tensor,
+        dt: torch.Tensor,
+        sample: torch.FloatTensor,
+        denoise_mask: Optional[torch.Tensor],
+        t_eps: float,
+    ) -> torch.FloatTensor:
+        r"""
+        Second order Adams-Bashforth update with variable step sizes:
+        z_{t_1} = z_t - \Delta_t * (v + r / 2 * (v - v_prev)), r = \Delta_t / \Delta_prev
+        The history is only used for tokens that reached the current timestep with the previous step.
+        Other tokens (first step, frozen conditioning tokens) fall back to an Euler step.
+        """
+        prev_sample = sample - dt * model_output
+        state = self._solver_state
+        if state is not None:
+            prev_model_output, prev_dt, prev_lower_timestep, prev_denoise_mask = state
+            has_history = ((timestep - prev_lower_timestep).abs() < t_eps) & (
+                prev_dt > t_eps
+            )
+            if prev_denoise_mask is not None:
+                has_history = has_history & prev_denoise_mask
+            ratio = torch.where(
+                has_history, dt / prev_dt.clamp(min=t_eps), torch.zeros_like(dt)
+            )
+            prev_sample = prev_sample - dt * (0.5 * ratio) * (
+                model_output - prev_model_output
+            )
+        self._solver_state = (model_output, dt, lower_timestep, denoise_mask)
+        return prev_sample
+
     def add_noise(
         self,
         original_samples: torch.FloatTensor,
@@ -0,0 +1,249 @@
+import inspect
+import json
+import math
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import torch
+from torch import nn
+
+# Maps the safetensors dtype tags to torch dtypes.
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+if hasattr(torch, "float8_e4m3fn"):
+    SAFETENSORS_DTYPES["F8_E4M3"] = torch.float8_e4m3fn
+    SAFETENSORS_DTYPES["F8_E5M2"] = torch.float8_e5m2
+
+# Keys prefixes of the different components inside a single-file (comfy-style) checkpoint.
+TRANSFORMER_PREFIX = "model.diffusion_model."
+VAE_PREFIX = "vae."
+
+
+def read_safetensors_header(path: Union[str, os.PathLike]) -> Dict:
+    """Reads only the JSON header of a safetensors file, without touching the tensor data."""
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        return json.loads(f.read(header_size))
+
+
+def read_safetensors_metadata(path: Union[str, os.PathLike]) -> Dict[str, str]:
+    """Returns the `__metadata__` section of a safetensors file."""
+    return read_safetensors_header(path).get("__metadata__", {})
+
+
+def _element_size(dtype: torch.dtype) -> int:
+    return torch.empty((), dtype=dtype).element_size()
+
+
+class SingleFileCheckpoint:
+    """
+    A memory-mapped view over a single safetensors file that contains all model parts.
+
+    The file is opened and mapped once. Tensors returned by `get_tensor` and `state_dict` are
+    zero-copy views into the mapping whenever no dtype conversion is requested, so several
+    components can be built from the same file without reading it more than once.
+    The mapping is copy-on-write: writing to a returned tensor never modifies the file.
+
+    Args:
+        path (`str` or `os.PathLike`): Path to the safetensors checkpoint.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._data_offset = 8 + header_size
+        self.metadata: Dict[str, str] = header.pop("__metadata__", {}) or {}
+        self._tensor_infos: Dict[str, Dict] = header
+        self._configs = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        # The mapping itself is released once all the tensors viewing it are garbage-collected.
+        self._mmap = None
+
+    @property
+    def configs(self) -> Dict[str, Dict]:
+        """The per-component configs stored in the checkpoint metadata."""
+        if self._configs is None:
+            self._configs = json.loads(self.metadata["config"])
+        return self._configs
+
+    def keys(self) -> List[str]:
+        return list(self._tensor_infos.keys())
+
+    def get_tensor(
+        self, name: str, dtype: Optional[torch.dtype] = None
+    ) -> torch.Tensor:
+        if self._mmap is None:
+            raise ValueError(f"Checkpoint {self.path} has already been closed")
+        info = self._tensor_infos[name]
+        stored_dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        shape = info["shape"]
+        start, end = info["data_offsets"]
+        if end == start:
+            tensor = torch.empty(shape, dtype=stored_dtype)
+        else:
+            tensor = torch.frombuffer(
+                self._mmap,
+                dtype=stored_dtype,
+                count=(end - start) // _element_size(stored_dtype),
+                offset=self._data_offset + start,
+            ).view(shape)
+        if dtype is not None and tensor.is_floating_point() and tensor.dtype != dtype:
+            tensor = tensor.to(dtype)
+        return tensor
+
+    def tensor_nbytes(self, name: str, dtype: Optional[torch.dtype] = None) -> int:
+        """Returns the size of a tensor once loaded by `get_tensor(name, dtype)`, without loading it."""
+        info = self._tensor_infos[name]
+        stored_dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        if dtype is None or not stored_dtype.is_floating_point:
+            dtype = stored_dtype
+        return math.prod(info["shape"]) * _element_size(dtype)
+
+    def advise(self, names: Iterable[str], advice: Optional[int]):
+        """
+        Gives the OS an `madvise` hint about the bytes of the given tensors, e.g. `mmap.MADV_WILLNEED` to
+        read them ahead in the background, or `mmap.MADV_DONTNEED` to release their pages once they are no
+        longer used (they are read again from the file if they are accessed later). A no-op on platforms
+        without `madvise`, or if `advice` is None.
+        """
+        if advice is None or self._mmap is None or not hasattr(self._mmap, "madvise"):
+            return
+        for name in names:
+            start, end = self._tensor_infos[name]["data_offsets"]
+            if end == start:
+                continue
+            start += self._data_offset
+            aligned_start = start - start % mmap.PAGESIZE
+            self._mmap.madvise(
+                advice, aligned_start, self._data_offset + end - aligned_start
+            )
+
+    def iter_tensors(
+        self, prefix: str = "", dtype: Optional[torch.dtype] = None
+    ) -> Iterator:
+        for name in self._tensor_infos:
+            if name.startswith(prefix):
+                yield name, self.get_tensor(name, dtype=dtype)
+
+    def state_dict(
+        self, prefix: str = "", dtype: Optional[torch.dtype] = None
+    ) -> Dict[str, torch.Tensor]:
+        """
+        Returns the tensors whose names start with `prefix` (names are kept as stored).
+        Floating point tensors are converted to `dtype` when given; integer tensors are left as is.
+        """
+        return dict(self.iter_tensors(prefix, dtype=dtype))
+
+
+def _has_non_persistent_buffers(model: nn.Module) -> bool:
+    persistent_keys = set(model.state_dict().keys())
+    return any(name not in persistent_keys for name, _ in model.named_buffers())
+
+
+def _supports_assign() -> bool:
+    return "assign" in inspect.signature(nn.Module.load_state_dict).parameters
+
+
+@contextmanager
+def assign_on_load(model: nn.Module):
+    """
+    Makes `model.load_state_dict` assign the given tensors as the parameters and buffers instead of copying them
+    into the existing ones, like `load_state_dict(..., assign=True)`. Unlike passing `assign`, this also works
+    through `load_state_dict` overrides that do not take or forward it (e.g. the ones remapping keys), since
+    the flag is set on each module's `_load_from_state_dict`. Requires torch>=2.1.
+    """
+    for module in model.modules():
+
+        def load_from_state_dict(
+            state_dict,
+            prefix,
+            local_metadata,
+            *args,
+            _load=module._load_from_state_dict,
+        ):
+            local_metadata = {**local_metadata, "assign_to_params_buffers": True}
+            return _load(state_dict, prefix, local_metadata, *args)
+
+        module._load_from_state_dict = load_from_state_dict
+    try:
+        yield model
+    finally:
+        for module in model.modules():
+            module.__dict__.pop("_load_from_state_dict", None)
+
+
+def load_model_from_checkpoint(
+    model_cls,
+    checkpoint: SingleFileCheckpoint,
+    component: str,
+    prefix: str = "",
+    dtype: Optional[torch.dtype] = None,
+) -> nn.Module:
+    """
+    Builds a model from its config in the checkpoint metadata and loads its weights from the mapping.
+
+    The model is instantiated on the meta device, so no randomly initialized (fp32) copy of the
+    weights is ever allocated. With torch>=2.1, the mapped (or converted) tensors are assigned
+    directly as parameters, also through `load_state_dict` overrides (see `assign_on_load`);
+    otherwise the model is materialized in `dtype` and the weights are copied into it once.
+
+    Args:
+        model_cls: The model class, which must implement `from_config`.
+        checkpoint (`SingleFileCheckpoint`): The opened checkpoint.
+        component (`str`): The component's key in the checkpoint config (e.g. "vae", "transformer").
+        prefix (`str`): Only tensors whose names start with this prefix are passed to the model.
+        dtype (`torch.dtype`, *optional*): Target dtype of the floating point weights. If None, the
+            weights keep the dtype they are stored with.
+    """
+    config = checkpoint.configs[component]
+    with torch.device("meta"):
+        model = model_cls.from_config(config)
+
+    if _has_non_persistent_buffers(model):
+        # Buffers computed in __init__ are not stored in the checkpoint and cannot be recovered
+        # from the meta device, so the model has to be constructed for real.
+        model = model_cls.from_config(config)
+        if dtype is not None:
+            model = model.to(dtype)
+        model.load_state_dict(checkpoint.state_dict(prefix, dtype=dtype))
+        return model
+
+    state_dict = checkpoint.state_dict(prefix, dtype=dtype)
+    if _supports_assign():
+        with assign_on_load(model):
+            model.load_state_dict(state_dict)
+    else:
+        if dtype is None:
+            # Keep the weights in the dtype they are stored with
+            dtype = next(
+                (t.dtype for t in state_dict.values() if t.is_floating_point()), None
+            )
+        if dtype is not None:
+            model = model.to(dtype)
+        model = model.to_empty(device="cpu")
+        model.load_state_dict(state_dict)
+    return model
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import torch
+
+from ltx_video.utils.disk_cache import DiskTensorCache
+
+
+def hash_file(path: Union[str, os.PathLike], chunk_size: int = 1 << 20) -> str:
+    """Returns the SHA-256 of the content of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ConditioningLatentCache:
+    """
+    A content-addressed cache of VAE-encoded conditioning media, kept in memory and optionally on disk.
+
+    Entries are keyed on the content hash of the media file and on everything that changes its encoding:
+    the target size and padding, the range of frames, `vae_per_channel_normalize` and the VAE identity.
+    So the same reference image reused across prompts or seeds is decoded and encoded only once.
+    The in-memory cache is an LRU of at most `max_memory_bytes` of latents, in front of an optional
+    `DiskTensorCache`.
+
+    Args:
+        vae_id (`str`): Identifies the VAE (e.g. its checkpoint and dtype). Latents of different VAEs never
+            collide.
+        cache_dir (`str` or `os.PathLike`, *optional*): Directory of the persistent cache. If None, only
+            the in-memory cache is used.
+        max_memory_bytes (`int`): Maximal total size of the latents kept in memory.
+        max_disk_bytes (`int`, *optional*): Maximal total size of the disk cache. Unbounded if None.
+    """
+
+    def __init__(
+        self,
+        vae_id: str,
+        cache_dir: Optional[Union[str, os.PathLike]] = None,
+        max_memory_bytes: int = 1 << 30,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        self.vae_id = vae_id
+        self._disk = (
+            DiskTensorCache(cache_dir, "conditioning_latent", max_disk_bytes)
+            if cache_dir is not None
+            else None
+        )
+        self.max_memory_bytes = max_memory_bytes
+        self._memory: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._memory_bytes = 0
+        # Content hashes of the files already hashed, by (path, size, modification time)
+        self._file_hashes: Dict[Tuple[str, int, int], str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def media_hash(self, path: Union[str, os.PathLike]) -> str:
+        """Returns the content hash of a media file. Files are only re-hashed when they change."""
+        stat = os.stat(path)
+        file_id = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._file_hashes.get(file_id)
+        if content_hash is None:
+            content_hash = hash_file(path)
+            self._file_hashes[file_id] = content_hash
+        return content_hash
+
+    def key(
+        self,
+        media_hash: str,
+        height: int,
+        width: int,
+        padding: Tuple[int, int, int, int],
+        frame_range: Tuple[int, int],
+        vae_per_channel_normalize: bool,
+    ) -> str:
+        payload = json.dumps(
+            [
+                self.vae_id,
+                media_hash,
+                height,
+                width,
+                list(padding),
+                list(frame_range),
+                vae_per_channel_normalize,
+            ]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[torch.Tensor]:
+        """Returns the cached latents (b, c, f, h, w), or None if they are not cached."""
+        latents = self._memory.get(key)
+        if latents is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return latents
+
+        tensors = self._disk.get(key, ["latents"]) if self._disk is not None else None
+        if tensors is not None:
+            latents = tensors["latents"]
+            self._put_memory(key, latents)
+            self.hits += 1
+            return latents
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, latents: torch.Tensor):
+        """Caches the latents (b, c, f, h, w) of a conditioning media item."""
+        latents = latents.detach().to("cpu", copy=True).contiguous()
+        self._put_memory(key, latents)
+
+        if self._disk is not None:
+            self._disk.put(key, {"latents": latents})
+
+    def _put_memory(self, key: str, latents: torch.Tensor):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        self._memory[key] = latents
+        self._memory_bytes += latents.nbytes
+        # The most recent entry is always kept, even if it alone exceeds the budget
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def clear_memory(self):
+        self._memory.clear()
+        self._memory_bytes = 0
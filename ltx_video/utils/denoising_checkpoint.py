@@ -0,0 +1,37 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, Union
+
+import torch
+
+
+def _to_cpu(value: Any) -> Any:
+    if torch.is_tensor(value):
+        return value.detach().cpu()
+    if isinstance(value, dict):
+        return {key: _to_cpu(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_cpu(item) for item in value)
+    return value
+
+
+def save_denoising_checkpoint(path: Union[str, os.PathLike], state: Dict[str, Any]):
+    """
+    Saves a denoising state produced by `LTXVideoPipeline.__call__(checkpoint_callback=...)`. The file is
+    replaced atomically, so an interruption while saving leaves the previous checkpoint intact.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    torch.save(_to_cpu(state), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_denoising_checkpoint(path: Union[str, os.PathLike]) -> Dict[str, Any]:
+    """Loads a denoising state saved by `save_denoising_checkpoint`, on the CPU."""
+    return torch.load(path, map_location="cpu", weights_only=True)
+
+
+def is_denoising_complete(state: Dict[str, Any]) -> bool:
+    """Whether the state holds the fully denoised latents, ready to be decoded."""
+    return state["step"] >= len(state["timesteps"])
@@ -0,0 +1,92 @@
+import logging
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Union
+
+import torch
+from safetensors.torch import save_file
+
+from ltx_video.utils.checkpoint_loader import SingleFileCheckpoint
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class DiskTensorCache:
+    """
+    A directory of cache entries, each a safetensors file of named tensors, memory-mapped when read.
+
+    Entries are written atomically and never overwritten, so several processes can share the directory.
+    Reading an entry marks it as recently used, and the least recently used entries are evicted beyond
+    `max_disk_bytes` when an entry is added. Corrupted entries are deleted when read.
+
+    The entries are named after the `namespace`, so caches of different kinds can share a directory:
+    their keys never collide and each one only evicts its own entries, under its own `max_disk_bytes`.
+
+    Args:
+        cache_dir (`str` or `os.PathLike`): Directory of the entries, created if needed.
+        namespace (`str`): What is cached (e.g. "text_embedding"), also used in the log messages.
+        max_disk_bytes (`int`, *optional*): Maximal total size of the entries of the namespace. Unbounded if
+            None.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, os.PathLike],
+        namespace: str,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace
+        self.max_disk_bytes = max_disk_bytes
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / f"{self.namespace}-{key}.safetensors"
+
+    def contains(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def get(self, key: str, names: Sequence[str]) -> Optional[Dict[str, torch.Tensor]]:
+        """Returns the tensors `names` of the entry, or None if there is no such (valid) entry."""
+        path = self.path(key)
+        if not path.exists():
+            return None
+        try:
+            checkpoint = SingleFileCheckpoint(path)
+            tensors = {name: checkpoint.get_tensor(name) for name in names}
+            os.utime(path)  # Mark as recently used for the eviction
+        except (OSError, KeyError, ValueError, struct.error) as e:
+            logger.warning(
+                f"Ignoring corrupted {self.namespace} cache entry {path}: {e}"
+            )
+            path.unlink(missing_ok=True)
+            return None
+        return tensors
+
+    def put(self, key: str, tensors: Dict[str, torch.Tensor]):
+        """Adds an entry of contiguous CPU tensors, unless it already exists."""
+        path = self.path(key)
+        if path.exists():
+            return
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        save_file(tensors, tmp_path)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        if self.max_disk_bytes is None:
+            return
+        entries = []
+        for path in self.cache_dir.glob(self.path("*").name):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple, Union
+
+
+@dataclass
+class GuidanceSchedule:
+    """
+    Describes when a guidance (CFG or STG) is applied during denoising, and with which scale.
+
+    A guidance is active at a step when the step lies in `step_range` and its sigma lies in `sigma_range`
+    (each range is ignored when not set). Steps are counted in solver steps, so a second-order solver's
+    predictor and corrector share the same step index.
+
+    Attributes:
+        scale (`float` or `List[float]`): The guidance scale, either constant or one value per step.
+        step_range (`Tuple[int, int]`, *optional*): The steps `[start, end)` where the guidance is active.
+            Negative indices count from the end.
+        sigma_range (`Tuple[float, float]`, *optional*): The sigmas `[low, high]` where the guidance is active.
+    """
+
+    scale: Union[float, List[float]]
+    step_range: Optional[Tuple[int, int]] = None
+    sigma_range: Optional[Tuple[float, float]] = None
+
+    @classmethod
+    def from_value(
+        cls, value: Union[float, Sequence[float], "GuidanceSchedule"]
+    ) -> "GuidanceSchedule":
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, (list, tuple)):
+            return cls(scale=list(value) if len(value) > 1 else value[0])
+        return cls(scale=value)
+
+    @property
+    def max_scale(self) -> float:
+        return max(self.scale) if isinstance(self.scale, list) else self.scale
+
+    def validate(self, num_steps: int):
+        """
+        Checks that the scales are not negative and that a per-step scale has one value per step, so invalid
+        schedules fail before any compute.
+        """
+        scales = self.scale if isinstance(self.scale, list) else [self.scale]
+        if any(scale < 0 for scale in scales):
+            raise ValueError(f"Guidance scales must not be negative, got {self.scale}.")
+        if isinstance(self.scale, list) and len(self.scale) != num_steps:
+            raise ValueError(
+                f"Got {len(self.scale)} per-step guidance scales for {num_steps} steps."
+            )
+
+    def scale_at(
+        self, step_index: int, num_steps: int, sigma: float
+    ) -> Optional[float]:
+        """
+        Returns the guidance scale at the given step, or None if the guidance is inactive there. A per-step scale
+        is expected to have been checked by `validate`.
+        """
+        if self.step_range is not None:
+            start, end = (
+                index + num_steps if index < 0 else index for index in self.step_range
+            )
+            if not start <= step_index < end:
+                return None
+        if self.sigma_range is not None:
+            low, high = self.sigma_range
+            if not low <= sigma <= high:
+                return None
+        if isinstance(self.scale, list):
+            return self.scale[step_index]
+        return self.scale
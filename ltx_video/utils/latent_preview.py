@@ -0,0 +1,98 @@
+import os
+from typing import Union
+
+import torch
+import torch.nn.functional as F
+from safetensors.torch import save_file
+
+from ltx_video.utils.checkpoint_loader import SingleFileCheckpoint
+
+
+class LatentPreviewer:
+    """
+    Turns latents into a low-resolution RGB video, one pixel per latent, with a per-channel linear projection
+    of the latent channels. It is orders of magnitude cheaper than the VAE decoder, so it can run during
+    denoising to preview the generation.
+
+    The projection is fitted offline against the VAE with `fit`, see `fit_latent_preview.py`.
+
+    Args:
+        weight (`torch.Tensor`): The (3, c) projection of the latent channels to RGB in [-1, 1].
+        bias (`torch.Tensor`): The (3,) RGB bias.
+    """
+
+    def __init__(self, weight: torch.Tensor, bias: torch.Tensor):
+        if weight.ndim != 2 or weight.shape[0] != 3 or bias.shape != (3,):
+            raise ValueError(
+                f"Expected a (3, c) weight and a (3,) bias, got {tuple(weight.shape)} and {tuple(bias.shape)}"
+            )
+        self.weight = weight.float()
+        self.bias = bias.float()
+
+    @classmethod
+    def from_file(cls, path: Union[str, os.PathLike]) -> "LatentPreviewer":
+        with SingleFileCheckpoint(path) as checkpoint:
+            return cls(checkpoint.get_tensor("weight"), checkpoint.get_tensor("bias"))
+
+    def save(self, path: Union[str, os.PathLike]):
+        save_file(
+            {"weight": self.weight.contiguous(), "bias": self.bias.contiguous()}, path
+        )
+
+    @torch.no_grad()
+    def __call__(self, latents: torch.Tensor) -> torch.Tensor:
+        """
+        Projects latents (b, c, f, h, w) to a (b, f, h, w, 3) uint8 RGB video, on the latents' device.
+        """
+        weight = self.weight.to(latents.device)
+        bias = self.bias.to(latents.device)
+        rgb = torch.einsum("bcfhw,rc->bfhwr", latents.float(), weight) + bias
+        return rgb.add_(1.0).mul_(127.5).clamp_(0, 255).to(torch.uint8)
+
+    @classmethod
+    @torch.no_grad()
+    def fit(cls, latents: torch.Tensor, colors: torch.Tensor) -> "LatentPreviewer":
+        """
+        Fits the projection by least squares, from latents (b, c, f, h, w) encoded by the VAE and the average
+        colors (b, 3, f, h, w) of the pixels each latent covers, as returned by `pool_to_latent_grid`.
+        """
+        if colors.shape[0] != latents.shape[0] or colors.shape[2:] != latents.shape[2:]:
+            raise ValueError(
+                f"The colors of shape {tuple(colors.shape)} do not match the latents of shape "
+                f"{tuple(latents.shape)}"
+            )
+        # Solve [latents, 1] @ solution = colors, over all the latents
+        inputs = latents.float().movedim(1, -1).reshape(-1, latents.shape[1]).cpu()
+        inputs = torch.cat([inputs, torch.ones_like(inputs[:, :1])], dim=1)
+        targets = colors.float().movedim(1, -1).reshape(-1, 3).cpu()
+        solution = torch.linalg.lstsq(inputs, targets).solution
+        return cls(weight=solution[:-1].T.contiguous(), bias=solution[-1].contiguous())
+
+
+@torch.no_grad()
+def pool_to_latent_grid(
+    videos: torch.Tensor,
+    temporal_scale: int = 8,
+    spatial_scale: int = 32,
+    causal: bool = True,
+) -> torch.Tensor:
+    """
+    Averages videos (b, 3, frames, height, width) over the pixels covered by each latent, which gives the
+    regression targets of `LatentPreviewer.fit`.
+
+    Args:
+        temporal_scale (`int`): The number of frames per latent frame.
+        spatial_scale (`int`): The number of pixels per latent, along the height and the width.
+        causal (`bool`): Whether the first latent frame only covers the first frame, as in causal VAEs.
+
+    Returns:
+        `torch.Tensor`: The (b, 3, latent frames, latent height, latent width) average colors.
+    """
+    videos = videos.float()
+    if not causal:
+        return F.avg_pool3d(videos, (temporal_scale, spatial_scale, spatial_scale))
+    first_frame = F.avg_pool3d(videos[:, :, :1], (1, spatial_scale, spatial_scale))
+    other_frames = F.avg_pool3d(
+        videos[:, :, 1:], (temporal_scale, spatial_scale, spatial_scale)
+    )
+    return torch.cat([first_frame, other_frames], dim=2)
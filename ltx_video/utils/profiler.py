@@ -0,0 +1,350 @@
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypeVar, Union
+
+import torch
+from torch import nn
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+T = TypeVar("T")
+
+_NULL_CONTEXT = nullcontext()
+
+
+def read_host_memory() -> Dict[str, Optional[int]]:
+    """
+    Returns the current (`rss_bytes`) and peak (`peak_rss_bytes`) resident memory of the process, in bytes.
+    The current resident memory is None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {
+            "rss_bytes": int(fields["VmRSS"].split()[0]) * 1024,
+            "peak_rss_bytes": int(fields["VmHWM"].split()[0]) * 1024,
+        }
+    except (OSError, KeyError, ValueError):
+        pass
+    if resource is None:
+        return {"rss_bytes": None, "peak_rss_bytes": None}
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return {
+        "rss_bytes": None,
+        "peak_rss_bytes": peak if sys.platform == "darwin" else peak * 1024,
+    }
+
+
+def module_resident_bytes(
+    modules: Dict[str, Any],
+) -> Dict[str, Dict[str, int]]:
+    """
+    Returns the bytes of the parameters and buffers of each module, by device type (e.g. `{"cuda": ...,
+    "cpu": ...}`). Values that are not modules (e.g. tokenizers) or None are skipped. Weights memory-mapped
+    from a checkpoint count as "cpu", although the OS may only page them in when they are used.
+    """
+    resident = {}
+    for name, module in modules.items():
+        if not isinstance(module, nn.Module):
+            continue
+        seen = set()
+        by_device = defaultdict(int)
+        for tensor in itertools.chain(module.parameters(), module.buffers()):
+            if tensor.device.type == "meta":
+                continue
+            key = (tensor.device, tensor.data_ptr())
+            if key in seen:  # Tied weights
+                continue
+            seen.add(key)
+            by_device[tensor.device.type] += tensor.nbytes
+        resident[name] = dict(by_device)
+    return resident
+
+
+class NullProfiler:
+    """
+    The profiler of uninstrumented runs: every method is a no-op, so the instrumented code costs nothing
+    when profiling is off.
+    """
+
+    enabled = False
+
+    def stage(self, name: str, **args):
+        return _NULL_CONTEXT
+
+    def begin(self, name: str, **args):
+        return None
+
+    def end(self, span):
+        pass
+
+    def profile_iter(self, iterable: Iterable[T], name: str, **args) -> Iterable[T]:
+        return iterable
+
+
+NULL_PROFILER = NullProfiler()
+
+
+@dataclass
+class _Span:
+    name: str
+    args: Dict[str, Any]
+    start: float
+    # The highest memory use seen so far while the span is open
+    peaks: Dict[str, int] = field(default_factory=dict)
+
+
+class StageProfiler:
+    """
+    Records the wall-clock time of the stages of a generation, as possibly nested named spans, and exports
+    them as a JSON summary and as a Chrome trace (open it in chrome://tracing or https://ui.perfetto.dev).
+
+    With `track_memory`, the memory of the process is also recorded at the end of each span: the resident
+    host memory, the CUDA allocator statistics, and the peaks of both during the span. Nested spans are
+    accounted for in the peaks of their parents. On Linux the host peak is reset at the span boundaries
+    through /proc/self/clear_refs; elsewhere it is the peak of the process so far.
+
+    Args:
+        synchronize (`bool`): Whether to synchronize CUDA at the start and end of each span, so the spans
+            measure the GPU work they launch rather than just the time to queue it. This serializes the host
+            and the device, so the total time is slightly higher than without profiling.
+        track_memory (`bool`): Whether to record the memory use of each span. Each span then reads and
+            resets the memory peaks twice, which makes very short spans (e.g. per-block hooks) slower.
+    """
+
+    enabled = True
+
+    def __init__(self, synchronize: bool = True, track_memory: bool = False):
+        self.synchronize = synchronize and torch.cuda.is_available()
+        self.track_memory = track_memory
+        # (name, start, end, thread id, args, memory or None), in seconds since the creation of the profiler
+        self.events: List[tuple] = []
+        # The resident bytes of the pipeline modules at named points of the generation
+        self.module_snapshots: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._origin = time.perf_counter()
+        self._hooks = []
+        self._local = threading.local()
+        self._can_reset_host_peak = sys.platform.startswith("linux")
+        if self.track_memory:
+            self._fold_memory_peaks()
+
+    def now(self) -> float:
+        """Returns the current time, in seconds since the creation of the profiler."""
+        if self.synchronize:
+            torch.cuda.synchronize()
+        return time.perf_counter() - self._origin
+
+    @property
+    def _stack(self) -> List[_Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def begin(self, name: str, **args) -> _Span:
+        """Opens a span, to be closed by `end`. `args` are shown in the trace, e.g. the step index."""
+        if self.track_memory:
+            # The peaks of the enclosing spans until now, then a fresh peak for this one
+            self._fold_memory_peaks()
+        span = _Span(name, args, self.now())
+        self._stack.append(span)
+        return span
+
+    def end(self, span: _Span, record: bool = True):
+        """Closes the innermost span, which has to be `span`."""
+        end = self.now()
+        memory = None
+        if self.track_memory:
+            self._fold_memory_peaks()
+            memory = {**self._current_memory(), **span.peaks}
+        popped = self._stack.pop()
+        assert popped is span, f"Span {span.name} closed inside of {popped.name}"
+        if record:
+            self.events.append(
+                (span.name, span.start, end, threading.get_ident(), span.args, memory)
+            )
+
+    @contextmanager
+    def stage(self, name: str, **args):
+        """Records the span of the `with` block."""
+        span = self.begin(name, **args)
+        try:
+            yield
+        finally:
+            self.end(span)
+
+    def profile_iter(self, iterable: Iterable[T], name: str, **args) -> Iterator[T]:
+        """Records the time to produce each item of `iterable`, e.g. of a generator decoding chunks."""
+        iterator = iter(iterable)
+        while True:
+            span = self.begin(name, **args)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.end(span, record=False)
+                return
+            self.end(span)
+            yield item
+
+    def add_module_hooks(self, modules: Iterable[nn.Module], name: str):
+        """
+        Records each forward of `modules` (e.g. the transformer blocks) as a span named `name`, with the
+        index of the module. The hooks are removed by `remove_hooks`.
+        """
+        for index, module in enumerate(modules):
+            spans = []
+
+            def pre_hook(module, inputs, spans=spans, index=index):
+                spans.append(self.begin(name, index=index))
+
+            def hook(module, inputs, outputs, spans=spans):
+                self.end(spans.pop())
+
+            self._hooks.append(module.register_forward_pre_hook(pre_hook))
+            self._hooks.append(module.register_forward_hook(hook))
+
+    def remove_hooks(self):
+        for handle in self._hooks:
+            handle.remove()
+        self._hooks = []
+
+    def snapshot_modules(self, label: str, modules: Dict[str, Any]):
+        """Records the resident bytes of `modules` by device (see `module_resident_bytes`) under `label`."""
+        self.module_snapshots[label] = module_resident_bytes(modules)
+
+    def _fold_memory_peaks(self):
+        """Folds the memory peaks since the last reset into the open spans, and resets the peaks."""
+        peaks = {"peak_rss_bytes": read_host_memory()["peak_rss_bytes"]}
+        if torch.cuda.is_available():
+            peaks["peak_allocated_bytes"] = torch.cuda.max_memory_allocated()
+            peaks["peak_reserved_bytes"] = torch.cuda.max_memory_reserved()
+            torch.cuda.reset_peak_memory_stats()
+        for span in self._stack:
+            for key, value in peaks.items():
+                if value is not None:
+                    span.peaks[key] = max(span.peaks.get(key, 0), value)
+        if self._can_reset_host_peak:
+            try:
+                with open("/proc/self/clear_refs", "w") as f:
+                    f.write("5")
+            except OSError:
+                self._can_reset_host_peak = False
+
+    def _current_memory(self) -> Dict[str, Any]:
+        memory = {"rss_bytes": read_host_memory()["rss_bytes"]}
+        if torch.cuda.is_available():
+            stats = torch.cuda.memory_stats()
+            memory["allocated_bytes"] = stats.get("allocated_bytes.all.current", 0)
+            memory["reserved_bytes"] = stats.get("reserved_bytes.all.current", 0)
+            memory["alloc_retries"] = stats.get("num_alloc_retries", 0)
+            memory["ooms"] = stats.get("num_ooms", 0)
+        return memory
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns the number of spans and the total, mean and maximal time in seconds of each stage, by
+        decreasing total time. Nested stages are also included in the time of their parents.
+        With `track_memory`, each stage also has the highest memory peaks of its spans, and the summary has
+        the module snapshots.
+        """
+        durations = defaultdict(list)
+        peaks = defaultdict(dict)
+        for name, start, end, _, _, memory in self.events:
+            durations[name].append(end - start)
+            for key, value in (memory or {}).items():
+                if key.startswith("peak_") and value is not None:
+                    peaks[name][key] = max(peaks[name].get(key, 0), value)
+        stages = {
+            name: {
+                "count": len(values),
+                "total_s": sum(values),
+                "mean_s": sum(values) / len(values),
+                "max_s": max(values),
+                **peaks[name],
+            }
+            for name, values in sorted(
+                durations.items(), key=lambda item: -sum(item[1])
+            )
+        }
+        wall_s = max((event[2] for event in self.events), default=0.0)
+        summary = {"wall_s": wall_s, "stages": stages}
+        if self.module_snapshots:
+            summary["modules"] = self.module_snapshots
+        return summary
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = [f"Profile of {summary['wall_s']:.2f}s:"]
+        for name, stage in summary["stages"].items():
+            line = f"  {name}: {stage['total_s']:.3f}s total, {stage['count']} x {stage['mean_s'] * 1000:.1f}ms"
+            if "peak_rss_bytes" in stage:
+                line += f", peak RSS {stage['peak_rss_bytes'] / 2**30:.2f}GB"
+            if "peak_allocated_bytes" in stage:
+                line += (
+                    f", peak allocated {stage['peak_allocated_bytes'] / 2**30:.2f}GB"
+                )
+            lines.append(line)
+        for label, modules in summary.get("modules", {}).items():
+            resident = ", ".join(
+                f"{name} "
+                + "+".join(
+                    f"{num_bytes / 2**30:.2f}GB {device}"
+                    for device, num_bytes in by_device.items()
+                )
+                for name, by_device in modules.items()
+                if by_device
+            )
+            lines.append(f"  modules {label}: {resident}")
+        return "\n".join(lines)
+
+    def save_summary(self, path: Union[str, os.PathLike]):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def save_chrome_trace(self, path: Union[str, os.PathLike]):
+        """
+        Saves the spans in the Chrome trace event format, as complete events in microseconds. The memory
+        recorded at the end of the spans is added as counter events.
+        """
+        pid = os.getpid()
+        trace_events = []
+        for name, start, end, thread_id, args, memory in self.events:
+            trace_events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": pid,
+                    "tid": thread_id,
+                    "args": {**args, **(memory or {})},
+                }
+            )
+            if memory is not None:
+                trace_events.append(
+                    {
+                        "name": "memory_mb",
+                        "ph": "C",
+                        "ts": end * 1e6,
+                        "pid": pid,
+                        "args": {
+                            key[: -len("_bytes")]: value / 2**20
+                            for key, value in memory.items()
+                            if key.endswith("_bytes")
+                            and not key.startswith("peak_")
+                            and value is not None
+                        },
+                    }
+                )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
@@ -1,5 +1,5 @@
 import logging
-from typing import Union, List, Optional
+from typing import Union, List, Optional, Tuple
 
 import torch
 from PIL import Image
@@ -69,8 +69,15 @@ def generate_cinematic_prompt(
     prompt: Union[str, List[str]],
     conditioning_items: Optional[List] = None,
     max_new_tokens: int = 256,
+    batch_size: int = 8,
 ) -> List[str]:
+    """
+    Enhances the prompts with the LLM, after captioning the first conditioning frames for image-to-video.
+    Both models generate micro-batches of at most `batch_size` prompts (or images).
+    """
     prompts = [prompt] if isinstance(prompt, str) else prompt
+    if batch_size < 1:
+        raise ValueError(f"`batch_size` has to be positive but is {batch_size}.")
 
     if conditioning_items is None:
         prompts = _generate_t2v_prompt(
@@ -79,6 +86,7 @@ def generate_cinematic_prompt(
             prompts,
             max_new_tokens,
             T2V_CINEMATIC_PROMPT,
+            batch_size,
         )
     else:
         if len(conditioning_items) > 1 or conditioning_items[0].media_frame_number != 0:
@@ -105,6 +113,7 @@ def generate_cinematic_prompt(
             first_frames,
             max_new_tokens,
             I2V_CINEMATIC_PROMPT,
+            batch_size,
         )
 
     return prompts
@@ -124,6 +133,7 @@ def _generate_t2v_prompt(
     prompts: List[str],
     max_new_tokens: int,
     system_prompt: str,
+    batch_size: int = 8,
 ) -> List[str]:
     messages = [
         [
@@ -139,12 +149,13 @@ def _generate_t2v_prompt(
         )
         for m in messages
     ]
-    model_inputs = prompt_enhancer_tokenizer(texts, return_tensors="pt").to(
-        prompt_enhancer_model.device
-    )
 
     return _generate_and_decode_prompts(
-        prompt_enhancer_model, prompt_enhancer_tokenizer, model_inputs, max_new_tokens
+        prompt_enhancer_model,
+        prompt_enhancer_tokenizer,
+        texts,
+        max_new_tokens,
+        batch_size,
     )
 
 
@@ -157,9 +168,13 @@ def _generate_i2v_prompt(
     first_frames: List[Image.Image],
     max_new_tokens: int,
     system_prompt: str,
+    batch_size: int = 8,
 ) -> List[str]:
     image_captions = _generate_image_captions(
-        image_caption_model, image_caption_processor, first_frames
+        image_caption_model,
+        image_caption_processor,
+        first_frames,
+        batch_size=batch_size,
     )
 
     messages = [
@@ -176,12 +191,13 @@ def _generate_i2v_prompt(
         )
         for m in messages
     ]
-    model_inputs = prompt_enhancer_tokenizer(texts, return_tensors="pt").to(
-        prompt_enhancer_model.device
-    )
 
     return _generate_and_decode_prompts(
-        prompt_enhancer_model, prompt_enhancer_tokenizer, model_inputs, max_new_tokens
+        prompt_enhancer_model,
+        prompt_enhancer_tokenizer,
+        texts,
+        max_new_tokens,
+        batch_size,
     )
 
 
@@ -190,37 +206,82 @@ def _generate_image_captions(
     image_caption_processor,
     images: List[Image.Image],
     system_prompt: str = "<DETAILED_CAPTION>",
+    batch_size: int = 8,
 ) -> List[str]:
-    image_caption_prompts = [system_prompt] * len(images)
-    inputs = image_caption_processor(
-        image_caption_prompts, images, return_tensors="pt"
-    ).to(image_caption_model.device)
-
-    with torch.inference_mode():
-        generated_ids = image_caption_model.generate(
-            input_ids=inputs["input_ids"],
-            pixel_values=inputs["pixel_values"],
-            max_new_tokens=1024,
-            do_sample=False,
-            num_beams=3,
+    # The processor resizes all the images to the same size and they share the same prompt, so the inputs of
+    # a micro-batch never need padding
+    captions = []
+    for batch_start in range(0, len(images), batch_size):
+        batch_images = images[batch_start : batch_start + batch_size]
+        inputs = image_caption_processor(
+            [system_prompt] * len(batch_images), batch_images, return_tensors="pt"
+        ).to(image_caption_model.device)
+
+        with torch.inference_mode():
+            generated_ids = image_caption_model.generate(
+                input_ids=inputs["input_ids"],
+                pixel_values=inputs["pixel_values"],
+                max_new_tokens=1024,
+                do_sample=False,
+                num_beams=3,
+            )
+
+        captions += image_caption_processor.batch_decode(
+            generated_ids, skip_special_tokens=True
         )
+    return captions
+
 
-    return image_caption_processor.batch_decode(generated_ids, skip_special_tokens=True)
+def _left_pad(
+    sequences: List[List[int]], pad_token_id: int
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Left-pads token ids into (b, n) `input_ids` and `attention_mask`, so all the generations start together."""
+    length = max(len(sequence) for sequence in sequences)
+    input_ids = torch.full((len(sequences), length), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), length), dtype=torch.long)
+    for i, sequence in enumerate(sequences):
+        if sequence:
+            input_ids[i, length - len(sequence) :] = torch.tensor(sequence)
+            attention_mask[i, length - len(sequence) :] = 1
+    return input_ids, attention_mask
 
 
 def _generate_and_decode_prompts(
-    prompt_enhancer_model, prompt_enhancer_tokenizer, model_inputs, max_new_tokens: int
+    prompt_enhancer_model,
+    prompt_enhancer_tokenizer,
+    texts: List[str],
+    max_new_tokens: int,
+    batch_size: int = 8,
 ) -> List[str]:
-    with torch.inference_mode():
-        outputs = prompt_enhancer_model.generate(
-            **model_inputs, max_new_tokens=max_new_tokens
+    """
+    Generates the completions of `texts` in left-padded micro-batches of at most `batch_size` texts. The texts
+    are sorted by length first, so the texts of a micro-batch are padded to similar lengths.
+    """
+    token_ids = prompt_enhancer_tokenizer(texts)["input_ids"]
+    # Llama tokenizers have no padding token: the padded positions are masked out anyway
+    pad_token_id = prompt_enhancer_tokenizer.pad_token_id
+    if pad_token_id is None:
+        pad_token_id = prompt_enhancer_tokenizer.eos_token_id
+
+    order = sorted(range(len(texts)), key=lambda i: len(token_ids[i]))
+    decoded_prompts = [None] * len(texts)
+    for batch_start in range(0, len(order), batch_size):
+        batch = order[batch_start : batch_start + batch_size]
+        input_ids, attention_mask = _left_pad(
+            [token_ids[i] for i in batch], pad_token_id
         )
-        generated_ids = [
-            output_ids[len(input_ids) :]
-            for input_ids, output_ids in zip(model_inputs.input_ids, outputs)
-        ]
-        decoded_prompts = prompt_enhancer_tokenizer.batch_decode(
-            generated_ids, skip_special_tokens=True
+        with torch.inference_mode():
+            outputs = prompt_enhancer_model.generate(
+                input_ids=input_ids.to(prompt_enhancer_model.device),
+                attention_mask=attention_mask.to(prompt_enhancer_model.device),
+                max_new_tokens=max_new_tokens,
+                pad_token_id=pad_token_id,
+            )
+        # With left padding, the generated tokens of all the texts start after the padded inputs
+        batch_prompts = prompt_enhancer_tokenizer.batch_decode(
+            outputs[:, input_ids.shape[1] :], skip_special_tokens=True
         )
+        for i, decoded_prompt in zip(batch, batch_prompts):
+            decoded_prompts[i] = decoded_prompt
 
     return decoded_prompts
@@ -0,0 +1,162 @@
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple, Optional, Union
+
+import torch
+from transformers import (
+    AutoModelForCausalLM,
+    AutoProcessor,
+    AutoTokenizer,
+    PreTrainedModel,
+    PreTrainedTokenizerBase,
+    ProcessorMixin,
+)
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# What happens to the prompt enhancer models once a prompt enhancement is done:
+# - "keep_warm": they are offloaded to the CPU and kept there for the next enhancement.
+# - "unload_after_use": they are released, and loaded again by the next enhancement.
+# - "idle_ttl": they are offloaded to the CPU, and released if no enhancement uses them for `idle_ttl` seconds.
+PROMPT_ENHANCER_POLICIES = ("keep_warm", "unload_after_use", "idle_ttl")
+
+
+class PromptEnhancerComponents(NamedTuple):
+    image_caption_model: PreTrainedModel
+    image_caption_processor: ProcessorMixin
+    llm_model: PreTrainedModel
+    llm_tokenizer: PreTrainedTokenizerBase
+
+
+class PromptEnhancerModels:
+    """
+    Loads the prompt enhancer models (the image caption model and the LLM) on demand, the first time a prompt
+    is enhanced, and releases them from the execution device once the enhancement is done, so the transformer
+    and the VAE get the whole memory during denoising. What happens next depends on the `policy` (see
+    `PROMPT_ENHANCER_POLICIES`).
+
+    Args:
+        image_caption_model_name_or_path (`str`): The Florence-2 style image caption model.
+        llm_model_name_or_path (`str`): The LLM rewriting the prompts.
+        policy (`str`): The policy applied after each use, one of `PROMPT_ENHANCER_POLICIES`.
+        idle_ttl (`float`): With the "idle_ttl" policy, the idle time in seconds after which the models are
+            released.
+    """
+
+    def __init__(
+        self,
+        image_caption_model_name_or_path: str,
+        llm_model_name_or_path: str,
+        policy: str = "idle_ttl",
+        idle_ttl: float = 300.0,
+    ):
+        if policy not in PROMPT_ENHANCER_POLICIES:
+            raise ValueError(
+                f"Unknown prompt enhancer policy {policy}, expected one of {PROMPT_ENHANCER_POLICIES}"
+            )
+        self.image_caption_model_name_or_path = image_caption_model_name_or_path
+        self.llm_model_name_or_path = llm_model_name_or_path
+        self.policy = policy
+        self.idle_ttl = idle_ttl
+        self.num_loads = 0
+        self._components: Optional[PromptEnhancerComponents] = None
+        self._last_used = 0.0
+        self._timer: Optional[threading.Timer] = None
+        # Held while the models are used, loaded or released, e.g. by the idle timer
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._components is not None
+
+    def _load(self) -> PromptEnhancerComponents:
+        logger.info(
+            f"Loading the prompt enhancer models {self.image_caption_model_name_or_path} and {self.llm_model_name_or_path}"
+        )
+        start = time.perf_counter()
+        components = PromptEnhancerComponents(
+            image_caption_model=AutoModelForCausalLM.from_pretrained(
+                self.image_caption_model_name_or_path, trust_remote_code=True
+            ),
+            image_caption_processor=AutoProcessor.from_pretrained(
+                self.image_caption_model_name_or_path, trust_remote_code=True
+            ),
+            llm_model=AutoModelForCausalLM.from_pretrained(
+                self.llm_model_name_or_path,
+                torch_dtype="bfloat16",
+            ),
+            llm_tokenizer=AutoTokenizer.from_pretrained(
+                self.llm_model_name_or_path,
+            ),
+        )
+        self.num_loads += 1
+        logger.info(
+            f"Prompt enhancer models loaded in {time.perf_counter() - start:.1f}s"
+        )
+        return components
+
+    @contextmanager
+    def use(
+        self, device: Union[str, torch.device]
+    ) -> Iterator[PromptEnhancerComponents]:
+        """
+        Loads the models if needed and moves them to `device` for the duration of the `with` block, then
+        applies the policy.
+        """
+        with self._lock:
+            self._cancel_timer()
+            if self._components is None:
+                self._components = self._load()
+            self._components.image_caption_model.to(device)
+            self._components.llm_model.to(device)
+            try:
+                yield self._components
+            finally:
+                self._last_used = time.monotonic()
+                if self.policy == "unload_after_use":
+                    self._unload()
+                else:
+                    self._offload()
+                    if self.policy == "idle_ttl":
+                        self._start_timer()
+
+    def unload(self):
+        """Releases the models, if they are loaded. The next use loads them again."""
+        with self._lock:
+            self._cancel_timer()
+            self._unload()
+
+    def _offload(self):
+        self._components.image_caption_model.to("cpu")
+        self._components.llm_model.to("cpu")
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _unload(self):
+        if self._components is None:
+            return
+        self._components = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logger.info("Prompt enhancer models unloaded")
+
+    def _start_timer(self):
+        self._timer = threading.Timer(self.idle_ttl, self._unload_if_idle)
+        # Do not keep the process alive for the timer
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _unload_if_idle(self):
+        with self._lock:
+            # The models may have been used again since the timer was started
+            if time.monotonic() - self._last_used >= self.idle_ttl:
+                self._unload()
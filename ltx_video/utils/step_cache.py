@@ -0,0 +1,154 @@
+import logging
+from typing import List, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Polynomial (highest degree first) mapping the relative L1 change of the modulated input to the
+# expected relative change of the transformer output, fitted for LTX-Video (see TeaCache,
+# https://arxiv.org/abs/2411.19108).
+LTXV_RESCALE_COEFFICIENTS = [
+    2.14700694e01,
+    -1.28016453e01,
+    2.31279151e00,
+    7.92487521e-01,
+    9.69274326e-03,
+]
+
+
+@torch.no_grad()
+def compute_modulated_input(
+    transformer, hidden_states: torch.Tensor, timestep: torch.Tensor
+) -> torch.Tensor:
+    """
+    Computes the timestep-modulated input of the first transformer block, without running the blocks.
+
+    Args:
+        transformer (`Transformer3DModel`): The denoising transformer.
+        hidden_states (`torch.Tensor`): The patchified latents, shape (b, n, c).
+        timestep (`torch.Tensor`): The global (b, 1) or per-token (b, n) timesteps.
+
+    Returns:
+        `torch.Tensor`: The modulated input of the first block, shape (b, n, inner_dim).
+    """
+    batch_size = hidden_states.shape[0]
+    hidden_states = transformer.patchify_proj(hidden_states)
+    timestep_scale_multiplier = transformer.config.timestep_scale_multiplier
+    if timestep_scale_multiplier:
+        timestep = timestep_scale_multiplier * timestep
+    timestep = timestep.expand(batch_size, -1)
+    timestep, _ = transformer.adaln_single(
+        timestep.flatten(),
+        {"resolution": None, "aspect_ratio": None},
+        batch_size=batch_size,
+        hidden_dtype=hidden_states.dtype,
+    )
+    timestep = timestep.view(batch_size, -1, timestep.shape[-1])
+
+    first_block = transformer.transformer_blocks[0]
+    num_ada_params = first_block.scale_shift_table.shape[0]
+    ada_values = first_block.scale_shift_table[None, None] + timestep.reshape(
+        batch_size, timestep.shape[1], num_ada_params, -1
+    )
+    shift_msa, scale_msa = ada_values[:, :, 0], ada_values[:, :, 1]
+    return first_block.norm1(hidden_states) * (1 + scale_msa) + shift_msa
+
+
+class TransformerStepCache:
+    """
+    Decides when the transformer forward of a denoising step can be skipped and its previous output reused.
+
+    The relative L1 change of the first block's timestep-modulated input between consecutive steps is
+    rescaled into an estimate of the output change and accumulated. While the accumulated estimate stays
+    below `threshold`, the previous transformer output is reused; once it exceeds it, the transformer is
+    evaluated again and the accumulator is reset. The first and last steps are always evaluated.
+
+    Args:
+        threshold (`float`): The accumulated change under which the previous output is reused.
+            Higher values skip more steps at the expense of quality. 0 disables skipping.
+        rescale_coefficients (`List[float]`, *optional*): Polynomial coefficients (highest degree first)
+            applied to the relative input change. Defaults to the coefficients fitted for LTX-Video.
+        max_consecutive_skips (`int`, *optional*): Upper bound on the number of consecutive skipped steps.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.05,
+        rescale_coefficients: Optional[List[float]] = None,
+        max_consecutive_skips: Optional[int] = None,
+    ):
+        self.threshold = threshold
+        self.rescale_coefficients = (
+            rescale_coefficients
+            if rescale_coefficients is not None
+            else LTXV_RESCALE_COEFFICIENTS
+        )
+        self.max_consecutive_skips = max_consecutive_skips
+        self.num_steps = 0
+        self.num_skipped_steps = 0
+        self.reset()
+
+    def reset(self):
+        """Clears the cached state before a new generation. Statistics are kept."""
+        self._previous_modulated_input = None
+        self._previous_output = None
+        self._accumulated_change = 0.0
+        self._consecutive_skips = 0
+
+    def _rescale(self, relative_change: float) -> float:
+        value = 0.0
+        for coefficient in self.rescale_coefficients:
+            value = value * relative_change + coefficient
+        return value
+
+    def should_compute(
+        self, modulated_input: torch.Tensor, step_index: int, num_steps: int
+    ) -> bool:
+        """
+        Returns whether the transformer has to be evaluated at this step. Must be called once per step.
+        """
+        previous = self._previous_modulated_input
+        self._previous_modulated_input = modulated_input
+        self.num_steps += 1
+
+        compute = True
+        if (
+            previous is not None
+            and self._previous_output is not None
+            and 0 < step_index < num_steps - 1
+            and self.threshold > 0
+        ):
+            relative_change = (
+                (modulated_input - previous).abs().mean() / previous.abs().mean()
+            ).item()
+            self._accumulated_change += self._rescale(relative_change)
+            compute = self._accumulated_change >= self.threshold or (
+                self.max_consecutive_skips is not None
+                and self._consecutive_skips >= self.max_consecutive_skips
+            )
+
+        if compute:
+            self._accumulated_change = 0.0
+            self._consecutive_skips = 0
+        else:
+            self._consecutive_skips += 1
+            self.num_skipped_steps += 1
+        return compute
+
+    def store(self, output: torch.Tensor):
+        self._previous_output = output
+
+    @property
+    def cached_output(self) -> torch.Tensor:
+        return self._previous_output
+
+    @property
+    def hit_rate(self) -> float:
+        return self.num_skipped_steps / self.num_steps if self.num_steps else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Transformer step cache: skipped {self.num_skipped_steps} of {self.num_steps} "
+            f"steps (hit rate {self.hit_rate:.1%})"
+        )
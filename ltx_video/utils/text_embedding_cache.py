@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+import torch
+
+from ltx_video.utils.disk_cache import DiskTensorCache
+
+
+class TextEmbeddingCache:
+    """
+    A content-addressed cache of text encoder outputs, kept in memory and optionally on disk.
+
+    Entries are keyed on the (preprocessed) text, the maximal number of tokens and the encoder identity,
+    and hold the embeddings and attention mask of the real (non-padding) tokens of a single prompt.
+    The in-memory cache is an LRU of `max_memory_entries` entries, in front of an optional `DiskTensorCache`.
+
+    Args:
+        encoder_id (`str`): Identifies the text encoder (e.g. its name and dtype). Embeddings of different
+            encoders never collide.
+        cache_dir (`str` or `os.PathLike`, *optional*): Directory of the persistent cache. If None, only
+            the in-memory cache is used.
+        max_memory_entries (`int`): Maximal number of entries kept in memory.
+        max_disk_bytes (`int`, *optional*): Maximal total size of the disk cache. Unbounded if None.
+    """
+
+    def __init__(
+        self,
+        encoder_id: str,
+        cache_dir: Optional[Union[str, os.PathLike]] = None,
+        max_memory_entries: int = 32,
+        max_disk_bytes: Optional[int] = None,
+    ):
+        self.encoder_id = encoder_id
+        self._disk = (
+            DiskTensorCache(cache_dir, "text_embedding", max_disk_bytes)
+            if cache_dir is not None
+            else None
+        )
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, Tuple[torch.Tensor, torch.Tensor]]" = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str, max_tokens: int) -> str:
+        payload = json.dumps([self.encoder_id, max_tokens, text])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def contains(self, text: str, max_tokens: int) -> bool:
+        key = self.key(text, max_tokens)
+        if key in self._memory:
+            return True
+        return self._disk is not None and self._disk.contains(key)
+
+    def get(
+        self, text: str, max_tokens: int
+    ) -> Optional[Tuple[torch.Tensor, torch.Tensor]]:
+        """
+        Returns the cached `(prompt_embeds, attention_mask)` of shapes (1, n, d) and (1, n), where n is the
+        number of real tokens of the text, or None if the text is not cached.
+        """
+        key = self.key(text, max_tokens)
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        tensors = (
+            self._disk.get(key, ["prompt_embeds", "attention_mask"])
+            if self._disk is not None
+            else None
+        )
+        if tensors is not None:
+            entry = (tensors["prompt_embeds"], tensors["attention_mask"])
+            self._put_memory(key, entry)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        text: str,
+        max_tokens: int,
+        prompt_embeds: torch.Tensor,
+        attention_mask: torch.Tensor,
+    ):
+        """Caches the embeddings (1, n, d) and attention mask (1, n) of a single text."""
+        key = self.key(text, max_tokens)
+        entry = (
+            prompt_embeds.detach().to("cpu", copy=True).contiguous(),
+            attention_mask.detach().to("cpu", copy=True).contiguous(),
+        )
+        self._put_memory(key, entry)
+
+        if self._disk is not None:
+            self._disk.put(key, {"prompt_embeds": entry[0], "attention_mask": entry[1]})
+
+    def _put_memory(self, key: str, entry: Tuple[torch.Tensor, torch.Tensor]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear_memory(self):
+        self._memory.clear()
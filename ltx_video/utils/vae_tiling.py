@@ -0,0 +1,289 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import torch
+
+from ltx_video.models.autoencoders.causal_video_autoencoder import (
+    CausalVideoAutoencoder,
+)
+from ltx_video.models.autoencoders.vae_encode import (
+    get_vae_size_scale_factor,
+    vae_decode,
+)
+
+# A (start, end) range of pixels or frames along one axis
+Range = Tuple[int, int]
+
+
+def _tile_ranges(length: int, tile_size: int, overlap: int) -> List[Range]:
+    """Splits `length` latents into tiles of `tile_size` that overlap by `overlap`; the last one may be shorter."""
+    if tile_size >= length:
+        return [(0, length)]
+    stride = tile_size - overlap
+    ranges = []
+    start = 0
+    while True:
+        end = min(start + tile_size, length)
+        ranges.append((start, end))
+        if end == length:
+            return ranges
+        start += stride
+
+
+def _blend_ramp(
+    pixel_ranges: List[Range], index: int, device: torch.device
+) -> torch.Tensor:
+    """
+    Returns the blending weights of tile `index` along one axis. Inside an overlap, the weights of the two
+    tiles ramp linearly in opposite directions and sum to 1, so no normalization is needed afterwards.
+    """
+    start, end = pixel_ranges[index]
+    weights = torch.ones(end - start, device=device)
+    if index > 0:
+        overlap = pixel_ranges[index - 1][1] - start
+        weights[:overlap] = torch.arange(1, overlap + 1, device=device) / (overlap + 1)
+    if index < len(pixel_ranges) - 1:
+        overlap = end - pixel_ranges[index + 1][0]
+        weights[end - start - overlap :] = torch.arange(
+            overlap, 0, -1, device=device
+        ) / (overlap + 1)
+    return weights
+
+
+def _intersect(pixel_range: Range, region: Range) -> Optional[Tuple[slice, slice]]:
+    """Returns the intersection of a tile with the output region, as slices into the tile and into the output."""
+    start, end = pixel_range
+    region_start, region_end = region
+    lo, hi = max(start, region_start), min(end, region_end)
+    if lo >= hi:
+        return None
+    return slice(lo - start, hi - start), slice(lo - region_start, hi - region_start)
+
+
+def _decode_temporal_tile(
+    latents: torch.Tensor,
+    vae,
+    is_video: bool,
+    fi: int,
+    latent_ranges: List[List[Range]],
+    pixel_ranges: List[List[Range]],
+    output_region: Tuple[Range, Range, Range],
+    decode_kwargs: Dict,
+) -> Optional[Tuple[torch.Tensor, int]]:
+    """
+    Decodes and blends all the spatial tiles of the temporal tile `fi`, restricted to the output region.
+    The temporal blending weights are applied too, so overlapping temporal tiles only have to be summed.
+
+    Returns:
+        The blended frames and the index of their first frame in the output region, or None if the
+        temporal tile does not intersect the output region.
+    """
+    frame_intersection = _intersect(pixel_ranges[0][fi], output_region[0])
+    if frame_intersection is None:
+        return None
+    frame_slice, output_frame_slice = frame_intersection
+    lf0, lf1 = latent_ranges[0][fi]
+    frame_weights = None
+
+    output = None
+    for yi, (ly0, ly1) in enumerate(latent_ranges[1]):
+        row_intersection = _intersect(pixel_ranges[1][yi], output_region[1])
+        if row_intersection is None:
+            continue
+        for xi, (lx0, lx1) in enumerate(latent_ranges[2]):
+            column_intersection = _intersect(pixel_ranges[2][xi], output_region[2])
+            if column_intersection is None:
+                continue
+
+            decoded = vae_decode(
+                latents[:, :, lf0:lf1, ly0:ly1, lx0:lx1],
+                vae,
+                is_video,
+                **decode_kwargs,
+            )
+            if output is None:
+                output = decoded.new_zeros(
+                    decoded.shape[:2]
+                    + (
+                        output_frame_slice.stop - output_frame_slice.start,
+                        output_region[1][1] - output_region[1][0],
+                        output_region[2][1] - output_region[2][0],
+                    )
+                )
+                frame_weights = _blend_ramp(pixel_ranges[0], fi, decoded.device)[
+                    frame_slice
+                ]
+
+            row_slice, output_row_slice = row_intersection
+            column_slice, output_column_slice = column_intersection
+            weight = (
+                frame_weights[:, None, None]
+                * _blend_ramp(pixel_ranges[1], yi, decoded.device)[row_slice][
+                    None, :, None
+                ]
+                * _blend_ramp(pixel_ranges[2], xi, decoded.device)[column_slice][
+                    None, None, :
+                ]
+            )
+            output[:, :, :, output_row_slice, output_column_slice] += decoded[
+                :, :, frame_slice, row_slice, column_slice
+            ] * weight.to(decoded.dtype)
+
+    if output is None:
+        return None
+    return output, output_frame_slice.start
+
+
+def iter_tiled_vae_decode(
+    latents: torch.Tensor,
+    vae,
+    is_video: bool = True,
+    tile_size: Optional[Tuple[Optional[int], Optional[int], Optional[int]]] = None,
+    tile_overlap: Tuple[int, int, int] = (1, 4, 4),
+    output_region: Optional[Tuple[Range, Range, Range]] = None,
+    **decode_kwargs,
+) -> Iterator[torch.Tensor]:
+    """
+    Decodes latents tile by tile, blending the overlapping borders of neighbouring tiles, so the decoder
+    activations only ever cover a single tile. The decoded video is yielded in consecutive chunks of frames
+    as soon as they are final, i.e. once all the temporal tiles overlapping them have been decoded, so the
+    decoded frames held at once are bounded by the temporal tile size.
+
+    Only the `output_region` of the decoded video is produced: tiles whose pixels all lie outside of it
+    (e.g. in the padding added to round the resolution and the number of frames) are not decoded at all.
+
+    Args:
+        latents (`torch.Tensor`): The latents to decode, shape (b, c, f, h, w).
+        vae: The VAE, used through `vae_decode`.
+        is_video (`bool`): Whether the latents are a video (temporally compressed) or independent images.
+        tile_size (`Tuple[int, int, int]`, *optional*): The (frames, height, width) size of the tiles, in latents.
+            An axis whose size is None is not tiled. If None, the latents are decoded at once and only cropped
+            to the output region.
+        tile_overlap (`Tuple[int, int, int]`): The overlap of neighbouring tiles, in latents. Each overlap has to
+            be at most half the tile size along the same axis. The temporal overlap of causal VAEs has to be
+            at least 1, as the first latent frame of a tile decodes to a single frame.
+        output_region (`Tuple[Range, Range, Range]`, *optional*): The (start, end) pixel ranges of the frames,
+            rows and columns to produce. Defaults to the whole decoded video.
+        decode_kwargs: Passed to `vae_decode` (e.g. `vae_per_channel_normalize`, `timestep`).
+
+    Yields:
+        `torch.Tensor`: The next frames of the decoded output region, shape (b, 3, frames, height, width).
+    """
+    video_scale_factor, vae_scale_factor, _ = get_vae_size_scale_factor(vae)
+    if not is_video:
+        video_scale_factor = 1
+    causal = is_video and isinstance(vae, CausalVideoAutoencoder)
+
+    def to_pixel_range(axis: int, latent_range: Range) -> Range:
+        start, end = latent_range
+        if axis == 0:
+            if causal:
+                # The first latent frame of a causal tile decodes to a single frame
+                return start * video_scale_factor, (end - 1) * video_scale_factor + 1
+            return start * video_scale_factor, end * video_scale_factor
+        return start * vae_scale_factor, end * vae_scale_factor
+
+    latent_shape = latents.shape[2:]
+    if output_region is None:
+        output_region = tuple(
+            to_pixel_range(axis, (0, length))
+            for axis, length in enumerate(latent_shape)
+        )
+
+    if tile_size is None:
+        decoded = vae_decode(latents, vae, is_video, **decode_kwargs)
+        (f0, f1), (y0, y1), (x0, x1) = output_region
+        yield decoded[:, :, f0:f1, y0:y1, x0:x1]
+        return
+
+    # Axes that are not tiled are covered by a single tile
+    tile_size = [
+        length if size is None else size
+        for size, length in zip(tile_size, latent_shape)
+    ]
+    tile_overlap = [
+        overlap if size < length else 0
+        for size, overlap, length in zip(tile_size, tile_overlap, latent_shape)
+    ]
+    if causal and tile_overlap[0] < 1 and tile_size[0] < latent_shape[0]:
+        raise ValueError(
+            "The temporal tile overlap of a causal VAE has to be at least 1 latent frame."
+        )
+    for size, overlap in zip(tile_size, tile_overlap):
+        if not 0 <= overlap <= size // 2:
+            raise ValueError(
+                f"The tile overlap {tuple(tile_overlap)} has to be at most half the tile size {tuple(tile_size)}."
+            )
+
+    latent_ranges = [
+        _tile_ranges(length, size, overlap)
+        for length, size, overlap in zip(latent_shape, tile_size, tile_overlap)
+    ]
+    pixel_ranges = [
+        [to_pixel_range(axis, latent_range) for latent_range in ranges]
+        for axis, ranges in enumerate(latent_ranges)
+    ]
+
+    # Frames already decoded but still overlapped by the next temporal tile, from output frame `pending_start`
+    pending = None
+    pending_start = 0
+    num_temporal_tiles = len(latent_ranges[0])
+    for fi in range(num_temporal_tiles):
+        tile = _decode_temporal_tile(
+            latents,
+            vae,
+            is_video,
+            fi,
+            latent_ranges,
+            pixel_ranges,
+            output_region,
+            decode_kwargs,
+        )
+        if tile is None:
+            continue
+        frames, frames_start = tile
+        if pending is None:
+            pending, pending_start = frames, frames_start
+        else:
+            num_overlapping = pending_start + pending.shape[2] - frames_start
+            if num_overlapping > 0:
+                pending[:, :, -num_overlapping:] += frames[:, :, :num_overlapping]
+            pending = torch.cat([pending, frames[:, :, num_overlapping:]], dim=2)
+
+        # The frames before the start of the next temporal tile are final
+        num_final = pending.shape[2]
+        if fi + 1 < num_temporal_tiles:
+            next_start = pixel_ranges[0][fi + 1][0] - output_region[0][0]
+            num_final = min(max(next_start - pending_start, 0), num_final)
+        if num_final > 0:
+            yield pending[:, :, :num_final]
+            pending = pending[:, :, num_final:]
+            pending_start += num_final
+
+
+def tiled_vae_decode(
+    latents: torch.Tensor,
+    vae,
+    is_video: bool = True,
+    tile_size: Optional[Tuple[Optional[int], Optional[int], Optional[int]]] = None,
+    tile_overlap: Tuple[int, int, int] = (1, 4, 4),
+    output_region: Optional[Tuple[Range, Range, Range]] = None,
+    **decode_kwargs,
+) -> torch.Tensor:
+    """
+    Decodes the `output_region` of the latents at once, tile by tile. See `iter_tiled_vae_decode`.
+
+    Returns:
+        `torch.Tensor`: The decoded output region, shape (b, 3, frames, height, width).
+    """
+    chunks = list(
+        iter_tiled_vae_decode(
+            latents,
+            vae,
+            is_video,
+            tile_size=tile_size,
+            tile_overlap=tile_overlap,
+            output_region=output_region,
+            **decode_kwargs,
+        )
+    )
+    return chunks[0] if len(chunks) == 1 else torch.cat(chunks, dim=2)
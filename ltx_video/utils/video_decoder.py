@@ -0,0 +1,48 @@
+import os
+from typing import Union
+
+import av
+import numpy as np
+
+
+def count_video_frames(path: Union[str, os.PathLike]) -> int:
+    """
+    Returns the number of frames of a video file, from the container metadata when available. Otherwise the
+    packets of the video stream are counted, which demuxes the file without decoding it.
+    """
+    with av.open(str(path)) as container:
+        stream = container.streams.video[0]
+        if stream.frames > 0:
+            return stream.frames
+        return sum(1 for packet in container.demux(stream) if packet.size)
+
+
+def read_video_frames(
+    path: Union[str, os.PathLike], num_frames: int, start_frame: int = 0
+) -> np.ndarray:
+    """
+    Decodes frames `[start_frame, start_frame + num_frames)` of a video file in a single sequential pass,
+    stopping right after the last one.
+
+    Returns:
+        `np.ndarray`: The (f, h, w, 3) uint8 RGB frames. Fewer than `num_frames` frames are returned if the
+        video is shorter than its metadata claims.
+    """
+    with av.open(str(path)) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        frames = None
+        num_decoded = 0
+        for index, frame in enumerate(container.decode(stream)):
+            if index < start_frame:
+                continue
+            rgb = frame.to_ndarray(format="rgb24")
+            if frames is None:
+                frames = np.empty((num_frames,) + rgb.shape, dtype=np.uint8)
+            frames[num_decoded] = rgb
+            num_decoded += 1
+            if num_decoded == num_frames:
+                break
+    if frames is None:
+        raise ValueError(f"Could not decode any frame from {path}")
+    return frames[:num_decoded]
@@ -0,0 +1,225 @@
+import os
+import queue
+import threading
+from fractions import Fraction
+from typing import Dict, Iterable, Optional, Union
+
+import av
+import numpy as np
+
+# x264 settings trading encoding speed against file size, at a similar visual quality.
+ENCODER_PRESETS: Dict[str, Dict[str, str]] = {
+    "fast": {"preset": "ultrafast", "crf": "21"},
+    "balanced": {"preset": "medium", "crf": "21"},
+    "small": {"preset": "slow", "crf": "24"},
+}
+
+
+def _as_frame_array(frame) -> np.ndarray:
+    """
+    Converts a (h, w, 3) frame (numpy array or PIL image) to a uint8 numpy array with even dimensions.
+    Floating point frames are expected in [0, 1].
+    """
+    frame = np.asarray(frame)
+    if np.issubdtype(frame.dtype, np.floating):
+        frame = (np.clip(frame, 0.0, 1.0) * 255).round().astype(np.uint8)
+    elif frame.dtype != np.uint8:
+        raise ValueError(
+            f"Frames have to be uint8 or float RGB arrays, got {frame.dtype}"
+        )
+    height, width = frame.shape[:2]
+    if height % 2 or width % 2:
+        # yuv420p needs even dimensions: replicate the last row/column
+        frame = np.pad(frame, ((0, height % 2), (0, width % 2), (0, 0)), mode="edge")
+    return frame
+
+
+class VideoEncoder:
+    """
+    Encodes RGB frames into a video file with PyAV.
+
+    The codec runs with frame threading over all the cores by default. The stream is opened with the
+    size of the first written frame.
+
+    Args:
+        path (`str` or `os.PathLike`): The output file.
+        fps (`float`): The frame rate.
+        preset (`str`): One of `ENCODER_PRESETS`, trading encoding speed against file size.
+        codec (`str`): The codec name.
+        options (`Dict[str, str]`, *optional*): Codec options, overriding the preset's.
+        threads (`int`): The number of codec threads. 0 lets the codec use all the cores.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        fps: float,
+        preset: str = "balanced",
+        codec: str = "libx264",
+        options: Optional[Dict[str, str]] = None,
+        threads: int = 0,
+    ):
+        if preset not in ENCODER_PRESETS:
+            raise ValueError(
+                f"Unknown encoder preset {preset}, expected one of {list(ENCODER_PRESETS)}"
+            )
+        self.path = str(path)
+        self.fps = fps
+        self.codec = codec
+        self.options = {**ENCODER_PRESETS[preset], **(options or {})}
+        self.threads = threads
+        self.num_frames = 0
+        self._container = None
+        self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self, height: int, width: int):
+        self._container = av.open(self.path, mode="w")
+        stream = self._container.add_stream(
+            self.codec, rate=Fraction(self.fps).limit_denominator(1001)
+        )
+        stream.width = width
+        stream.height = height
+        stream.pix_fmt = "yuv420p"
+        stream.options = self.options
+        stream.thread_type = "FRAME"
+        stream.thread_count = self.threads
+        self._stream = stream
+
+    def write(self, frames: Union[np.ndarray, Iterable]):
+        """Encodes a single (h, w, 3) frame or a sequence of frames, e.g. a (f, h, w, 3) uint8 array."""
+        if isinstance(frames, np.ndarray) and frames.ndim == 3:
+            frames = [frames]
+        for frame in frames:
+            frame = _as_frame_array(frame)
+            if self._container is None:
+                self._open(*frame.shape[:2])
+            video_frame = av.VideoFrame.from_ndarray(frame, format="rgb24")
+            self._container.mux(self._stream.encode(video_frame))
+            self.num_frames += 1
+
+    def close(self):
+        """Flushes the codec and finalizes the file."""
+        if self._container is None:
+            return
+        try:
+            self._container.mux(self._stream.encode())
+        finally:
+            self._container.close()
+            self._container = None
+
+
+class BackgroundVideoEncoder:
+    """
+    A `VideoEncoder` running on its own thread, so encoding overlaps with whatever the caller does next.
+
+    `write` only queues the frames (the caller must not modify them afterwards) and blocks when
+    `max_queued_chunks` writes are pending. `close` returns immediately; `wait` blocks until the file is
+    complete and re-raises any encoding error.
+
+    Args:
+        path (`str` or `os.PathLike`): The output file.
+        fps (`float`): The frame rate.
+        max_queued_chunks (`int`): The maximal number of pending `write` calls.
+        encoder_kwargs: Passed to `VideoEncoder`.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        fps: float,
+        max_queued_chunks: int = 8,
+        **encoder_kwargs,
+    ):
+        self.path = str(path)
+        self._encoder = VideoEncoder(path, fps, **encoder_kwargs)
+        self._queue = queue.Queue(maxsize=max_queued_chunks)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        # Not a daemon thread: the interpreter waits for pending encodes before exiting
+        self._thread = threading.Thread(
+            target=self._run, name=f"video-encoder-{os.path.basename(self.path)}"
+        )
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        self.wait()
+
+    def _run(self):
+        try:
+            while True:
+                frames = self._queue.get()
+                if frames is self._STOP:
+                    break
+                if self._error is None:
+                    self._encoder.write(frames)
+        except BaseException as e:  # pylint: disable=broad-except
+            self._error = e
+            # Keep consuming, so writers blocked on a full queue are released
+            while self._queue.get() is not self._STOP:
+                pass
+        finally:
+            try:
+                self._encoder.close()
+            except BaseException as e:  # pylint: disable=broad-except
+                self._error = self._error or e
+
+    def write(self, frames: Union[np.ndarray, Iterable]):
+        if self._closed:
+            raise ValueError(f"Encoder of {self.path} is already closed")
+        if self._error is not None:
+            raise RuntimeError(f"Encoding {self.path} failed") from self._error
+        self._queue.put(frames)
+
+    def close(self):
+        """Finishes the file in the background, once all the queued frames are encoded."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(self._STOP)
+
+    @property
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None):
+        """Blocks until the file is complete. Raises the encoding error, if any."""
+        self.close()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise TimeoutError(f"Encoding {self.path} did not finish in {timeout}s")
+        if self._error is not None:
+            raise RuntimeError(f"Encoding {self.path} failed") from self._error
+
+
+def write_video(
+    path: Union[str, os.PathLike],
+    frames: Iterable,
+    fps: float,
+    background: bool = False,
+    **encoder_kwargs,
+) -> Optional[BackgroundVideoEncoder]:
+    """
+    Encodes `frames` (uint8 (h, w, 3) arrays or PIL images) into `path`.
+
+    If `background` is True, the encoding runs on its own thread and the returned encoder has to be
+    waited for (`wait()`) before the file is used.
+    """
+    if background:
+        encoder = BackgroundVideoEncoder(path, fps, **encoder_kwargs)
+        encoder.write([np.asarray(frame) for frame in frames])
+        encoder.close()
+        return encoder
+    with VideoEncoder(path, fps, **encoder_kwargs) as encoder:
+        encoder.write(frames)
+    return None
@@ -0,0 +1,286 @@
+import logging
+import mmap
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, Optional, Union
+
+import torch
+from torch import nn
+
+from ltx_video.utils.checkpoint_loader import (
+    SingleFileCheckpoint,
+    _has_non_persistent_buffers,
+    _supports_assign,
+    assign_on_load,
+)
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Not defined on platforms without madvise, where the hints are skipped
+MADV_WILLNEED = getattr(mmap, "MADV_WILLNEED", None)
+MADV_DONTNEED = getattr(mmap, "MADV_DONTNEED", None)
+
+
+class BlockWeightStreamer:
+    """
+    Keeps a fixed set of the blocks of a model resident, under a budget of resident bytes, and pages the other
+    blocks in from a memory-mapped checkpoint right before they run.
+
+    The resident blocks are the pinned ones, then the first blocks in order, as many as fit in the budget once
+    room is left for two streamed blocks. Each streamed block is loaded before it runs, from the prefetch if
+    one is in flight, and evicted right after. While it runs, the next streamed block is prefetched on a
+    background thread: its pages are read ahead with `madvise(MADV_WILLNEED)` and its tensors are converted
+    to the target dtype (and pinned for a CUDA device). Evicted weights are replaced by empty placeholders
+    and the pages of their mapping are released with `madvise(MADV_DONTNEED)`.
+
+    Since the blocks run in the same order at every step, the resident blocks are never reloaded and each
+    streamed block is read once per forward, which bounds the slowdown to the read bandwidth of the
+    checkpoint. If all the blocks fit in the budget, they are only loaded once.
+
+    The blocks run on the device of their tensors (placeholders included), so the streamer follows the model
+    when it is moved with `.to()`, e.g. when it is offloaded to the CPU between generations.
+
+    Args:
+        blocks (`Iterable[nn.Module]`): The blocks to stream, in the order they run.
+        checkpoint (`SingleFileCheckpoint`): The checkpoint of the weights, which has to stay open.
+        prefix (`str`): The prefix of the tensors of the blocks in the checkpoint, followed by the block index.
+        max_resident_bytes (`int`): The budget of the loaded blocks, including the running streamed block and
+            the prefetched one. The pinned blocks are always resident, even beyond the budget.
+        dtype (`torch.dtype`, *optional*): Target dtype of the floating point weights. If None, the weights
+            keep the dtype they are stored with.
+        device (`str` or `torch.device`): The device the blocks initially run on.
+        pinned_blocks (`Iterable[int]`): Blocks that are always resident. The first block is pinned by default
+            because `compute_modulated_input` reads its weights outside of its forward.
+    """
+
+    def __init__(
+        self,
+        blocks: Iterable[nn.Module],
+        checkpoint: SingleFileCheckpoint,
+        prefix: str,
+        max_resident_bytes: int,
+        dtype: Optional[torch.dtype] = None,
+        device: Union[str, torch.device] = "cpu",
+        pinned_blocks: Iterable[int] = (0,),
+    ):
+        self.blocks = list(blocks)
+        self.checkpoint = checkpoint
+        self.prefix = prefix
+        self.max_resident_bytes = max_resident_bytes
+        self.dtype = dtype
+        self.pinned_blocks = set(pinned_blocks)
+        # The names of the tensors of each block, relative to the block
+        self._names = [list(block.state_dict().keys()) for block in self.blocks]
+        self._block_bytes = [
+            sum(
+                checkpoint.tensor_nbytes(self._key(index, name), dtype)
+                for name in names
+            )
+            for index, names in enumerate(self._names)
+        ]
+        self.resident_blocks = self._select_resident_blocks()
+        self._streamed_blocks = [
+            index
+            for index in range(len(self.blocks))
+            if index not in self.resident_blocks
+        ]
+        self._loaded = set()
+        self._prefetches: Dict[int, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.num_loads = 0
+
+        for index in range(len(self.blocks)):
+            self._evict(index, torch.device(device))
+        for index in sorted(self.resident_blocks):
+            self._load(index)
+        self._hooks = []
+        for index in self._streamed_blocks:
+            block = self.blocks[index]
+            self._hooks.append(
+                block.register_forward_pre_hook(partial(self._pre_forward, index))
+            )
+            self._hooks.append(
+                block.register_forward_hook(partial(self._post_forward, index))
+            )
+        if self._streamed_blocks:
+            self._prefetch(self._streamed_blocks[0])
+
+    @property
+    def device(self) -> torch.device:
+        """The device the blocks run on, which is the device of their tensors."""
+        return next(iter(self.blocks[0].state_dict(keep_vars=True).values())).device
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._block_bytes[index] for index in self._loaded)
+
+    def _key(self, index: int, name: str) -> str:
+        return f"{self.prefix}{index}.{name}"
+
+    def _select_resident_blocks(self) -> set:
+        resident = set(self.pinned_blocks)
+        for index in range(len(self.blocks)):
+            if index in resident:
+                continue
+            candidate = resident | {index}
+            streamed_bytes = [
+                self._block_bytes[i]
+                for i in range(len(self.blocks))
+                if i not in candidate
+            ]
+            window_bytes = 2 * max(streamed_bytes, default=0)
+            if (
+                sum(self._block_bytes[i] for i in candidate) + window_bytes
+                > self.max_resident_bytes
+            ):
+                break
+            resident = candidate
+        return resident
+
+    def _read(self, index: int) -> Dict[str, torch.Tensor]:
+        """Reads the tensors of a block on the host. Runs on the prefetch thread."""
+        keys = [self._key(index, name) for name in self._names[index]]
+        self.checkpoint.advise(keys, MADV_WILLNEED)
+        pin_memory = self.device.type == "cuda"
+        tensors = {}
+        for name, key in zip(self._names[index], keys):
+            tensor = self.checkpoint.get_tensor(key, dtype=self.dtype)
+            if pin_memory:
+                tensor = tensor.pin_memory()
+            tensors[name] = tensor
+        return tensors
+
+    def _prefetch(self, index: int):
+        if index not in self._loaded and index not in self._prefetches:
+            self._prefetches[index] = self._executor.submit(self._read, index)
+
+    def _set_tensor(self, block: nn.Module, name: str, tensor: torch.Tensor):
+        module_name, _, attr = name.rpartition(".")
+        module = block.get_submodule(module_name)
+        if attr in module._parameters:
+            module._parameters[attr] = nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[attr] = tensor
+
+    def _load(self, index: int):
+        future = self._prefetches.pop(index, None)
+        tensors = future.result() if future is not None else self._read(index)
+        device = self.device
+        for name, tensor in tensors.items():
+            self._set_tensor(
+                self.blocks[index], name, tensor.to(device, non_blocking=True)
+            )
+        self._loaded.add(index)
+        self.num_loads += 1
+
+    def _evict(self, index: int, device: torch.device):
+        block = self.blocks[index]
+        for name, tensor in block.state_dict(keep_vars=True).items():
+            dtype = (
+                self.dtype
+                if self.dtype is not None and tensor.is_floating_point()
+                else tensor.dtype
+            )
+            self._set_tensor(block, name, torch.empty(0, dtype=dtype, device=device))
+        self._loaded.discard(index)
+        self.checkpoint.advise(
+            [self._key(index, name) for name in self._names[index]],
+            MADV_DONTNEED,
+        )
+
+    def _pre_forward(self, index: int, module: nn.Module, inputs):
+        if index not in self._loaded:
+            self._load(index)
+        position = self._streamed_blocks.index(index)
+        self._prefetch(
+            self._streamed_blocks[(position + 1) % len(self._streamed_blocks)]
+        )
+
+    def _post_forward(self, index: int, module: nn.Module, inputs, output):
+        self._evict(index, self.device)
+
+    def close(self):
+        """Stops streaming. The blocks keep the weights they currently hold."""
+        for handle in self._hooks:
+            handle.remove()
+        self._hooks = []
+        self._executor.shutdown(wait=True)
+        self._prefetches.clear()
+
+
+def load_streamed_model_from_checkpoint(
+    model_cls,
+    checkpoint: SingleFileCheckpoint,
+    component: str,
+    max_resident_bytes: int,
+    prefix: str = "",
+    blocks_attribute: str = "transformer_blocks",
+    dtype: Optional[torch.dtype] = None,
+    device: Union[str, torch.device] = "cpu",
+) -> nn.Module:
+    """
+    Builds a model like `load_model_from_checkpoint`, but streams the weights of its blocks with a
+    `BlockWeightStreamer` under a budget of `max_resident_bytes`. Only the other weights (embeddings,
+    projections, norms) and the resident blocks are loaded upfront. The streamer is kept as the
+    `block_streamer` attribute of the model, and `checkpoint` has to stay open as long as the model is used.
+    Like `load_model_from_checkpoint`, raises if a weight is missing from the checkpoint or unexpected.
+
+    Args:
+        blocks_attribute (`str`): The attribute of the model holding the list of blocks to stream.
+    """
+    config = checkpoint.configs[component]
+    with torch.device("meta"):
+        model = model_cls.from_config(config)
+    if _has_non_persistent_buffers(model):
+        raise ValueError(
+            f"{model_cls.__name__} has buffers that are not stored in the checkpoint, its weights cannot be streamed"
+        )
+    if not _supports_assign():
+        raise ValueError("Streaming the weights requires torch>=2.1")
+
+    blocks = getattr(model, blocks_attribute)
+    blocks_prefix = f"{prefix}{blocks_attribute}."
+    block_keys = {
+        f"{blocks_prefix}{index}.{name}"
+        for index, block in enumerate(blocks)
+        for name in block.state_dict()
+    }
+    stored_block_keys = {
+        name for name in checkpoint.keys() if name.startswith(blocks_prefix)
+    }
+    if block_keys != stored_block_keys:
+        raise ValueError(
+            f"The blocks of {model_cls.__name__} do not match the checkpoint: "
+            f"missing keys {sorted(block_keys - stored_block_keys)}, "
+            f"unexpected keys {sorted(stored_block_keys - block_keys)}"
+        )
+
+    model.block_streamer = BlockWeightStreamer(
+        blocks,
+        checkpoint,
+        prefix=blocks_prefix,
+        max_resident_bytes=max_resident_bytes,
+        dtype=dtype,
+        device=device,
+    )
+
+    # The blocks already hold their weights (or placeholders), which are passed back as they are so the
+    # other weights can be loaded strictly
+    state_dict = {
+        name: tensor
+        for name, tensor in checkpoint.iter_tensors(prefix, dtype=dtype)
+        if not name.startswith(blocks_prefix)
+    }
+    for index, block in enumerate(blocks):
+        for name, tensor in block.state_dict(keep_vars=True).items():
+            state_dict[f"{blocks_prefix}{index}.{name}"] = tensor
+    with assign_on_load(model):
+        model.load_state_dict(state_dict)
+    model = model.to(device)
+
+    streamer = model.block_streamer
+    logger.info(
+        f"Keeping {len(streamer.resident_blocks)} of {len(blocks)} blocks resident and streaming the "
+        f"others under a budget of {max_resident_bytes / 2**30:.2f}GB"
+    )
+    return model
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+import torch
+from safetensors.torch import save_file
+from torch import nn
+
+from ltx_video.utils.checkpoint_loader import (
+    SingleFileCheckpoint,
+    load_model_from_checkpoint,
+)
+
+PREFIX = "vae."
+
+
+class TinyModel(nn.Module):
+    def __init__(self, channels: int = 8):
+        super().__init__()
+        self.conv = nn.Conv2d(channels, channels, 3)
+        self.norm = nn.GroupNorm(2, channels)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**config)
+
+
+class StrictOverrideModel(TinyModel):
+    """Overrides `load_state_dict` like the LTX VAE: strips the prefix and does not take `assign`."""
+
+    def load_state_dict(self, state_dict, strict=True):
+        state_dict = {key[len(PREFIX) :]: value for key, value in state_dict.items()}
+        return super().load_state_dict(state_dict, strict=strict)
+
+
+class WrapperOverrideModel(TinyModel):
+    def load_state_dict(self, state_dict, *args, **kwargs):
+        state_dict = {key[len(PREFIX) :]: value for key, value in state_dict.items()}
+        return super().load_state_dict(state_dict, *args, **kwargs)
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    torch.manual_seed(0)
+    reference = TinyModel()
+    state_dict = {
+        PREFIX + name: tensor.contiguous()
+        for name, tensor in reference.state_dict().items()
+    }
+    path = tmp_path / "model.safetensors"
+    save_file(state_dict, path, metadata={"config": json.dumps({"vae": {}})})
+    return path
+
+
+@pytest.mark.parametrize("model_cls", [StrictOverrideModel, WrapperOverrideModel])
+def test_overridden_load_state_dict_shares_the_mapping(checkpoint_path, model_cls):
+    with SingleFileCheckpoint(checkpoint_path) as checkpoint:
+        model = load_model_from_checkpoint(model_cls, checkpoint, "vae", prefix=PREFIX)
+        for name, tensor in model.state_dict().items():
+            assert tensor.data_ptr() == checkpoint.get_tensor(PREFIX + name).data_ptr()
+
+
+def test_dtype_conversion_is_assigned(checkpoint_path):
+    with SingleFileCheckpoint(checkpoint_path) as checkpoint:
+        model = load_model_from_checkpoint(
+            StrictOverrideModel,
+            checkpoint,
+            "vae",
+            prefix=PREFIX,
+            dtype=torch.bfloat16,
+        )
+        for name, tensor in model.state_dict().items():
+            assert tensor.dtype == torch.bfloat16
+            assert torch.equal(
+                tensor, checkpoint.get_tensor(PREFIX + name, dtype=torch.bfloat16)
+            )
+    # The assignment hooks are removed after loading
+    assert "_load_from_state_dict" not in model.conv.__dict__
@@ -0,0 +1,93 @@
+import os
+
+import torch
+
+from ltx_video.utils.conditioning_latent_cache import ConditioningLatentCache
+from ltx_video.utils.disk_cache import DiskTensorCache
+from ltx_video.utils.text_embedding_cache import TextEmbeddingCache
+
+
+def entry(value: float):
+    return {
+        "latents": torch.full((2, 4), value),
+        "mask": torch.ones(2, dtype=torch.int64),
+    }
+
+
+def set_mtime(cache: DiskTensorCache, key: str, mtime: float):
+    os.utime(cache.path(key), (mtime, mtime))
+
+
+def test_round_trip(tmp_path):
+    cache = DiskTensorCache(tmp_path / "cache", "test")
+    assert not cache.contains("a") and cache.get("a", ["latents"]) is None
+
+    cache.put("a", entry(1.0))
+
+    assert cache.contains("a")
+    tensors = cache.get("a", ["latents", "mask"])
+    assert torch.equal(tensors["latents"], entry(1.0)["latents"])
+    assert torch.equal(tensors["mask"], entry(1.0)["mask"])
+    # Existing entries are not overwritten
+    cache.put("a", entry(2.0))
+    assert torch.equal(cache.get("a", ["latents"])["latents"], entry(1.0)["latents"])
+
+
+def test_corrupted_entry_is_dropped(tmp_path):
+    cache = DiskTensorCache(tmp_path, "test")
+    cache.put("a", entry(1.0))
+    cache.path("a").write_bytes(b"junk")
+
+    assert cache.get("a", ["latents"]) is None
+    assert not cache.contains("a")
+
+
+def test_eviction_in_mtime_lru_order(tmp_path):
+    cache = DiskTensorCache(tmp_path, "test")
+    for mtime, key in enumerate(["a", "b", "c"], start=1000):
+        cache.put(key, entry(0.0))
+        set_mtime(cache, key, mtime)
+    # Reading an entry marks it as the most recently used
+    cache.get("a", ["latents"])
+
+    cache.max_disk_bytes = 3 * cache.path("a").stat().st_size
+    cache.put("d", entry(0.0))
+    assert [cache.contains(key) for key in "abcd"] == [True, False, True, True]
+
+    set_mtime(cache, "a", 1500)
+    set_mtime(cache, "d", 2000)
+    cache.max_disk_bytes = 2 * cache.path("a").stat().st_size
+    cache.put("e", entry(0.0))
+    assert [cache.contains(key) for key in "acde"] == [False, False, True, True]
+
+
+def test_namespaces_are_separated(tmp_path):
+    texts = DiskTensorCache(tmp_path, "text_embedding")
+    latents = DiskTensorCache(tmp_path, "conditioning_latent")
+
+    texts.put("key", entry(1.0))
+    assert not latents.contains("key")
+    latents.put("key", entry(2.0))
+    assert torch.equal(texts.get("key", ["latents"])["latents"], entry(1.0)["latents"])
+    assert torch.equal(
+        latents.get("key", ["latents"])["latents"], entry(2.0)["latents"]
+    )
+
+    # Each namespace only evicts its own entries
+    latents.max_disk_bytes = 0
+    latents.put("other", entry(3.0))
+    assert not latents.contains("key") and not latents.contains("other")
+    assert texts.contains("key")
+
+
+def test_caches_can_share_a_directory(tmp_path):
+    text_cache = TextEmbeddingCache("t5", cache_dir=tmp_path, max_disk_bytes=1 << 20)
+    latent_cache = ConditioningLatentCache("vae", cache_dir=tmp_path, max_disk_bytes=0)
+
+    text_cache.put("a cat", 16, torch.randn(1, 3, 8), torch.ones(1, 3))
+    latent_cache.put("key", torch.randn(1, 4, 1, 2, 2))
+    text_cache.clear_memory()
+    latent_cache.clear_memory()
+
+    assert text_cache.get("a cat", 16) is not None
+    assert latent_cache.get("key") is None
@@ -0,0 +1,65 @@
+import pytest
+
+from ltx_video.utils.guidance_schedule import GuidanceSchedule
+
+NUM_STEPS = 4
+
+
+@pytest.mark.parametrize("value", [3.0, [3.0], (3.0,)])
+def test_scalar(value):
+    schedule = GuidanceSchedule.from_value(value)
+    schedule.validate(NUM_STEPS)
+
+    assert schedule.scale == 3.0 and schedule.max_scale == 3.0
+    assert [schedule.scale_at(i, NUM_STEPS, 0.5) for i in range(NUM_STEPS)] == [3.0] * 4
+
+
+def test_per_step_list():
+    schedule = GuidanceSchedule.from_value((4.0, 3.0, 2.0, 1.0))
+    schedule.validate(NUM_STEPS)
+
+    assert schedule.scale == [4.0, 3.0, 2.0, 1.0] and schedule.max_scale == 4.0
+    assert [schedule.scale_at(i, NUM_STEPS, 0.5) for i in range(NUM_STEPS)] == [
+        4.0,
+        3.0,
+        2.0,
+        1.0,
+    ]
+
+
+def test_from_value_keeps_a_schedule():
+    schedule = GuidanceSchedule(scale=2.0, step_range=(0, 2))
+    assert GuidanceSchedule.from_value(schedule) is schedule
+
+
+@pytest.mark.parametrize(
+    "step_range, expected",
+    [((1, 3), [None, 2.0, 2.0, None]), ((-2, 4), [None, None, 2.0, 2.0])],
+)
+def test_step_range(step_range, expected):
+    schedule = GuidanceSchedule(scale=2.0, step_range=step_range)
+    assert [schedule.scale_at(i, NUM_STEPS, 0.5) for i in range(NUM_STEPS)] == expected
+
+
+def test_sigma_range():
+    schedule = GuidanceSchedule(scale=[4.0, 3.0, 2.0, 1.0], sigma_range=(0.2, 0.6))
+    sigmas = [1.0, 0.6, 0.2, 0.1]
+    assert [schedule.scale_at(i, NUM_STEPS, sigmas[i]) for i in range(NUM_STEPS)] == [
+        None,
+        3.0,
+        2.0,
+        None,
+    ]
+
+
+@pytest.mark.parametrize("num_steps", [3, 5])
+def test_per_step_length_mismatch(num_steps):
+    schedule = GuidanceSchedule.from_value([4.0, 3.0, 2.0, 1.0])
+    with pytest.raises(ValueError, match="4 per-step guidance scales"):
+        schedule.validate(num_steps)
+
+
+@pytest.mark.parametrize("value", [-1.0, [1.0, -0.5, 1.0, 1.0]])
+def test_negative_scale(value):
+    with pytest.raises(ValueError, match="must not be negative"):
+        GuidanceSchedule.from_value(value).validate(NUM_STEPS)
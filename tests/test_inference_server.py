@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from inference_server import (
+    JOB_CANCELLED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    create_server,
+)
+
+DEFAULT_PARAMS = {"prompt": None, "seed": 0, "ckpt_path": "ltxv.safetensors"}
+
+
+class StubRunner:
+    """Writes the prompt of each job to a file, once `release` is set."""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.release = threading.Event()
+
+    def __call__(self, jobs):
+        assert self.release.wait(10)
+        outputs = []
+        for job in jobs:
+            path = self.output_dir / f"{job['prompt']}_{job['seed']}.txt"
+            path.write_text(job["prompt"])
+            outputs.append([path])
+        return outputs
+
+
+@pytest.fixture
+def server(tmp_path):
+    runner = StubRunner(tmp_path)
+    server = create_server(runner, DEFAULT_PARAMS, port=0, model_args={"ckpt_path"})
+    server.runner = runner
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    runner.release.set()
+    server.request_shutdown(drain=False)
+    thread.join(10)
+    server.server_close()
+
+
+def request(server, method, path, payload=None):
+    host, port = server.server_address
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(
+        f"http://{host}:{port}{path}", data=data, method=method
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def request_json(server, method, path, payload=None):
+    status, body = request(server, method, path, payload)
+    return status, json.loads(body)
+
+
+def wait_for_status(server, job_id, status):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        _, job = request_json(server, "GET", f"/jobs/{job_id}")
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not become {status}: {job}")
+
+
+def test_submit_poll_cancel_and_shutdown(server):
+    status, running = request_json(server, "POST", "/jobs", {"prompt": "cat"})
+    assert status == 202
+    wait_for_status(server, running["job_id"], JOB_RUNNING)
+
+    status, queued = request_json(server, "POST", "/jobs", {"prompt": "dog", "seed": 1})
+    assert status == 202 and queued["status"] == JOB_QUEUED
+    status, cancelled = request_json(server, "DELETE", f"/jobs/{queued['job_id']}")
+    assert status == 200 and cancelled["status"] == JOB_CANCELLED
+    status, _ = request_json(server, "DELETE", f"/jobs/{running['job_id']}")
+    assert status == 409
+
+    server.runner.release.set()
+    job = wait_for_status(server, running["job_id"], JOB_SUCCEEDED)
+    assert job["params"]["ckpt_path"] == DEFAULT_PARAMS["ckpt_path"]
+    status, result = request_json(server, "GET", f"/jobs/{running['job_id']}/result")
+    assert status == 200 and len(result["outputs"]) == 1
+    content = request(server, "GET", f"/jobs/{running['job_id']}/result/0")
+    assert content == (200, b"cat")
+    status, _ = request_json(server, "GET", f"/jobs/{queued['job_id']}/result")
+    assert status == 409
+
+    status, health = request_json(server, "GET", "/health")
+    assert health[JOB_SUCCEEDED] == 1 and health[JOB_CANCELLED] == 1
+
+    status, _ = request_json(server, "POST", "/shutdown", {"drain": True})
+    assert status == 202
+    server.job_queue._worker.join(10)
+    assert not server.job_queue._worker.is_alive()
+    assert not server.job_queue.accepting
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [{"prompt": "cat", "unknown": 1}, {"prompt": "cat", "ckpt_path": "other"}, {}],
+)
+def test_invalid_jobs_are_rejected(server, payload):
+    status, response = request_json(server, "POST", "/jobs", payload)
+    assert status == 400 and "error" in response
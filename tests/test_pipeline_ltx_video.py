@@ -0,0 +1,85 @@
+import pytest
+import torch
+from diffusers.pipelines.pipeline_utils import DiffusionPipeline
+from transformers import T5Config, T5EncoderModel
+
+from ltx_video.pipelines.pipeline_ltx_video import LTXVideoPipeline
+from ltx_video.utils.text_embedding_cache import TextEmbeddingCache
+
+MAX_TOKENS = 16
+# Stands in for the execution device, so the tests do not need a GPU
+EXECUTION_DEVICE = torch.device("meta")
+
+
+def make_pipeline(cache: TextEmbeddingCache) -> LTXVideoPipeline:
+    """A pipeline with only a (tiny) text encoder, on the CPU like `create_ltx_video_pipeline` creates it."""
+    pipeline = LTXVideoPipeline.__new__(LTXVideoPipeline)
+    DiffusionPipeline.__init__(pipeline)
+    text_encoder = T5EncoderModel(
+        T5Config(vocab_size=32, d_model=8, d_kv=4, d_ff=16, num_layers=1, num_heads=2)
+    )
+    pipeline.register_modules(
+        text_encoder=text_encoder,
+        **{
+            name: None
+            for name in LTXVideoPipeline._get_signature_keys(pipeline)[0]
+            if name != "text_encoder"
+        },
+    )
+    pipeline.set_text_embedding_cache(cache)
+    return pipeline
+
+
+def test_fully_cached_job_leaves_the_text_encoder_on_the_cpu():
+    cache = TextEmbeddingCache("t5")
+    for text in ["a cat", ""]:
+        cache.put(text, MAX_TOKENS, torch.randn(1, 3, 8), torch.ones(1, 3))
+    pipeline = make_pipeline(cache)
+
+    texts = pipeline._text_preprocessing("a cat ") + pipeline._text_preprocessing("")
+    pipeline._load_text_encoder_if_needed(texts, MAX_TOKENS, EXECUTION_DEVICE)
+    prompt_embeds, _, negative_prompt_embeds, _ = pipeline.encode_prompt(
+        "a cat ",
+        do_classifier_free_guidance=True,
+        negative_prompt="",
+        device="cpu",
+        text_encoder_max_tokens=MAX_TOKENS,
+    )
+
+    assert pipeline.text_encoder.device == torch.device("cpu")
+    assert prompt_embeds.shape == negative_prompt_embeds.shape == (1, 3, 8)
+    assert cache.misses == 0
+
+
+def test_uncached_text_moves_the_text_encoder_to_the_execution_device():
+    cache = TextEmbeddingCache("t5")
+    cache.put("a cat", MAX_TOKENS, torch.randn(1, 3, 8), torch.ones(1, 3))
+    pipeline = make_pipeline(cache)
+
+    pipeline._load_text_encoder_if_needed(
+        ["a cat", "a dog"], MAX_TOKENS, EXECUTION_DEVICE
+    )
+
+    assert pipeline.text_encoder.device == EXECUTION_DEVICE
+
+
+@pytest.mark.parametrize(
+    "guidance", [{"guidance_scale": [3.0, 3.0]}, {"stg_scale": [1.0, 1.0, 1.0]}]
+)
+def test_per_step_scales_are_validated_before_any_compute(guidance):
+    cache = TextEmbeddingCache("t5")
+    pipeline = make_pipeline(cache)
+
+    with pytest.raises(ValueError, match="per-step guidance scales for 4 steps"):
+        pipeline(
+            prompt="a cat",
+            height=64,
+            width=64,
+            num_frames=9,
+            frame_rate=25,
+            num_inference_steps=4,
+            **guidance,
+        )
+
+    # Nothing was encoded
+    assert cache.misses == 0
@@ -0,0 +1,170 @@
+import copy
+
+import pytest
+import torch
+
+from ltx_video.schedulers.rf import RectifiedFlowScheduler
+
+NUM_STEPS = 6
+
+
+def make_scheduler(solver: str, num_steps: int = NUM_STEPS) -> RectifiedFlowScheduler:
+    scheduler = RectifiedFlowScheduler(sampler="LinearQuadratic", solver=solver)
+    scheduler.set_timesteps(num_steps, torch.zeros(1, 8, 4))
+    return scheduler
+
+
+def denoise(scheduler, sample, velocity, timesteps):
+    """Steps `sample` through `timesteps` with the model output `velocity(sample, t)`."""
+    for t in timesteps:
+        model_output = velocity(sample, t)
+        sample = scheduler.step(model_output, t, sample, return_dict=False)[0]
+    return sample
+
+
+def straight_velocity(sample, t):
+    # The velocity of a straight rectified flow path does not depend on the position or time,
+    # so Euler integrates it exactly and the higher-order corrections vanish
+    return torch.linspace(-1, 1, sample.shape[-1]).expand_as(sample)
+
+
+def curved_velocity(sample, t):
+    return sample * t + torch.sin(sample)
+
+
+def test_heun_timestep_layout():
+    euler = make_scheduler("euler")
+    heun = make_scheduler("heun")
+
+    sigmas = euler.timesteps
+    expected = torch.cat([sigmas[:1], sigmas[1:].repeat_interleave(2)])
+    assert heun.order == 2 and euler.order == 1
+    assert torch.equal(heun.timesteps, expected)
+    assert len(heun.timesteps) == 2 * NUM_STEPS - 1
+
+
+@pytest.mark.parametrize("solver", ["heun", "multistep"])
+def test_higher_order_solvers_match_euler_on_a_straight_flow(solver):
+    torch.manual_seed(0)
+    sample = torch.randn(2, 8, 4)
+    euler = make_scheduler("euler")
+    scheduler = make_scheduler(solver)
+
+    expected = denoise(euler, sample, straight_velocity, euler.timesteps)
+    result = denoise(scheduler, sample, straight_velocity, scheduler.timesteps)
+
+    assert torch.equal(result, expected)
+    # The final step is a plain Euler step for heun, which leaves no state behind
+    if solver == "heun":
+        assert scheduler.get_solver_state()["solver_state"] is None
+
+
+@pytest.mark.parametrize("solver", ["heun", "multistep"])
+def test_higher_order_solvers_correct_euler_on_a_curved_flow(solver):
+    torch.manual_seed(0)
+    sample = torch.randn(2, 8, 4)
+    euler = make_scheduler("euler")
+    scheduler = make_scheduler(solver)
+
+    expected = denoise(euler, sample, curved_velocity, euler.timesteps)
+    result = denoise(scheduler, sample, curved_velocity, scheduler.timesteps)
+
+    assert not torch.allclose(result, expected)
+
+
+@pytest.mark.parametrize("solver", ["euler", "heun", "multistep"])
+def test_solver_state_round_trip(solver):
+    torch.manual_seed(0)
+    sample = torch.randn(2, 8, 4)
+    scheduler = make_scheduler(solver)
+    timesteps = scheduler.timesteps
+    # Interrupted right after a heun predictor, so there is a pending corrector
+    split = 3
+
+    expected = denoise(
+        make_scheduler(solver), sample, curved_velocity, scheduler.timesteps
+    )
+
+    partial = denoise(scheduler, sample, curved_velocity, timesteps[:split])
+    state = copy.deepcopy(scheduler.get_solver_state())
+    if solver != "euler":
+        assert state["solver_state"] is not None
+    resumed_scheduler = make_scheduler(solver)
+    resumed_scheduler.set_solver_state(state)
+    result = denoise(resumed_scheduler, partial, curved_velocity, timesteps[split:])
+
+    assert torch.equal(result, expected)
+
+
+def test_set_timesteps_drops_the_solver_state():
+    scheduler = make_scheduler("heun")
+    sample = torch.randn(1, 8, 4)
+    denoise(scheduler, sample, curved_velocity, scheduler.timesteps[:1])
+    assert scheduler.is_corrector_step
+
+    scheduler.set_timesteps(NUM_STEPS, sample)
+
+    assert not scheduler.is_corrector_step
+    assert scheduler.step_index is None
+
+
+def linear_scan_lower_timestep(scheduler, t, t_eps=1e-6):
+    """The baseline lookup: the largest timestep of the padded schedule lower than `t`, or 0."""
+    schedule = scheduler.timesteps_padded
+    lower = [s for s in schedule.tolist() if s < t - t_eps]
+    return max(lower, default=0.0)
+
+
+def test_global_step_matches_the_linear_scan():
+    torch.manual_seed(0)
+    scheduler = make_scheduler("euler")
+    sample = torch.randn(2, 8, 4)
+    model_output = torch.randn(2, 8, 4)
+
+    for t in scheduler.timesteps:
+        prev_sample = scheduler.step(model_output, t, sample, return_dict=False)[0]
+        dt = t - linear_scan_lower_timestep(scheduler, t.item())
+        torch.testing.assert_close(prev_sample, sample - dt * model_output)
+
+
+@pytest.mark.parametrize("index", [0, 2, 4])
+def test_global_step_looks_up_an_untracked_timestep(index):
+    torch.manual_seed(0)
+    scheduler = make_scheduler("euler")
+    sample = torch.randn(2, 8, 4)
+    model_output = torch.randn(2, 8, 4)
+    sigmas = scheduler.timesteps
+    # Start the tracked walk, then skip ahead, repeat a step or leave the schedule
+    scheduler.step(model_output, sigmas[1], sample)
+
+    for t in [
+        sigmas[index + 1],
+        sigmas[index + 1],
+        (sigmas[index] + sigmas[index + 1]) / 2,
+    ]:
+        prev_sample = scheduler.step(model_output, t, sample, return_dict=False)[0]
+        dt = t - linear_scan_lower_timestep(scheduler, t.item())
+        torch.testing.assert_close(prev_sample, sample - dt * model_output)
+
+
+def test_per_token_step_matches_the_linear_scan():
+    torch.manual_seed(0)
+    scheduler = make_scheduler("euler")
+    sigmas = scheduler.timesteps
+    # Every schedule timestep, timesteps between them, and the frozen conditioning timestep 0
+    midpoints = (sigmas[:-1] + sigmas[1:]) / 2
+    timestep = torch.cat([sigmas, midpoints, torch.zeros(1)])[None].repeat(2, 1)
+    timestep[1] = timestep[1].flip(0)
+    sample = torch.randn(2, timestep.shape[1], 4)
+    model_output = torch.randn(2, timestep.shape[1], 4)
+
+    prev_sample = scheduler.step(model_output, timestep, sample, return_dict=False)[0]
+
+    lower = torch.tensor(
+        [
+            [linear_scan_lower_timestep(scheduler, t) for t in row]
+            for row in timestep.tolist()
+        ]
+    )
+    dt = (timestep - lower)[..., None]
+    torch.testing.assert_close(prev_sample, sample - dt * model_output)
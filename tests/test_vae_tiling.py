@@ -0,0 +1,53 @@
+import pytest
+import torch
+
+from ltx_video.utils.vae_tiling import _blend_ramp, _tile_ranges
+
+# (length, tile_size, overlap), with overlaps of at most half the tile size like `iter_tiled_vae_decode`
+TILINGS = [
+    (16, 4, 1),
+    (17, 8, 2),
+    (30, 8, 4),
+    (9, 5, 0),
+    (7, 8, 2),
+    (8, 8, 2),
+]
+
+
+@pytest.mark.parametrize("length, tile_size, overlap", TILINGS)
+def test_tiles_cover_the_extent_with_the_overlap(length, tile_size, overlap):
+    ranges = _tile_ranges(length, tile_size, overlap)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == length
+    for start, end in ranges:
+        assert 0 < end - start <= tile_size
+    for (_, previous_end), (start, _) in zip(ranges, ranges[1:]):
+        assert previous_end - start == overlap
+    # Only the last tile may be shorter
+    assert all(end - start == tile_size for start, end in ranges[:-1])
+
+
+@pytest.mark.parametrize("length, tile_size, overlap", TILINGS)
+@pytest.mark.parametrize("causal", [False, True])
+def test_blend_weights_sum_to_one(length, tile_size, overlap, causal):
+    if causal and overlap < 1 and tile_size < length:
+        pytest.skip("Causal temporal tiles overlap by at least one latent frame")
+
+    def to_pixel_range(start, end):
+        if causal:
+            # The first latent frame of a causal temporal tile decodes to a single frame
+            return start * 8, (end - 1) * 8 + 1
+        return start * 8, end * 8
+
+    pixel_ranges = [
+        to_pixel_range(start, end)
+        for start, end in _tile_ranges(length, tile_size, overlap)
+    ]
+    total = torch.zeros(pixel_ranges[-1][1])
+    for index, (start, end) in enumerate(pixel_ranges):
+        weights = _blend_ramp(pixel_ranges, index, total.device)
+        assert weights.shape == (end - start,)
+        assert bool((weights > 0).all())
+        total[start:end] += weights
+
+    torch.testing.assert_close(total, torch.ones_like(total))